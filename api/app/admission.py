@@ -0,0 +1,186 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterable, Optional
+from .metrics import admission_rejected, admission_wait_seconds
+import asyncio
+import os
+import time
+
+# Chamadas baratas (cabeçalhos, contadores, consultas indexadas) não disputam
+# vaga com as caras; varreduras do UTXO set têm classe própria
+CHEAP_METHODS = frozenset({
+    "getbestblockhash", "getblockchaininfo", "getblockcount", "getblockhash", "getblockheader",
+    "getmempoolentry", "getmempoolinfo", "getnetworkinfo", "validateaddress"
+})
+HEAVY_METHODS = frozenset({"scantxoutset", "gettxoutsetinfo"})
+CLASSES = ("cheap", "standard", "heavy")
+# Trabalho de fundo marcado com `background_work` (ex.: prefetcher) tem vaga
+# própria e só chama o node quando nenhuma requisição espera vaga
+BACKGROUND = "background"
+
+def method_class(methods: Iterable[str]) -> str:
+    """
+    Classe de uma chamada ou de um lote (a mais cara entre os métodos)
+    """
+    names = set(methods)
+    if names & HEAVY_METHODS:
+        return "heavy"
+    if names <= CHEAP_METHODS:
+        return "cheap"
+    return "standard"
+
+@dataclass
+class AdmissionConfig:
+    enabled: bool = True
+    # Chamadas simultâneas ao node por classe; a soma deve ficar abaixo do
+    # -rpcworkqueue do bitcoind (16 por padrão) e do BITCOIN_RPC_POOL_SIZE
+    cheap_limit: int = 6
+    standard_limit: int = 6
+    heavy_limit: int = 1
+    background_limit: int = 1
+    queue_limit: int = 64           # requisições esperando vaga por classe; acima disso, 429
+    queue_timeout: float = 2.0      # espera máxima por uma vaga antes de responder 503
+    deadline: float = 30.0          # prazo total de cada requisição HTTP
+    retry_after: int = 2            # segundos sugeridos no header Retry-After
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv("RPC_ADMISSION_ENABLED", "1") not in ("0", "false", "no"),
+            cheap_limit=int(os.getenv("RPC_LIMIT_CHEAP", "6")),
+            standard_limit=int(os.getenv("RPC_LIMIT_STANDARD", "6")),
+            heavy_limit=int(os.getenv("RPC_LIMIT_HEAVY", "1")),
+            background_limit=int(os.getenv("RPC_LIMIT_BACKGROUND", "1")),
+            queue_limit=int(os.getenv("RPC_QUEUE_LIMIT", "64")),
+            queue_timeout=float(os.getenv("RPC_QUEUE_TIMEOUT", "2")),
+            deadline=float(os.getenv("REQUEST_DEADLINE", "30")),
+            retry_after=int(os.getenv("RETRY_AFTER", "2"))
+        )
+
+class AdmissionError(Exception):
+    """
+    Chamada recusada antes de chegar ao node (429) ou sem resposta dentro
+    do prazo (503); vira resposta HTTP com Retry-After
+    """
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+# Instante (time.monotonic) em que a requisição HTTP atual expira; None fora
+# de requisições (tarefas de fundo esperam vaga sem prazo)
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+# Marca a tarefa atual como trabalho de fundo (classe BACKGROUND)
+background_work: ContextVar[bool] = ContextVar("background_work", default=False)
+
+def remaining() -> Optional[float]:
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+class _Gate:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.waiting = 0
+
+class AdmissionController:
+    """
+    Controle de admissão das chamadas ao bitcoind: limite de concorrência
+    por classe de método, fila limitada e prazo por requisição.
+
+    O trabalho de fundo não ocupa vagas das classes acima: usa a própria
+    (background_limit) e, antes de cada chamada, espera sem limite de tempo
+    enquanto houver requisições na fila de qualquer outra classe.
+    """
+    def __init__(self, config: AdmissionConfig):
+        self.config = config
+        self.gates = {
+            "cheap": _Gate(config.cheap_limit),
+            "standard": _Gate(config.standard_limit),
+            "heavy": _Gate(config.heavy_limit),
+            BACKGROUND: _Gate(config.background_limit)
+        }
+        # Requisições esperando vaga em todas as classes (menos a de fundo)
+        self._live_waiting = 0
+        self._no_live_waiting = asyncio.Event()
+        self._no_live_waiting.set()
+
+    def _queue(self, gate: _Gate, delta: int, background: bool):
+        gate.waiting += delta
+        if background:
+            return
+        self._live_waiting += delta
+        if self._live_waiting:
+            self._no_live_waiting.clear()
+        else:
+            self._no_live_waiting.set()
+
+    async def _acquire_background(self, gate: _Gate):
+        # Cede a vez a cada requisição que entrar na fila antes de obter a vaga
+        while True:
+            await self._no_live_waiting.wait()
+            await gate.semaphore.acquire()
+            if self._no_live_waiting.is_set():
+                return
+            gate.semaphore.release()
+
+    def classify(self, methods: Iterable[str]) -> str:
+        """
+        Classe em que `admit` enquadra os métodos na tarefa atual (a de
+        fundo, se marcada, senão a dos métodos)
+        """
+        return BACKGROUND if background_work.get() else method_class(methods)
+
+    def reject(self, status_code: int, detail: str, klass: str, reason: str) -> AdmissionError:
+        admission_rejected.inc(**{"class": klass, "reason": reason})
+        return AdmissionError(status_code, detail, self.config.retry_after)
+
+    @asynccontextmanager
+    async def admit(self, methods: Iterable[str]) -> AsyncIterator[Optional[float]]:
+        """
+        Reserva uma vaga da classe dos métodos e entrega o tempo que resta
+        até o prazo da requisição (None sem prazo)
+        """
+        left = remaining()
+        klass = self.classify(methods)
+        background = klass == BACKGROUND
+        if left is not None and left <= 0:
+            raise self.reject(503, "Prazo da requisição esgotado", klass, "deadline")
+        if not self.config.enabled:
+            yield left
+            return
+
+        gate = self.gates[klass]
+        if left is not None and gate.waiting >= self.config.queue_limit and gate.semaphore.locked():
+            raise self.reject(429, f"Muitas requisições aguardando o node ({klass})", klass, "queue-full")
+        started = time.monotonic()
+        self._queue(gate, 1, background)
+        try:
+            if background:
+                await self._acquire_background(gate)
+            elif left is None:
+                await gate.semaphore.acquire()
+            else:
+                async with asyncio.timeout(min(self.config.queue_timeout, left)):
+                    await gate.semaphore.acquire()
+        except TimeoutError:
+            raise self.reject(503, f"Node ocupado: sem vaga para chamadas {klass}", klass, "queue-timeout")
+        finally:
+            self._queue(gate, -1, background)
+            admission_wait_seconds.observe(time.monotonic() - started, **{"class": klass})
+
+        gate.in_flight += 1
+        try:
+            yield remaining()
+        finally:
+            gate.in_flight -= 1
+            gate.semaphore.release()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            name: {"limit": gate.limit, "in_flight": gate.in_flight, "waiting": gate.waiting}
+            for name, gate in self.gates.items()
+        }
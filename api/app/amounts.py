@@ -0,0 +1,36 @@
+from decimal import Decimal
+from typing import Any, Dict, List
+from fastapi.encoders import jsonable_encoder
+
+COIN = 100_000_000
+
+def btc_to_sat(value: Any) -> int:
+    """
+    Converte um valor em BTC (Decimal, str ou float vindo do RPC) para satoshis
+    """
+    return int((Decimal(str(value)) * COIN).to_integral_value())
+
+def sat_to_btc(value: int) -> Decimal:
+    """
+    Converte satoshis para BTC sem perder precisão (sempre com 8 casas)
+    """
+    sign = "-" if value < 0 else ""
+    whole, frac = divmod(abs(value), COIN)
+    return Decimal(f"{sign}{whole}.{frac:08d}")
+
+def script_addresses(script_pub_key: Dict[str, Any]) -> List[str]:
+    """
+    Endereços de um scriptPubKey decodificado; versões novas do bitcoind
+    usam o campo "address", as antigas a lista "addresses"
+    """
+    if "address" in script_pub_key:
+        return [script_pub_key["address"]]
+    return script_pub_key.get("addresses", [])
+
+def json_default(value: Any) -> Any:
+    """
+    Tipos fora do JSON (ex.: os Decimal de sat_to_btc) convertidos como nas
+    respostas do FastAPI, para corpos montados com json.dumps (cache de
+    respostas, streaming, eventos) terem os mesmos tipos
+    """
+    return jsonable_encoder(value)
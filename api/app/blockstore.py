@@ -0,0 +1,455 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from .amounts import btc_to_sat, sat_to_btc
+from .rawblock import node_difficulty
+import asyncio
+import fcntl
+import itertools
+import logging
+import mmap
+import os
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"BLKSTOR1"
+# Cabeçalho do índice: magic, altura base, número de blocos válidos, geração
+INDEX_HEADER = struct.Struct("<8sQQQ")
+# Um registro por altura: offset das transações no arquivo de dados, hash,
+# hash anterior, merkle root, time, nonce, dificuldade, nº de transações, size, weight
+BLOCK_RECORD = struct.Struct("<Q32s32s32sIIdIII")
+# Um registro por transação: txid, size, vsize, taxa (sats, -1 se desconhecida),
+# nº de inputs, nº de outputs, total dos outputs (sats)
+TX_RECORD = struct.Struct("<32sIIqIIQ")
+UNKNOWN_FEE = -1
+
+@dataclass
+class BlockStoreConfig:
+    enabled: bool = True
+    path: str = "data/blockstore"
+    start_height: int = 0
+    poll_interval: float = 2.0
+    batch_size: int = 10            # blocos por lote de getblock quando o armazenamento busca sozinho
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv("BLOCK_STORE_ENABLED", "1") not in ("0", "false", "no"),
+            path=os.getenv("BLOCK_STORE_PATH", "data/blockstore"),
+            start_height=int(os.getenv("BLOCK_STORE_START_HEIGHT", "0")),
+            poll_interval=float(os.getenv("BLOCK_STORE_POLL_INTERVAL", "2")),
+            batch_size=int(os.getenv("BLOCK_STORE_BATCH_SIZE", "10"))
+        )
+
+def encode_block(summary: Dict[str, Any], previous_hash: Optional[str], data_offset: int) -> Tuple[bytes, bytes]:
+    """
+    Serializa o resumo de um bloco (formato de summarize_block) no registro
+    do índice e nos registros de transação
+    """
+    record = BLOCK_RECORD.pack(
+        data_offset,
+        bytes.fromhex(summary["hash"]),
+        bytes.fromhex(previous_hash) if previous_hash else bytes(32),
+        bytes.fromhex(summary["merkle_root"]),
+        summary["time"],
+        summary["nonce"],
+        float(summary["difficulty"]),
+        len(summary["transactions"]),
+        summary["size"],
+        summary["weight"]
+    )
+    txs = b"".join(
+        TX_RECORD.pack(
+            bytes.fromhex(tx["txid"]),
+            tx["size"],
+            tx["vsize"],
+            UNKNOWN_FEE if tx["fee"] is None else btc_to_sat(tx["fee"]),
+            tx["input_count"],
+            tx["output_count"],
+            btc_to_sat(tx["total_output"])
+        )
+        for tx in summary["transactions"]
+    )
+    return record, txs
+
+def decode_tx(data, offset: int, position: int) -> Dict[str, Any]:
+    txid, size, vsize, fee, input_count, output_count, total_output = TX_RECORD.unpack_from(data, offset)
+    if fee == UNKNOWN_FEE:
+        fee_value = None
+    elif position == 0:
+        fee_value = "0"  # A primeira transação é sempre a coinbase
+    else:
+        fee_value = sat_to_btc(fee)
+    return {
+        "txid": txid.hex(),
+        "size": size,
+        "vsize": vsize,
+        "fee": fee_value,
+        "input_count": input_count,
+        "output_count": output_count,
+        "total_output": sat_to_btc(total_output)
+    }
+
+class _MappedFile:
+    """
+    Arquivo mapeado só para leitura, remapeado quando cresce além do trecho
+    já mapeado. Os arquivos nunca encolhem (um reorg só recua o número de
+    blocos válidos), então um mapeamento antigo nunca aponta para fora do arquivo.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+
+    def view(self, end: int) -> Optional[mmap.mmap]:
+        if self._map is not None and len(self._map) >= end:
+            return self._map
+        if self._fd is None:
+            if not os.path.exists(self.path):
+                return None
+            self._fd = os.open(self.path, os.O_RDONLY)
+        size = os.fstat(self._fd).st_size
+        if size < end or size == 0:
+            return None
+        if self._map is not None:
+            self._map.close()
+        self._map = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ)
+        return self._map
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        if self._fd is not None:
+            os.close(self._fd)
+        self._map, self._fd = None, None
+
+class BlockStore:
+    """
+    Armazenamento persistente e append-only dos resumos de bloco, indexado
+    por altura (registro de tamanho fixo). Não há índice por hash: as rotas
+    e o índice de endereços sempre conhecem a altura, e o hash gravado em
+    cada registro serve para conferir se o bloco ainda é o da chain ativa.
+
+    O índice (blocks.idx) tem um registro por altura e o arquivo de dados
+    (txs.dat) os registros de transação de cada bloco em sequência. As
+    leituras usam mmap, então vários workers compartilham a mesma cópia no
+    page cache. Só o processo que obtém o lock (blocks.lock) escreve; um
+    reorg recua o número de blocos válidos e incrementa a geração, que os
+    leitores conferem antes e depois de cada leitura.
+
+    Os blocos chegam de preferência já buscados pelo índice de endereços
+    (`extend`); o armazenamento só busca sozinho, em lotes, as alturas que
+    o índice já passou ou quando ele não está acompanhando o tip.
+    """
+    def __init__(self, config: BlockStoreConfig):
+        self.config = config
+        self.index_path = os.path.join(config.path, "blocks.idx")
+        self.data_path = os.path.join(config.path, "txs.dat")
+        self.lock_path = os.path.join(config.path, "blocks.lock")
+        self.synced = False
+        self._index = _MappedFile(self.index_path)
+        self._data = _MappedFile(self.data_path)
+        self._read_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._lock_fd: Optional[int] = None
+        self._index_fd: Optional[int] = None
+        self._data_fd: Optional[int] = None
+        # Estado do escritor
+        self.base = config.start_height
+        self.count = 0
+        self.generation = 0
+        self.tip_hash: Optional[str] = None
+        self.data_end = 0
+        self._node_height = -1
+
+    def open(self):
+        os.makedirs(self.config.path, exist_ok=True)
+
+    def close(self):
+        for fd in (self._index_fd, self._data_fd, self._lock_fd):
+            if fd is not None:
+                os.close(fd)
+        self._index_fd = self._data_fd = self._lock_fd = None
+        with self._read_lock:
+            self._index.close()
+            self._data.close()
+
+    @property
+    def writer(self) -> bool:
+        return self._lock_fd is not None
+
+    def status(self) -> Dict[str, Any]:
+        with self._read_lock:
+            base, count, generation = self._header() or (self.base, 0, 0)
+        return {
+            "writer": self.writer,
+            "synced": self.synced,
+            "first_height": base,
+            "height": base + count - 1 if count else None,
+            "generation": generation
+        }
+
+    # Escrita ---------------------------------------------------------------------
+
+    def _acquire(self) -> bool:
+        """
+        Tenta se tornar o processo escritor (lock exclusivo não bloqueante)
+        """
+        if self._lock_fd is not None:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        self._index_fd = os.open(self.index_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._data_fd = os.open(self.data_path, os.O_RDWR | os.O_CREAT, 0o644)
+        header = os.pread(self._index_fd, INDEX_HEADER.size, 0)
+        magic, base, count, generation = INDEX_HEADER.unpack(header) if len(header) == INDEX_HEADER.size else (None, 0, 0, 0)
+        if magic != MAGIC or base != self.config.start_height:
+            # Arquivo novo ou altura inicial alterada: recomeça do zero
+            base, count, generation = self.config.start_height, 0, generation + 1
+            self._write_header(base, count, generation)
+        self.base, self.count, self.generation = base, count, generation
+        self._load_tip()
+        return True
+
+    def _write_header(self, base: int, count: int, generation: int):
+        os.pwrite(self._index_fd, INDEX_HEADER.pack(MAGIC, base, count, generation), 0)
+
+    def _record_offset(self, position: int) -> int:
+        return INDEX_HEADER.size + position * BLOCK_RECORD.size
+
+    def _load_tip(self):
+        if self.count == 0:
+            self.tip_hash, self.data_end = None, 0
+            return
+        raw = os.pread(self._index_fd, BLOCK_RECORD.size, self._record_offset(self.count - 1))
+        record = BLOCK_RECORD.unpack(raw)
+        self.tip_hash = record[1].hex()
+        self.data_end = record[0] + record[7] * TX_RECORD.size
+
+    def _append(self, summary: Dict[str, Any], previous_hash: Optional[str]):
+        record, txs = encode_block(summary, previous_hash, self.data_end)
+        # Dados primeiro, depois o registro e por último o contador: um
+        # leitor nunca enxerga um bloco pela metade
+        os.pwrite(self._data_fd, txs, self.data_end)
+        os.pwrite(self._index_fd, record, self._record_offset(self.count))
+        self.count += 1
+        self._write_header(self.base, self.count, self.generation)
+        self.tip_hash = summary["hash"]
+        self.data_end += len(txs)
+
+    def _append_chained(self, blocks: List[Any]) -> int:
+        """
+        Grava em ordem os resumos (com o hash do bloco anterior) que
+        continuam o topo atual; para no primeiro que não continua (ou que
+        falhou) e retorna quantos gravou
+        """
+        appended = 0
+        with self._write_lock:
+            for block in blocks:
+                if isinstance(block, Exception):
+                    break
+                summary, previous_hash = block
+                if summary["height"] != self.base + self.count:
+                    break
+                if self.count and previous_hash != self.tip_hash:
+                    break
+                self._append(summary, previous_hash)
+                appended += 1
+        return appended
+
+    def _truncate(self, stale_hash: str):
+        with self._write_lock:
+            # Outra tarefa já mudou o topo desde a consulta ao node
+            if self.tip_hash != stale_hash:
+                return
+            height = self.base + self.count - 1
+            self.count -= 1
+            self.generation += 1
+            self._write_header(self.base, self.count, self.generation)
+            self._load_tip()
+        logger.info(f"Block store: bloco {height} removido (reorg)")
+
+    def _extend(self, blocks: List[Dict[str, Any]], summarize: Callable[[Dict[str, Any]], Dict[str, Any]]) -> int:
+        pending = [
+            (summarize(block), block.get("previousblockhash"))
+            for block in blocks if block["height"] >= self.base + self.count
+        ]
+        return self._append_chained(pending)
+
+    async def extend(self, blocks: List[Dict[str, Any]], summarize: Callable[[Dict[str, Any]], Dict[str, Any]]) -> int:
+        """
+        Acrescenta blocos já buscados por outro componente (getblock com
+        verbosity 2, ex.: pelo índice de endereços) que continuam o topo
+        atual; os demais são ignorados. Retorna quantos gravou.
+        """
+        if not blocks or not await asyncio.to_thread(self._acquire):
+            return 0
+        return await asyncio.to_thread(self._extend, blocks, summarize)
+
+    async def sync_step(self, rpc, fetch: Callable[[Any, List[Tuple[str, int]]], Awaitable[List[Any]]],
+                        limit: Optional[int] = None) -> bool:
+        """
+        Acrescenta um lote de blocos buscados com `fetch` (resumo e hash do
+        bloco anterior de cada (hash, altura)) até a altura `limit`, ou
+        remove o topo em caso de reorg. Retorna False quando não há o que
+        buscar ou quando outro processo é o escritor.
+        """
+        if not await asyncio.to_thread(self._acquire):
+            return False
+
+        top = self.base + self.count - 1
+        tip_hash = self.tip_hash
+        window = 1 if top >= self._node_height else max(self.config.batch_size, 1)
+        last = top + window if limit is None else min(top + window, limit)
+        calls = [("getblockcount", [])]
+        if self.count:
+            calls.append(("getblockhash", [top]))
+        calls.extend(("getblockhash", [height]) for height in range(top + 1, last + 1))
+        tip, *hashes = await rpc.batch(calls, return_exceptions=True)
+        if isinstance(tip, Exception):
+            raise tip
+        self._node_height = tip
+
+        # O bloco do topo saiu da chain ativa: remove e tenta de novo
+        if self.count:
+            current_hash = hashes.pop(0)
+            if current_hash != tip_hash:
+                await asyncio.to_thread(self._truncate, tip_hash)
+                return True
+
+        self.synced = top >= tip
+        # Alturas acima do tip não existem: o lote termina no primeiro erro
+        hashes = list(itertools.takewhile(lambda block_hash: not isinstance(block_hash, Exception), hashes))
+        if not hashes:
+            return False
+
+        blocks = await fetch(rpc, [(block_hash, top + 1 + i) for i, block_hash in enumerate(hashes)])
+        if not await asyncio.to_thread(self._append_chained, blocks):
+            if isinstance(blocks[0], Exception):
+                raise blocks[0]
+            # O primeiro bloco não continua o topo (reorg entre as consultas) ou
+            # outra tarefa já o gravou
+            if self.tip_hash == tip_hash and self.count:
+                await asyncio.to_thread(self._truncate, tip_hash)
+        return True
+
+    async def run(self, rpc, fetch: Callable[[Any, List[Tuple[str, int]]], Awaitable[List[Any]]],
+                  limit: Optional[Callable[[], Optional[int]]] = None):
+        """
+        Preenche o armazenamento em background seguindo a chain; `limit`
+        devolve a altura até onde buscar sozinho (None: até o tip), acima
+        dela os blocos chegam por `extend`. Processos que não obtêm o lock
+        continuam tentando, para assumir a escrita se o escritor atual terminar.
+        """
+        while True:
+            try:
+                if await self.sync_step(rpc, fetch, None if limit is None else limit()):
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                logger.warning(f"Erro no block store: {ex}")
+            await asyncio.sleep(self.config.poll_interval)
+
+    # Leitura ---------------------------------------------------------------------
+
+    def _header(self) -> Optional[Tuple[int, int, int]]:
+        index = self._index.view(INDEX_HEADER.size)
+        if index is None:
+            return None
+        magic, base, count, generation = INDEX_HEADER.unpack_from(index, 0)
+        if magic != MAGIC:
+            return None
+        return base, count, generation
+
+    def _read_block(self, height: int, offset: int, end: Optional[int]) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        state = self._header()
+        if state is None:
+            return None
+        base, count, generation = state
+        position = height - base
+        if position < 0 or position >= count:
+            return None
+        record_offset = self._record_offset(position)
+        index = self._index.view(record_offset + BLOCK_RECORD.size)
+        if index is None:
+            return None
+        (data_offset, block_hash, _, merkle_root, block_time, nonce,
+         difficulty, num_tx, size, weight) = BLOCK_RECORD.unpack_from(index, record_offset)
+
+        start = min(offset, num_tx)
+        stop = num_tx if end is None else min(end, num_tx)
+        transactions = []
+        if stop > start:
+            data = self._data.view(data_offset + stop * TX_RECORD.size)
+            if data is None:
+                return None
+            transactions = [
+                decode_tx(data, data_offset + position_in_block * TX_RECORD.size, position_in_block)
+                for position_in_block in range(start, stop)
+            ]
+
+        # O escritor recuou o topo durante a leitura: os registros podem ter sido sobrescritos
+        after = self._header()
+        if after is None or after[2] != generation:
+            return None
+        header = {
+            "height": height,
+            "hash": block_hash.hex(),
+            "time": block_time,
+            "nonce": nonce,
+            "difficulty": node_difficulty(difficulty),
+            "num_transactions": num_tx,
+            "size": size,
+            "weight": weight,
+            "merkle_root": merkle_root.hex()
+        }
+        return header, transactions
+
+    def _read_headers(self, first: int, last: int) -> List[Tuple[str, Optional[str], int]]:
+        state = self._header()
+        if state is None:
+            return []
+        base, count, generation = state
+        start, stop = first - base, min(last - base + 1, count)
+        if start < 0 or start >= stop:
+            return []
+        index = self._index.view(self._record_offset(stop))
+        if index is None:
+            return []
+        headers = []
+        for position in range(start, stop):
+            record = BLOCK_RECORD.unpack_from(index, self._record_offset(position))
+            previous_hash = record[2].hex() if record[2] != bytes(32) else None
+            headers.append((record[1].hex(), previous_hash, record[4]))
+        after = self._header()
+        if after is None or after[2] != generation:
+            return []
+        return headers
+
+    async def headers(self, first: int, last: int) -> List[Tuple[str, Optional[str], int]]:
+        """
+        Hash, hash anterior e time das alturas [first, last] já armazenadas,
+        consecutivas a partir de first (vazio se first ainda não está aqui)
+        """
+        def _headers():
+            with self._read_lock:
+                return self._read_headers(first, last)
+        return await asyncio.to_thread(_headers)
+
+    async def read(self, height: int, offset: int = 0,
+                   end: Optional[int] = None) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Cabeçalho do bloco e as transações [offset:end], ou None se a altura
+        ainda não está no armazenamento
+        """
+        def _read():
+            with self._read_lock:
+                return self._read_block(height, offset, end)
+        return await asyncio.to_thread(_read)
@@ -0,0 +1,284 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from .amounts import json_default
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+# Campos de uma transação decodificada que mudam conforme a chain avança
+VOLATILE_TX_FIELDS = ("confirmations", "blockhash", "blocktime", "time", "hex")
+
+@dataclass
+class CacheConfig:
+    block_bytes: int = 64 * 1024 * 1024
+    tx_bytes: int = 64 * 1024 * 1024
+    header_bytes: int = 8 * 1024 * 1024
+    response_bytes: int = 16 * 1024 * 1024
+    response_ttl: float = 10.0
+    tip_poll_interval: float = 2.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            block_bytes=int(os.getenv("CACHE_BLOCK_BYTES", str(64 * 1024 * 1024))),
+            tx_bytes=int(os.getenv("CACHE_TX_BYTES", str(64 * 1024 * 1024))),
+            header_bytes=int(os.getenv("CACHE_HEADER_BYTES", str(8 * 1024 * 1024))),
+            response_bytes=int(os.getenv("CACHE_RESPONSE_BYTES", str(16 * 1024 * 1024))),
+            response_ttl=float(os.getenv("CACHE_RESPONSE_TTL", "10")),
+            tip_poll_interval=float(os.getenv("TIP_POLL_INTERVAL", "2"))
+        )
+
+def stable_transaction(tx: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in tx.items() if k not in VOLATILE_TX_FIELDS}
+
+def estimate_size(value: Any) -> int:
+    """
+    Tamanho aproximado em bytes de um valor (pelo JSON serializado)
+    """
+    return len(json.dumps(value, default=str, separators=(",", ":")))
+
+class LRUCache:
+    """
+    Cache LRU com despejo por tamanho total em bytes, não por número de itens
+    """
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Hashable, tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None):
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        self.pop(key)
+        self._data[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._data.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> Any:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return None
+        self._bytes -= entry[1]
+        return entry[0]
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None
+        }
+
+class ChainCache:
+    """
+    Cache em memória de dados imutáveis da chain: resumos de blocos por hash,
+    cabeçalhos e estatísticas leves por hash, transações decodificadas por
+    txid e o mapa altura→hash, que é revalidado sempre que o tip muda para
+    tratar reorgs
+    """
+    def __init__(self, config: CacheConfig):
+        self.config = config
+        self.blocks = LRUCache("blocks", config.block_bytes)
+        self.transactions = LRUCache("transactions", config.tx_bytes)
+        self.headers = LRUCache("headers", config.header_bytes)
+        self.heights: Dict[int, str] = {}
+        self.height_hits = 0
+        self.height_misses = 0
+        self.tip_height: Optional[int] = None
+        self.tip_hash: Optional[str] = None
+        self.chain: Optional[str] = None
+        self.reorgs = 0
+
+    def hash_at(self, height: int) -> Optional[str]:
+        """
+        Hash do bloco na altura, se conhecido e ainda válido para o tip atual
+        """
+        block_hash = None
+        if self.tip_height is not None and height <= self.tip_height:
+            block_hash = self.heights.get(height)
+        if block_hash is None:
+            self.height_misses += 1
+        else:
+            self.height_hits += 1
+        return block_hash
+
+    def remember_height(self, height: int, block_hash: str):
+        # Alturas acima do último tip conhecido ainda não foram validadas por sync_tip
+        if self.tip_height is not None and height <= self.tip_height:
+            self.heights[height] = block_hash
+
+    def get_transaction(self, txid: str) -> Optional[Dict[str, Any]]:
+        return self.transactions.get(txid)
+
+    def put_transaction(self, tx: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Guarda o conteúdo imutável de uma transação (o txid compromete
+        inputs e outputs; confirmações e bloco ficam de fora)
+        """
+        stable = stable_transaction(tx)
+        self.transactions.put(tx["txid"], stable)
+        return stable
+
+    async def sync_tip(self, rpc) -> bool:
+        """
+        Consulta o tip do node e invalida as alturas que deixaram de
+        pertencer à chain ativa. Retorna True se o tip mudou.
+        """
+        info = await rpc.getblockchaininfo()
+        height, best = info["blocks"], info["bestblockhash"]
+        self.chain = info["chain"]
+        if best == self.tip_hash:
+            return False
+
+        old_height, old_hash = self.tip_height, self.tip_hash
+        if old_hash is not None:
+            # Se o tip antigo continua na chain ativa, tudo abaixo dele continua válido
+            still_active = old_height <= height and (await rpc.getblockhash(old_height)) == old_hash
+            if not still_active:
+                await self._revalidate_heights(rpc, height)
+
+        self.tip_height, self.tip_hash = height, best
+        self.heights[height] = best
+        return True
+
+    def adopt_tip(self, height: int, best: str, chain: str, reorgs: int) -> bool:
+        """
+        Assume o tip publicado pelo líder, sem consultar o node: se o líder
+        viu um reorg desde o último tip adotado, o mapa de alturas é
+        descartado inteiro. Retorna True se o tip mudou.
+        """
+        self.chain = chain
+        if best == self.tip_hash:
+            return False
+        if reorgs != self.reorgs:
+            self.heights.clear()
+            self.reorgs = reorgs
+        self.tip_height, self.tip_hash = height, best
+        self.heights[height] = best
+        return True
+
+    async def _revalidate_heights(self, rpc, tip_height: int):
+        """
+        Após um reorg, descarta as alturas cujo hash saiu da chain ativa e,
+        junto, os blocos e cabeçalhos guardados para esses hashes. Alturas
+        que o node não confirmou (erro na consulta) saem só do mapa.
+        """
+        self.reorgs += 1
+        stale = [h for h in self.heights if h > tip_height]
+        known = sorted(h for h in self.heights if h <= tip_height)
+        results = await rpc.batch([("getblockhash", [h]) for h in known], return_exceptions=True)
+        for height, actual in zip(known, results):
+            if isinstance(actual, Exception):
+                del self.heights[height]
+            elif actual != self.heights[height]:
+                stale.append(height)
+        for height in stale:
+            block_hash = self.heights.pop(height)
+            self.blocks.pop(block_hash)
+            self.headers.pop(block_hash)
+            self.headers.pop(("stats", block_hash))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.height_hits + self.height_misses
+        return {
+            "blocks": self.blocks.stats(),
+            "transactions": self.transactions.stats(),
+            "headers": self.headers.stats(),
+            "heights": {
+                "entries": len(self.heights),
+                "hits": self.height_hits,
+                "misses": self.height_misses,
+                "hit_ratio": round(self.height_hits / lookups, 4) if lookups else None
+            },
+            "tip": {"height": self.tip_height, "hash": self.tip_hash},
+            "reorgs": self.reorgs
+        }
+
+class SingleFlight:
+    """
+    Coalescência de chamadas concorrentes: enquanto uma computação para a
+    chave estiver em andamento, as demais aguardam o mesmo resultado
+    """
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # shield: se quem iniciou a chamada desistir, os demais continuam esperando
+        return await asyncio.shield(task)
+
+class ResponseCache:
+    """
+    Cache de respostas JSON já serializadas, válidas enquanto a versão do
+    estado da chain (ex.: hash do tip, tamanho da mempool) não mudar e por
+    no máximo ttl segundos. Misses concorrentes compartilham uma única
+    computação e cada corpo carrega um ETag.
+    """
+    def __init__(self, max_bytes: int, ttl: float):
+        self.ttl = ttl
+        self._entries = LRUCache("responses", max_bytes)
+        self._flight = SingleFlight()
+
+    async def get(self, key: Hashable, version: Hashable,
+                  compute: Callable[[], Awaitable[Any]]) -> Tuple[bytes, str]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry_version, expires, body, etag = entry
+            if entry_version == version and expires > time.monotonic():
+                return body, etag
+
+        async def fill() -> Tuple[bytes, str]:
+            value = await compute()
+            body = json.dumps(value, default=json_default, separators=(",", ":")).encode()
+            etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            self._entries.put(key, (version, time.monotonic() + self.ttl, body, etag), size=len(body))
+            return body, etag
+
+        return await self._flight.do((key, version), fill)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._entries.stats()
+        stats["coalesced"] = self._flight.coalesced
+        stats["ttl"] = self.ttl
+        return stats
@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+from .amounts import json_default
+import asyncio
+import json
+
+# Intervalo entre comentários de keep-alive enviados a clientes ociosos
+HEARTBEAT_INTERVAL = 15.0
+
+class EventHub:
+    """
+    Distribui eventos compactos (novo bloco, mudanças na mempool, resumo da
+    rede) para todos os clientes conectados. Os eventos são produzidos uma
+    única vez pelas tarefas de background, então a carga no node não
+    depende do número de clientes.
+    """
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self._sequence = 0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def last(self, kind: str) -> Optional[Dict[str, Any]]:
+        return self._last.get(kind)
+
+    def publish(self, kind: str, data: Dict[str, Any]):
+        self._sequence += 1
+        event = (self._sequence, kind, data)
+        self._last[kind] = data
+        for queue in self._subscribers:
+            if queue.full():
+                # Cliente lento: descarta o evento mais antigo em vez de bloquear os demais
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    @contextmanager
+    def subscribe(self):
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self._last)
+
+def format_sse(event_id: Optional[int], kind: str, data: Dict[str, Any]) -> bytes:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {kind}")
+    lines.append(f"data: {json.dumps(data, default=json_default, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+async def sse_stream(hub: EventHub) -> AsyncIterator[bytes]:
+    """
+    Stream text/event-stream de um cliente: primeiro o último estado
+    conhecido de cada tipo de evento, depois os eventos novos
+    """
+    with hub.subscribe() as queue:
+        yield b"retry: 5000\n\n"
+        for kind, data in hub.snapshot().items():
+            yield format_sse(None, kind, data)
+        while True:
+            try:
+                event: Tuple[int, str, Dict[str, Any]] = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            yield format_sse(*event)
@@ -0,0 +1,427 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from .amounts import btc_to_sat, script_addresses
+import asyncio
+import fcntl
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    height INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    time INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    txid TEXT NOT NULL,
+    vout INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    spent_txid TEXT,
+    spent_height INTEGER,
+    PRIMARY KEY (txid, vout)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS outputs_address ON outputs (address, spent_height);
+CREATE INDEX IF NOT EXISTS outputs_height ON outputs (height);
+CREATE INDEX IF NOT EXISTS outputs_spent_height ON outputs (spent_height);
+CREATE TABLE IF NOT EXISTS tx_locations (
+    key INTEGER PRIMARY KEY,
+    height INTEGER NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tx_locations_height ON tx_locations (height);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+LOCATE_CHUNK = 500
+
+def tx_key(txid: str) -> int:
+    """
+    Chave do localizador de transações: os 8 primeiros bytes do txid como
+    inteiro com sinal (rowid do SQLite). Colisões são raras e inofensivas:
+    a localização é só uma dica, conferida pelo node com o hash do bloco.
+    """
+    return int.from_bytes(bytes.fromhex(txid[:16]), "big", signed=True)
+
+@dataclass
+class IndexerConfig:
+    enabled: bool = True
+    path: str = "data/address_index.sqlite"
+    poll_interval: float = 2.0
+    batch_size: int = 100           # máximo de blocos por lote de getblock durante a sincronização
+    batch_txs: int = 20000          # alvo de transações por lote (blocos cheios vêm em lotes menores)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv("ADDRESS_INDEX_ENABLED", "1") not in ("0", "false", "no"),
+            path=os.getenv("ADDRESS_INDEX_PATH", "data/address_index.sqlite"),
+            poll_interval=float(os.getenv("ADDRESS_INDEX_POLL_INTERVAL", "2")),
+            batch_size=int(os.getenv("ADDRESS_INDEX_BATCH_SIZE", "100")),
+            batch_txs=int(os.getenv("ADDRESS_INDEX_BATCH_TXS", "20000"))
+        )
+
+class AddressIndex:
+    """
+    Índice persistente (SQLite) de endereço → outputs, alimentado bloco a bloco.
+
+    Cada output guarda a altura em que foi criado e, quando gasto, a altura
+    do gasto; isso serve como dado de undo: desfazer um bloco é apagar os
+    outputs criados nele e limpar os gastos feitos nele.
+
+    Também mantém o localizador txid → (altura, posição no bloco), que
+    com a tabela de blocos dá o hash e o horário do bloco de cada
+    transação confirmada sem consultar o node.
+    """
+    def __init__(self, config: IndexerConfig):
+        self.config = config
+        self.height = -1
+        self.tip_hash: Optional[str] = None
+        self.chain: Optional[str] = None
+        self.synced = False
+        # Primeira altura coberta pelo localizador (bancos criados antes dele começam no tip)
+        self.locator_from = 0
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self._lock_fd: Optional[int] = None
+        # Blocos do próximo lote, ajustado pelo número de transações do
+        # anterior, e a altura do node na última consulta
+        self._window = 1
+        self._node_height = -1
+        # Altura até a qual os blocos já foram entregues a on_blocks (os
+        # indexados antes deste processo virar escritor contam como entregues)
+        self.delivered_height = -1
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.config.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def open(self):
+        """
+        Abre (ou cria) o banco e carrega a altura já indexada
+        """
+        directory = os.path.dirname(self.config.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._writer = self._connect()
+        had_locator = self._writer.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tx_locations'"
+        ).fetchone() is not None
+        self._writer.executescript(SCHEMA)
+        self._reader = self._connect()
+        row = self._writer.execute("SELECT height, hash FROM blocks ORDER BY height DESC LIMIT 1").fetchone()
+        if row is not None:
+            self.height, self.tip_hash = row
+        if not had_locator and row is not None:
+            with self._writer:
+                self._writer.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('locator_from', ?)", (str(self.height + 1),)
+                )
+        row = self._writer.execute("SELECT value FROM meta WHERE key = 'locator_from'").fetchone()
+        if row is not None:
+            self.locator_from = int(row[0])
+        row = self._writer.execute("SELECT value FROM meta WHERE key = 'chain'").fetchone()
+        if row is not None:
+            self.chain = row[0]
+
+    def close(self):
+        for conn in (self._writer, self._reader):
+            if conn is not None:
+                conn.close()
+        self._writer = self._reader = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    @property
+    def writer(self) -> bool:
+        return self._lock_fd is not None
+
+    @property
+    def ready(self) -> bool:
+        return self.synced and self._reader is not None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "writer": self.writer,
+            "height": self.height,
+            "hash": self.tip_hash,
+            "synced": self.synced,
+            "locator_from": self.locator_from
+        }
+
+    # Escrita ---------------------------------------------------------------------
+
+    def _acquire(self) -> bool:
+        """
+        Tenta se tornar o processo escritor (com vários workers, só um
+        alimenta o banco; os demais leem o que ele grava)
+        """
+        if self._lock_fd is not None:
+            return True
+        fd = os.open(self.config.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        # O escritor anterior pode ter parado no meio: recarrega o estado do banco
+        self._refresh()
+        self._set_synced(False)
+        self.delivered_height = self.height
+        return True
+
+    def _refresh(self):
+        """
+        Recarrega do banco a altura indexada e o estado do escritor
+        """
+        row = self._read("SELECT height, hash FROM blocks ORDER BY height DESC LIMIT 1", ())
+        self.height, self.tip_hash = row[0] if row else (-1, None)
+        meta = dict(self._read("SELECT key, value FROM meta", ()))
+        self.chain = meta.get("chain")
+        self.locator_from = int(meta.get("locator_from", 0))
+        self.synced = meta.get("synced") == "1"
+
+    def _set_synced(self, synced: bool):
+        with self._write_lock, self._writer:
+            self._writer.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('synced', ?)", ("1" if synced else "0",))
+        self.synced = synced
+
+    def _hash_at(self, height: int) -> Optional[str]:
+        row = self._writer.execute("SELECT hash FROM blocks WHERE height = ?", (height,)).fetchone()
+        return row[0] if row else None
+
+    def _apply_block(self, block: Dict[str, Any]):
+        height = block["height"]
+        with self._write_lock, self._writer:
+            for tx in block["tx"]:
+                txid = tx["txid"]
+                spends = [(txid, height, vin["txid"], vin["vout"]) for vin in tx["vin"] if "txid" in vin]
+                self._writer.executemany(
+                    "UPDATE outputs SET spent_txid = ?, spent_height = ? WHERE txid = ? AND vout = ?",
+                    spends
+                )
+                created = []
+                for vout in tx["vout"]:
+                    addresses = script_addresses(vout["scriptPubKey"])
+                    if len(addresses) == 1:
+                        created.append((txid, vout["n"], addresses[0], btc_to_sat(vout["value"]), height))
+                self._writer.executemany(
+                    "INSERT OR REPLACE INTO outputs (txid, vout, address, value, height) VALUES (?, ?, ?, ?, ?)",
+                    created
+                )
+            self._writer.executemany(
+                "INSERT OR REPLACE INTO tx_locations (key, height, position) VALUES (?, ?, ?)",
+                [(tx_key(tx["txid"]), height, position) for position, tx in enumerate(block["tx"])]
+            )
+            self._writer.execute(
+                "INSERT OR REPLACE INTO blocks (height, hash, time) VALUES (?, ?, ?)",
+                (height, block["hash"], block["time"])
+            )
+        self.height, self.tip_hash = height, block["hash"]
+
+    def _undo_tip(self):
+        height = self.height
+        with self._write_lock, self._writer:
+            self._writer.execute("DELETE FROM outputs WHERE height = ?", (height,))
+            self._writer.execute(
+                "UPDATE outputs SET spent_txid = NULL, spent_height = NULL WHERE spent_height = ?",
+                (height,)
+            )
+            self._writer.execute("DELETE FROM tx_locations WHERE height = ?", (height,))
+            self._writer.execute("DELETE FROM blocks WHERE height = ?", (height,))
+        self.height = height - 1
+        self.delivered_height = min(self.delivered_height, self.height)
+        self.tip_hash = self._hash_at(self.height)
+        logger.info(f"Índice de endereços: bloco {height} desfeito (reorg)")
+
+    def _set_chain(self, chain: str):
+        with self._write_lock, self._writer:
+            self._writer.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('chain', ?)", (chain,))
+        self.chain = chain
+
+    def _apply_blocks(self, blocks: List[Any]) -> int:
+        """
+        Aplica em ordem os blocos que encadeiam no topo atual; para no
+        primeiro que não encadeia (ou que falhou) e retorna quantos aplicou
+        """
+        applied = 0
+        for block in blocks:
+            if isinstance(block, Exception):
+                break
+            if self.height >= 0 and block.get("previousblockhash") != self.tip_hash:
+                break
+            self._apply_block(block)
+            applied += 1
+        return applied
+
+    async def sync_step(self, rpc, on_blocks: Optional[Callable[[List[Dict[str, Any]]], Awaitable[Any]]] = None) -> bool:
+        """
+        Avança um lote de blocos (ou desfaz o topo), entregando a on_blocks
+        os blocos aplicados (getblock com verbosity 2). Retorna False quando
+        já está no tip ou quando outro processo é o escritor.
+        """
+        if not await asyncio.to_thread(self._acquire):
+            # Outro worker alimenta o banco: acompanha a altura gravada por ele
+            await asyncio.to_thread(self._refresh)
+            return False
+
+        if self.chain is None:
+            info = await rpc.getblockchaininfo()
+            await asyncio.to_thread(self._set_chain, info["chain"])
+
+        # No tip basta olhar a próxima altura; atrás dele, um lote inteiro
+        window = 1 if self.height >= self._node_height else self._window
+        calls = [("getblockcount", [])]
+        if self.height >= 0:
+            calls.append(("getblockhash", [self.height]))
+        calls.extend(("getblockhash", [height]) for height in range(self.height + 1, self.height + 1 + window))
+        tip, *hashes = await rpc.batch(calls, return_exceptions=True)
+        if isinstance(tip, Exception):
+            raise tip
+        self._node_height = tip
+
+        # O bloco que temos no topo saiu da chain ativa: desfaz e tenta de novo
+        if self.height >= 0:
+            current_hash = hashes.pop(0)
+            if current_hash != self.tip_hash:
+                await asyncio.to_thread(self._undo_tip)
+                return True
+
+        # Alturas acima do tip não existem: o lote termina no primeiro erro
+        hashes = list(itertools.takewhile(lambda block_hash: not isinstance(block_hash, Exception), hashes))
+        if not hashes:
+            if self.synced != (self.height >= tip):
+                await asyncio.to_thread(self._set_synced, self.height >= tip)
+            return False
+
+        blocks = await rpc.batch([("getblock", [block_hash, 2]) for block_hash in hashes], return_exceptions=True)
+        applied = await asyncio.to_thread(self._apply_blocks, blocks)
+        if not applied:
+            if isinstance(blocks[0], Exception):
+                raise blocks[0]
+            # O primeiro bloco não encadeia no nosso topo (reorg entre as consultas)
+            await asyncio.to_thread(self._undo_tip)
+            return True
+        txs = sum(len(block["tx"]) for block in blocks[:applied])
+        self._window = max(1, min(self.config.batch_size, self.config.batch_txs * applied // max(txs, 1)))
+        try:
+            if on_blocks is not None:
+                await on_blocks(blocks[:applied])
+        finally:
+            self.delivered_height = self.height
+        return True
+
+    async def run(self, rpc, on_blocks: Optional[Callable[[List[Dict[str, Any]]], Awaitable[Any]]] = None):
+        """
+        Segue a chain em background, em lotes de blocos; on_blocks recebe
+        os blocos de cada lote aplicado (ex.: para o block store)
+        """
+        while True:
+            try:
+                if await self.sync_step(rpc, on_blocks):
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                logger.warning(f"Erro no índice de endereços: {ex}")
+            await asyncio.sleep(self.config.poll_interval)
+
+    async def follow(self):
+        """
+        Acompanha a altura gravada pelo escritor (outro processo), sem
+        consultar o node
+        """
+        while True:
+            try:
+                await asyncio.to_thread(self._refresh)
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                logger.warning(f"Erro ao ler o índice de endereços: {ex}")
+            await asyncio.sleep(self.config.poll_interval)
+
+    # Leitura ---------------------------------------------------------------------
+
+    def _read(self, sql: str, params: tuple) -> List[tuple]:
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def _address_summary(self, address: str) -> Dict[str, Any]:
+        unspent = self._read(
+            "SELECT txid, vout, value, height FROM outputs "
+            "WHERE address = ? AND spent_height IS NULL ORDER BY height, txid, vout",
+            (address,)
+        )
+        received, txs = self._read(
+            "SELECT COALESCE(SUM(value), 0), COUNT(DISTINCT txid) FROM outputs WHERE address = ?",
+            (address,)
+        )[0]
+        spent_txs = self._read(
+            "SELECT COUNT(DISTINCT spent_txid) FROM outputs "
+            "WHERE address = ? AND spent_txid IS NOT NULL AND spent_txid NOT IN "
+            "(SELECT txid FROM outputs WHERE address = ?)",
+            (address, address)
+        )[0][0]
+        return {
+            "unspent": unspent,
+            "received": received,
+            "tx_count": txs + spent_txs
+        }
+
+    async def address_summary(self, address: str) -> Dict[str, Any]:
+        """
+        Outputs não gastos (txid, vout, valor em satoshis, altura), total
+        recebido e número de transações de um endereço
+        """
+        return await asyncio.to_thread(self._address_summary, address)
+
+    async def address_summaries(self, addresses: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Resumos de vários endereços em uma única ida à thread de leitura
+        """
+        return await asyncio.to_thread(lambda: {address: self._address_summary(address) for address in addresses})
+
+    def _locate(self, txids: List[str]) -> Dict[str, Dict[str, Any]]:
+        keys = {tx_key(txid): txid for txid in txids}
+        ordered = list(keys)
+        located = {}
+        # Em partes, abaixo do limite de parâmetros por consulta do SQLite
+        for start in range(0, len(ordered), LOCATE_CHUNK):
+            chunk = ordered[start:start + LOCATE_CHUNK]
+            rows = self._read(
+                "SELECT l.key, l.height, l.position, b.hash, b.time FROM tx_locations l "
+                f"JOIN blocks b ON b.height = l.height WHERE l.key IN ({', '.join('?' * len(chunk))})",
+                tuple(chunk)
+            )
+            for key, height, position, block_hash, block_time in rows:
+                located[keys[key]] = {"height": height, "position": position, "hash": block_hash, "time": block_time}
+        return located
+
+    async def locate(self, txids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Bloco (altura, posição, hash e horário) das transações já indexadas;
+        as ausentes podem estar na mempool, em blocos ainda não indexados ou
+        abaixo de locator_from
+        """
+        txids = [txid for txid in dict.fromkeys(txids) if len(txid) == 64]
+        if not txids or self._reader is None:
+            return {}
+        try:
+            return await asyncio.to_thread(self._locate, txids)
+        except ValueError:
+            return {}  # txid que não é hexadecimal
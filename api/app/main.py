@@ -1,57 +1,232 @@
-from fastapi import FastAPI, HTTPException
-from bitcoin.rpc import RawProxy, JSONRPCError
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from bitcoin.rpc import JSONRPCError
+from fastapi.datastructures import DefaultPlaceholder
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, Any
-from dataclasses import dataclass
-from contextlib import contextmanager
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from typing import AsyncIterator, Callable, Dict, Any, FrozenSet, List, Literal, Optional, Tuple
+from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from .admission import AdmissionConfig, AdmissionController, AdmissionError, request_deadline
+from .amounts import btc_to_sat, json_default, sat_to_btc
+from .blockstore import BlockStore, BlockStoreConfig
+from .cache import CacheConfig, ChainCache, LRUCache, ResponseCache
+from .events import EventHub, sse_stream
+from .indexer import AddressIndex, IndexerConfig
+from .mempool import MempoolConfig, MempoolMirror
+from .metrics import (
+    SERVER_TIMING, RequestTiming, current_request, http_in_flight, http_requests,
+    http_response_bytes, http_rpc_calls, http_seconds, registry, server_timing
+)
+from .prefetch import PrefetchConfig, Prefetcher
+from .rawblock import RawBlock, node_difficulty, parse_block
+from .rpc import BitcoinConfig, BitcoinRPC
+from .shared import LeaderLock, SharedCache, SharedCacheConfig, workers
+from .stats import BLOCK_STATS_FIELDS, BlockStats, StatsConfig, fee_histogram
+from .transactions import SUMMARY_FIELDS, TRANSACTION_FIELDS, needs_prevouts, summarize_transaction
+import asyncio
+import json
+import logging
 import os
+import time
 import uvicorn
 
-@dataclass
-class BitcoinConfig:
-    host: str
-    port: str
-    user: str
-    password: str
-    
-    @classmethod
-    def from_env(cls):
-        return cls(
-            host=os.getenv("BITCOIN_RPC_HOST", "localhost"),
-            port=os.getenv("BITCOIN_RPC_PORT", "18443"),
-            user=os.getenv("BITCOIN_RPC_USER", "user"),
-            password=os.getenv("BITCOIN_RPC_PASSWORD", "pass")
-        )
-    
-    @property
-    def service_url(self) -> str:
-        return f"http://{self.user}:{self.password}@{self.host}:{self.port}"
-
-class BitcoinRPC:
-    def __init__(self, config: BitcoinConfig):
-        self.config = config
-        self._rpc = None
-    
-    def _create_connection(self) -> RawProxy:
-        """
-        Cria uma nova conexão RPC
-        """
-        return RawProxy(service_url=self.config.service_url)
-
-    @contextmanager
-    def get_rpc(self):
-        """
-        Context manager que garante uma conexão fresca para cada operação
-        """
-        try:
-            self._rpc = self._create_connection()
-            yield self._rpc
-        finally:
-            self._rpc = None
+logger = logging.getLogger(__name__)
 
 external_ip = os.getenv("EXTERNAL_IP", "localhost")
 print(f"Allowed origins: [http://localhost:9000, http://localhost:8080, http://{external_ip}:8001, http://{external_ip}, https://{external_ip}]")
-app = FastAPI(title="Bitcoin Block Explorer API")
+
+config = BitcoinConfig.from_env()
+admission = AdmissionController(AdmissionConfig.from_env())
+bitcoin = BitcoinRPC(config, admission)
+cache = ChainCache(CacheConfig.from_env())
+shared = SharedCache(SharedCacheConfig.from_env(), admission)
+leader = LeaderLock(shared.config.leader_path)
+responses = ResponseCache(cache.config.response_bytes, cache.config.response_ttl)
+address_index = AddressIndex(IndexerConfig.from_env())
+block_store = BlockStore(BlockStoreConfig.from_env())
+mempool = MempoolMirror(MempoolConfig.from_env(), shared)
+block_stats = BlockStats(StatsConfig.from_env(), shared)
+prefetcher = Prefetcher(PrefetchConfig.from_env(), cache, shared)
+events = EventHub()
+
+def publish_network():
+    """
+    Publica o resumo da rede (mesmo formato de /network/info) a partir do
+    estado já mantido em memória, sem chamadas RPC
+    """
+    if cache.tip_height is None or not mempool.loaded:
+        return
+    events.publish("network", {
+        "isTestnet": cache.chain != "main",
+        "networkName": cache.chain,
+        "lastBlock": cache.tip_height,
+        "mempoolSize": mempool.info["size"]
+    })
+
+def on_mempool_update(added: List[str], removed: List[str]):
+    previous = events.last("mempool")
+    if previous is not None and not added and not removed and previous["bytes"] == mempool.info["bytes"]:
+        return
+    events.publish("mempool", {
+        "size": mempool.info["size"],
+        "bytes": mempool.info["bytes"],
+        "added": len(added),
+        "removed": len(removed),
+        "total_fee": sat_to_btc(mempool.total_fee)
+    })
+    publish_network()
+
+# Chave do tip publicado pelo líder no estado compartilhado
+TIP_STATE = "tip"
+
+def publish_block(header: Dict[str, Any]):
+    events.publish("block", {
+        "height": header["height"],
+        "hash": header["hash"],
+        "time": header["time"],
+        "num_transactions": header["nTx"],
+        "previous_hash": header.get("previousblockhash")
+    })
+    publish_network()
+
+async def follow_tip():
+    """
+    Acompanha o tip do node para revalidar o cache de alturas em caso de reorg,
+    avisar os clientes conectados em /events sobre novos blocos, acordar o
+    prefetcher e publicar o tip para os demais workers
+    """
+    while True:
+        try:
+            if await cache.sync_tip(bitcoin):
+                prefetcher.notify()
+                header = await bitcoin.getblockheader(cache.tip_hash)
+                await shared.set_state({TIP_STATE: {
+                    "height": cache.tip_height,
+                    "hash": cache.tip_hash,
+                    "chain": cache.chain,
+                    "reorgs": cache.reorgs,
+                    "header": header
+                }})
+                publish_block(header)
+        except Exception as ex:
+            logger.warning(f"Erro ao acompanhar o tip: {ex}")
+        await asyncio.sleep(cache.config.tip_poll_interval)
+
+async def follow_shared_tip():
+    """
+    Acompanha o tip publicado pelo líder, sem consultar o node, e avisa os
+    clientes deste worker conectados em /events
+    """
+    while True:
+        try:
+            tip = (await shared.get_state([TIP_STATE])).get(TIP_STATE)
+            if tip is not None and cache.adopt_tip(tip["height"], tip["hash"], tip["chain"], tip["reorgs"]):
+                publish_block(tip["header"])
+        except Exception as ex:
+            logger.warning(f"Erro ao ler o tip compartilhado: {ex}")
+        await asyncio.sleep(cache.config.tip_poll_interval)
+
+def block_stats_limit() -> Optional[int]:
+    # Enquanto o block store sincroniza, as estatísticas esperam por ele para
+    # reaproveitar os cabeçalhos; no tip seguem sozinhas
+    status = block_store.status()
+    return None if status["synced"] or status["height"] is None else status["height"]
+
+def leader_tasks() -> List[asyncio.Task]:
+    """
+    Tarefas que consultam o node: rodam só no líder
+    """
+    tasks = [asyncio.create_task(follow_tip()), asyncio.create_task(mempool.run(bitcoin, on_mempool_update))]
+    if address_index.config.enabled:
+        tasks.append(asyncio.create_task(address_index.run(bitcoin, store_indexed_blocks)))
+    if block_store.config.enabled:
+        tasks.append(asyncio.create_task(block_store.run(bitcoin, fetch_block_summaries, block_store_limit)))
+    if block_stats.config.enabled:
+        # Cabeçalhos das alturas já no block store não voltam ao node
+        if block_store.config.enabled:
+            tasks.append(asyncio.create_task(block_stats.run(bitcoin, block_store.headers, block_stats_limit)))
+        else:
+            tasks.append(asyncio.create_task(block_stats.run(bitcoin)))
+    if prefetcher.config.enabled:
+        # No modo raw o resumo vem do hex; o prefetcher aquece só as transações
+        tasks.append(asyncio.create_task(prefetcher.run(bitcoin, None if RAW_BLOCKS else summarize_block)))
+    return tasks
+
+def follower_tasks() -> List[asyncio.Task]:
+    """
+    Tarefas dos demais workers: leem o que o líder publica (estado
+    compartilhado, índice de endereços e block store em disco)
+    """
+    tasks = [asyncio.create_task(follow_shared_tip()), asyncio.create_task(mempool.follow(on_mempool_update))]
+    if address_index.config.enabled:
+        tasks.append(asyncio.create_task(address_index.follow()))
+    if block_stats.config.enabled:
+        tasks.append(asyncio.create_task(block_stats.follow()))
+    return tasks
+
+async def stop_tasks(tasks: List[asyncio.Task]):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+async def supervise():
+    """
+    Roda as tarefas do líder ou as de seguidor conforme o lock de liderança,
+    verificado a cada intervalo do tip: se o líder terminar, um seguidor
+    assume. Sem cache compartilhado não há onde publicar o estado, então
+    cada processo segue o node sozinho.
+    """
+    tasks: List[asyncio.Task] = []
+    leading: Optional[bool] = None
+    try:
+        while True:
+            is_leader = not shared.enabled or leader.acquire()
+            if is_leader != leading:
+                await stop_tasks(tasks)
+                leading = is_leader
+                tasks = leader_tasks() if is_leader else follower_tasks()
+            await asyncio.sleep(cache.config.tip_poll_interval)
+    finally:
+        await stop_tasks(tasks)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Abre o pool de conexões RPC no startup e o fecha no shutdown
+    """
+    await bitcoin.start()
+    if shared.config.enabled:
+        await asyncio.to_thread(shared.open)
+    if address_index.config.enabled:
+        await asyncio.to_thread(address_index.open)
+    if block_store.config.enabled:
+        await asyncio.to_thread(block_store.open)
+    # Com vários workers só o líder consulta o node; os demais leem o que ele publica
+    tasks = [asyncio.create_task(supervise())]
+    try:
+        yield
+    finally:
+        await stop_tasks(tasks)
+        address_index.close()
+        block_store.close()
+        shared.close()
+        leader.release()
+        await bitcoin.close()
+
+class EncodedRoute(APIRoute):
+    """
+    Rota sem o modelo de resposta inferido da anotação (Dict[str, Any]): o
+    corpo passa só pelo jsonable_encoder, como nas respostas do cache e no
+    streaming, e os Decimal de sat_to_btc saem como números, não strings
+    """
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        if isinstance(kwargs.get("response_model"), DefaultPlaceholder):
+            kwargs["response_model"] = None
+        super().__init__(path, endpoint, **kwargs)
+
+app = FastAPI(title="Bitcoin Block Explorer API", lifespan=lifespan)
+app.router.route_class = EncodedRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -67,235 +242,895 @@ app.add_middleware(
     allow_headers=["*"],  # Permite todos os headers
 )
 
-config = BitcoinConfig.from_env()
-bitcoin = BitcoinRPC(config)
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """
+    Mede cada requisição (duração, chamadas RPC, tamanho da resposta) por
+    rota, define o prazo das chamadas ao node (REQUEST_DEADLINE) e, com
+    SERVER_TIMING=1, devolve o detalhamento no header Server-Timing
+    """
+    timing = RequestTiming()
+    token = current_request.set(timing)
+    deadline_token = request_deadline.set(time.monotonic() + admission.config.deadline)
+    http_in_flight.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        http_in_flight.dec()
+        current_request.reset(token)
+        request_deadline.reset(deadline_token)
+        # Rótulo pelo template da rota para não criar uma série por altura/txid
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        http_seconds.observe(elapsed, route=path)
+        http_rpc_calls.observe(timing.rpc_calls, route=path)
+        http_requests.inc(route=path, method=request.method, status=str(status))
+    length = response.headers.get("content-length")
+    if length is not None:
+        http_response_bytes.observe(int(length), route=path)
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = server_timing(timing, elapsed)
+    return response
+
+@app.exception_handler(AdmissionError)
+async def admission_error(request: Request, ex: AdmissionError) -> JSONResponse:
+    """
+    Chamadas recusadas pelo controle de admissão: 429/503 com Retry-After
+    """
+    return JSONResponse(
+        status_code=ex.status_code,
+        content={"detail": ex.detail},
+        headers={"Retry-After": str(ex.retry_after)}
+    )
+
+@registry.collector
+def collect_caches():
+    """
+    Contadores dos caches em memória, lidos no momento do scrape
+    """
+    stats = {**cache.stats(), "responses": responses.stats()}
+    caches = {name: stats[name] for name in ("blocks", "transactions", "headers", "heights", "responses")}
+    yield ("cache_hits_total", "counter", "Acertos por cache",
+           [({"cache": name}, values["hits"]) for name, values in caches.items()])
+    yield ("cache_misses_total", "counter", "Faltas por cache",
+           [({"cache": name}, values["misses"]) for name, values in caches.items()])
+    yield ("cache_hit_ratio", "gauge", "Proporção de acertos por cache",
+           [({"cache": name}, values["hit_ratio"]) for name, values in caches.items() if values["hit_ratio"] is not None])
+    yield ("cache_entries", "gauge", "Entradas por cache",
+           [({"cache": name}, values["entries"]) for name, values in caches.items()])
+    yield ("cache_bytes", "gauge", "Bytes ocupados por cache",
+           [({"cache": name}, values["bytes"]) for name, values in caches.items() if "bytes" in values])
+    yield ("cache_reorgs_total", "counter", "Reorgs detectados pelo cache de alturas", [({}, stats["reorgs"])])
+    yield ("events_subscribers", "gauge", "Clientes conectados em /events", [({}, events.subscribers)])
+    yield ("mempool_transactions", "gauge", "Transações no espelho da mempool", [({}, len(mempool.entries))])
+    gates = admission.status()
+    yield ("bitcoin_rpc_admission_in_flight", "gauge", "Chamadas ao node em andamento por classe",
+           [({"class": name}, gate["in_flight"]) for name, gate in gates.items()])
+    yield ("bitcoin_rpc_admission_waiting", "gauge", "Chamadas aguardando vaga por classe",
+           [({"class": name}, gate["waiting"]) for name, gate in gates.items()])
+
+async def cached_json(request: Request, key: Any, version: Any, compute) -> Response:
+    """
+    Responde pelo cache de respostas (versão = estado da chain de que a
+    resposta depende), com ETag e 304 Not Modified para If-None-Match
+    """
+    body, etag = await responses.get(key, version, compute)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.get("/")
-async def read_root():
+async def read_root() -> Dict[str, Any]:
     """
-    Endpoint de healthcheck
+    Endpoint de healthcheck: consulta o node a cada chamada (sem cache),
+    para refletir na hora uma queda do bitcoind
     """
     try:
-        with bitcoin.get_rpc() as rpc:
-            info = rpc.getblockchaininfo()
+        async with bitcoin.get_rpc() as rpc:
+            info = await rpc.getblockchaininfo()
             return {
                 "status": "ok", 
                 "message": "Connected to Bitcoin node",
                 "chain": info["chain"],
                 "blocks": info["blocks"]
             }
+    except AdmissionError:
+        raise
     except Exception as ex:
         raise HTTPException(status_code=503, detail=f"Bitcoin node connection error: {str(ex)}")
 
-@app.get("/blocks/{block_number}")
-async def get_block_by_number(block_number: int) -> Dict[str, Any]:
+# Limite de transações por página em /blocks/{block_number}
+MAX_BLOCK_PAGE = 5000
+# Transações buscadas por lote no modo paginado/stream sem cache
+BLOCK_TX_CHUNK = 200
+# Com BLOCK_FETCH_MODE=raw os blocos são baixados em hex (getblock verbosity 0)
+# e desserializados localmente; as taxas por transação não ficam disponíveis
+RAW_BLOCKS = os.getenv("BLOCK_FETCH_MODE", "verbose") == "raw"
+
+def summarize_tx(tx: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Resumo de uma transação dentro da listagem de um bloco
+    """
+    return {
+        "txid": tx["txid"],
+        "size": tx["size"],
+        "vsize": tx["vsize"],
+        "fee": sat_to_btc(btc_to_sat(tx["fee"])) if "fee" in tx else "0",
+        "input_count": len(tx["vin"]),
+        "output_count": len(tx["vout"]),
+        "total_output": sat_to_btc(sum(btc_to_sat(vout["value"]) for vout in tx["vout"]))
+    }
+
+def block_header(block_info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Campos de cabeçalho do resumo de um bloco (getblock com verbosity 1 ou 2)
+    """
+    return {
+        "height": block_info["height"],
+        "hash": block_info["hash"],
+        "time": block_info["time"],
+        "nonce": block_info["nonce"],
+        "difficulty": block_info["difficulty"],
+        "num_transactions": len(block_info["tx"]),
+        "size": block_info["size"],
+        "weight": block_info["weight"],
+        "merkle_root": block_info["merkleroot"]
+    }
+
+def summarize_block(block_info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Monta o resumo de um bloco (getblock com verbosity 2) usado pela API
+    """
+    summary = block_header(block_info)
+    # Processa as transações para incluir informações relevantes
+    summary["transactions"] = [summarize_tx(tx) for tx in block_info["tx"]]
+    return summary
+
+def summarize_raw_block(block: RawBlock, height: int) -> Dict[str, Any]:
+    """
+    Monta o resumo de um bloco desserializado localmente (mesmo formato de
+    summarize_block; a taxa de cada transação exigiria os prevouts e fica nula)
+    """
+    return {
+        "height": height,
+        "hash": block.hash,
+        "time": block.time,
+        "nonce": block.nonce,
+        "difficulty": node_difficulty(block.difficulty),
+        "num_transactions": len(block.transactions),
+        "size": block.size,
+        "weight": block.weight,
+        "merkle_root": block.merkle_root,
+        "transactions": [
+            {
+                "txid": tx.txid,
+                "size": tx.size,
+                "vsize": tx.vsize,
+                "fee": "0" if tx.is_coinbase else None,
+                "input_count": tx.input_count,
+                "output_count": tx.output_count,
+                "total_output": sat_to_btc(tx.total_output)
+            }
+            for tx in block.transactions
+        ]
+    }
+
+# Verbosity de getblock para resumir um bloco inteiro: hex no modo raw, detalhado no padrão
+BLOCK_VERBOSITY = 0 if RAW_BLOCKS else 2
+
+def summarize_fetched_block(block: Any, height: int) -> Dict[str, Any]:
+    """
+    Resume o resultado de getblock com BLOCK_VERBOSITY
+    """
+    if RAW_BLOCKS:
+        return summarize_raw_block(parse_block(bytes.fromhex(block)), height)
+    return summarize_block(block)
+
+async def build_block_summary(rpc, block_hash: str, height: int) -> Dict[str, Any]:
+    """
+    Busca e resume um bloco inteiro
+    """
+    return summarize_fetched_block(await rpc.getblock(block_hash, BLOCK_VERBOSITY), height)
+
+def previous_block_hash(block: Any) -> Optional[str]:
     """
-    Obtém informações de um bloco específico pelo seu número/altura
+    Hash do bloco anterior no resultado de getblock com BLOCK_VERBOSITY
+    """
+    if RAW_BLOCKS:
+        # Bytes 4 a 36 do cabeçalho, invertidos como o node exibe os hashes
+        previous = bytes.fromhex(block[8:72])[::-1].hex()
+        return None if previous == "00" * 32 else previous
+    return block.get("previousblockhash")
+
+async def fetch_block_summaries(rpc, blocks: List[Tuple[str, int]]) -> List[Any]:
+    """
+    Busca e resume vários blocos (hash, altura) em um único lote, com o
+    hash do bloco anterior de cada um (ou a exceção da busca)
+    """
+    fetched = await rpc.batch([("getblock", [block_hash, BLOCK_VERBOSITY]) for block_hash, _ in blocks],
+                              return_exceptions=True)
+    return [
+        block if isinstance(block, Exception) else (summarize_fetched_block(block, height), previous_block_hash(block))
+        for (_, height), block in zip(blocks, fetched)
+    ]
+
+async def store_indexed_blocks(blocks: List[Dict[str, Any]]):
+    """
+    Grava no block store os blocos que o índice de endereços acabou de
+    buscar, sem buscá-los de novo
+    """
+    if block_store.config.enabled:
+        await block_store.extend(blocks, summarize_block)
+
+def block_store_limit() -> Optional[int]:
+    # Com o índice ativo, ele entrega os blocos que busca: o block store só
+    # busca sozinho as alturas que o índice já entregou (lacunas) ou, se
+    # outro processo escreve o índice, as que ele já indexou
+    if not address_index.config.enabled:
+        return None
+    return address_index.delivered_height if address_index.writer else address_index.height
+
+async def fetch_block_summary(rpc, block_hash: str, height: int) -> Dict[str, Any]:
+    """
+    Busca e resume um bloco inteiro, guardando o resultado no cache; com
+    vários workers, um único processo do host consulta o node
+    """
+    summary = await shared.fill("blocks", block_hash, lambda: build_block_summary(rpc, block_hash, height))
+    cache.blocks.put(block_hash, summary)
+    return summary
+
+async def shared_lookup(lru: LRUCache, keys: List[str]) -> Dict[str, Any]:
+    """
+    Busca no cache compartilhado entre workers chaves ausentes do cache do
+    processo, guardando o que encontrar também no cache do processo
+    """
+    found = await shared.get_many(lru.name, keys)
+    for key, value in found.items():
+        lru.put(key, value)
+    return found
+
+async def resolve_block_hash(rpc, height: int) -> str:
+    """
+    Hash do bloco na altura (do cache, se ainda válido)
+    """
+    block_hash = cache.hash_at(height)
+    if block_hash is None:
+        block_hash = await rpc.getblockhash(height)
+        cache.remember_height(height, block_hash)
+    return block_hash
+
+async def read_stored_block(height: int, offset: int = 0,
+                            end: Optional[int] = None) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """
+    Bloco do block store, só se ele pertence à chain ativa: o hash gravado
+    tem de bater com o da altura no mapa do cache. Sem a altura no mapa,
+    vale o topo do store na altura do tip (o store é encadeado, então tudo
+    abaixo de um topo válido é válido) ou, por fim, getblockhash. Um bloco
+    que saiu da chain e que o escritor ainda não removeu nunca é servido.
+    """
+    if not block_store.config.enabled or height < 0:
+        return None
+    block_hash = cache.hash_at(height)
+    if block_hash is None and cache.tip_height is not None and height <= cache.tip_height:
+        top = await block_store.headers(cache.tip_height, cache.tip_height)
+        if top and top[0][0] == cache.tip_hash:
+            block_hash = (await block_store.headers(height, height) or [(None,)])[0][0]
+    stored = await block_store.read(height, offset, end)
+    if stored is None:
+        return None
+    if block_hash is None:
+        async with bitcoin.get_rpc() as rpc:
+            block_hash = await resolve_block_hash(rpc, height)
+    elif block_hash == stored[0]["hash"]:
+        cache.remember_height(height, block_hash)
+    return stored if stored[0]["hash"] == block_hash else None
+
+async def fetch_block_txs(rpc, block_hash: str, txids: List[str]) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Resume as transações indicadas de um bloco em lotes de BLOCK_TX_CHUNK,
+    sem carregar o bloco inteiro com verbosity 2
+    """
+    for start in range(0, len(txids), BLOCK_TX_CHUNK):
+        chunk = txids[start:start + BLOCK_TX_CHUNK]
+        txs = await rpc.batch([("getrawtransaction", [txid, 2, block_hash]) for txid in chunk])
+        yield [summarize_tx(tx) for tx in txs]
+
+def _page_fields(header: Dict[str, Any], offset: int, limit: Optional[int]) -> Dict[str, Any]:
+    total = header["num_transactions"]
+    end = total if limit is None else min(offset + limit, total)
+    return {"offset": offset, "limit": limit, "next_offset": end if end < total else None}
+
+async def stream_block(header: Dict[str, Any], offset: int, limit: Optional[int],
+                       chunks: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """
+    Serializa o resumo do bloco incrementalmente: cabeçalho primeiro e
+    as transações à medida que cada lote fica pronto
+    """
+    # Mesmo encoder e separadores da resposta sem streaming: só a entrega muda
+    head = json.dumps({**header, **_page_fields(header, offset, limit)}, default=json_default, separators=(",", ":"))
+    yield (head[:-1] + ',"transactions":[').encode()
+    first = True
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        body = ",".join(json.dumps(tx, default=json_default, separators=(",", ":")) for tx in chunk)
+        yield (body if first else "," + body).encode()
+        first = False
+    yield b"]}"
+
+async def _cached_chunks(transactions: List[Dict[str, Any]]) -> AsyncIterator[List[Dict[str, Any]]]:
+    for start in range(0, len(transactions), BLOCK_TX_CHUNK):
+        yield transactions[start:start + BLOCK_TX_CHUNK]
+
+# Limite de blocos por requisição em /blocks
+MAX_BLOCK_RANGE = 200
+
+@app.get("/blocks")
+async def list_blocks(
+    from_height: Optional[int] = Query(None, alias="from", ge=0),
+    to_height: Optional[int] = Query(None, alias="to", ge=0),
+    before: Optional[int] = Query(None, ge=1),
+    limit: int = Query(50, ge=1, le=MAX_BLOCK_RANGE),
+    stats: bool = False
+) -> Dict[str, Any]:
+    """
+    Lista cabeçalhos de um intervalo de blocos (from/to, crescente) ou dos
+    blocos anteriores a uma altura (before/limit, decrescente a partir do
+    tip), usando getblockheader e, opcionalmente, getblockstats em lote
     """
     try:
-        with bitcoin.get_rpc() as rpc:
-            # Obtém o hash do bloco pela altura
-            block_hash = rpc.getblockhash(block_number)
-            # Obtém informações detalhadas do bloco
-            block_info = rpc.getblock(block_hash, 2)
-            
-            # Processa as transações para incluir informações relevantes
-            transactions = []
-            for tx in block_info["tx"]:
-                tx_processed = {
-                    "txid": tx["txid"],
-                    "size": tx["size"],
-                    "vsize": tx["vsize"],
-                    "fee": tx.get("fee", "0"),
-                    "input_count": len(tx["vin"]),
-                    "output_count": len(tx["vout"]),
-                    "total_output": sum(vout["value"] for vout in tx["vout"])
+        async with bitcoin.get_rpc() as rpc:
+            tip = cache.tip_height if cache.tip_height is not None else await rpc.getblockcount()
+
+            if from_height is not None or to_height is not None:
+                start = from_height if from_height is not None else 0
+                end = min(to_height if to_height is not None else tip, tip)
+                if end - start + 1 > MAX_BLOCK_RANGE:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Intervalo maior que o limite de {MAX_BLOCK_RANGE} blocos"
+                    )
+                heights = list(range(start, end + 1))
+            else:
+                top = min(before - 1 if before is not None else tip, tip)
+                heights = list(range(top, max(top - limit, -1), -1))
+
+            # Hashes: do cache de alturas, o restante em um único lote
+            hashes = {height: cache.hash_at(height) for height in heights}
+            missing = [height for height, block_hash in hashes.items() if block_hash is None]
+            for height, block_hash in zip(missing, await rpc.batch([("getblockhash", [h]) for h in missing])):
+                hashes[height] = block_hash
+                cache.remember_height(height, block_hash)
+
+            # Cabeçalhos e estatísticas são imutáveis por hash
+            calls, wanted = [], []
+            for height in heights:
+                block_hash = hashes[height]
+                if cache.headers.get(block_hash) is None:
+                    calls.append(("getblockheader", [block_hash]))
+                    wanted.append(block_hash)
+                if stats and cache.headers.get(("stats", block_hash)) is None:
+                    calls.append(("getblockstats", [block_hash, BLOCK_STATS_FIELDS]))
+                    wanted.append(("stats", block_hash))
+            for key, value in zip(wanted, await rpc.batch(calls)):
+                cache.headers.put(key, value)
+
+            blocks = []
+            for height in heights:
+                header = cache.headers.get(hashes[height])
+                block = {
+                    "height": header["height"],
+                    "hash": header["hash"],
+                    "time": header["time"],
+                    "mediantime": header.get("mediantime"),
+                    "num_transactions": header["nTx"],
+                    "difficulty": header["difficulty"]
                 }
-                transactions.append(tx_processed)
-            
+                if stats:
+                    block_stats = cache.headers.get(("stats", hashes[height]))
+                    block.update({
+                        "size": block_stats["total_size"],
+                        "weight": block_stats["total_weight"],
+                        "total_fee": sat_to_btc(block_stats["totalfee"]),
+                        "avg_feerate": block_stats["avgfeerate"],
+                        "feerate_percentiles": block_stats["feerate_percentiles"]
+                    })
+                blocks.append(block)
+
+            lowest = min(heights) if heights else None
             return {
-                "height": block_info["height"],
-                "hash": block_info["hash"],
-                "time": block_info["time"],
-                "nonce": block_info["nonce"],
-                "difficulty": block_info["difficulty"],
-                "num_transactions": len(transactions),
-                "size": block_info["size"],
-                "weight": block_info["weight"],
-                "merkle_root": block_info["merkleroot"],
-                "transactions": transactions
+                "tip": tip,
+                "blocks": blocks,
+                "next_before": lowest if lowest and from_height is None and to_height is None else None
             }
+    except (HTTPException, AdmissionError):
+        raise
     except Exception as ex:
-        raise HTTPException(status_code=404, detail=f"Bloco não encontrado: {str(ex)}")
+        raise HTTPException(status_code=404, detail=f"Blocos não encontrados: {str(ex)}")
 
-@app.get("/transactions/{tx_hash}")
-async def get_transaction_by_hash(tx_hash: str) -> Dict[str, Any]:
+@app.get("/blocks/{block_number}")
+async def get_block_by_number(
+    block_number: int,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_BLOCK_PAGE),
+    stream: bool = False
+) -> Dict[str, Any]:
     """
-    Obtém informações de uma transação específica pelo seu hash,
-    incluindo endereços de origem e destino com seus respectivos valores
+    Obtém informações de um bloco específico pelo seu número/altura.
+
+    Sem parâmetros devolve todas as transações; com offset/limit devolve só
+    a página pedida e, com stream=true, envia o JSON incrementalmente.
     """
+    end = None if limit is None else offset + limit
+    paged = offset > 0 or limit is not None
     try:
-        with bitcoin.get_rpc() as rpc:
-            # Verifica se a transação está na mempool primeiro
-            try:
-                _ = rpc.getmempoolentry(tx_hash)
-                in_mempool = True
-            except Exception:
-                in_mempool = False
-
-            # Obtém a transação
-            tx_info = rpc.getrawtransaction(tx_hash, True)
-            
-            # Processa os inputs e outputs para melhor legibilidade
-            inputs = []
-            input_addresses = []  # Para rastrear todos endereços de origem
-            total_input = 0
-            
-            # Processa inputs
-            for vin in tx_info["vin"]:
-                input_info = {
-                    "txid": vin.get("txid"),
-                    "vout": vin.get("vout"),
-                    "sequence": vin.get("sequence")
-                }
-                
-                # Se não for coinbase, busca a transação anterior para obter o endereço e valor
-                if "txid" in vin:
-                    try:
-                        prev_tx = rpc.getrawtransaction(vin["txid"], True)
-                        prev_vout = prev_tx["vout"][vin["vout"]]
-                        
-                        input_info.update({
-                            "addresses": prev_vout["scriptPubKey"].get("addresses", []),
-                            "value": prev_vout["value"],
-                            "type": prev_vout["scriptPubKey"].get("type")
-                        })
-                        
-                        total_input += prev_vout["value"]
-                        input_addresses.extend(prev_vout["scriptPubKey"].get("addresses", []))
-                    except Exception as e:
-                        input_info["error"] = f"Não foi possível obter detalhes do input: {str(e)}"
-                else:
-                    # Caso seja coinbase
-                    input_info.update({
-                        "coinbase": vin.get("coinbase"),
-                        "type": "coinbase"
-                    })
-                
-                if "scriptSig" in vin:
-                    input_info["scriptSig"] = {
-                        "asm": vin["scriptSig"].get("asm"),
-                        "hex": vin["scriptSig"].get("hex")
-                    }
-                
-                inputs.append(input_info)
-            
-            # Processa outputs
-            outputs = []
-            output_addresses = []  # Para rastrear todos endereços de destino
-            total_output = 0
-            
-            for vout in tx_info["vout"]:
-                output_info = {
-                    "value": vout["value"],
-                    "n": vout["n"],
-                    "type": vout["scriptPubKey"].get("type"),
-                    "addresses": vout["scriptPubKey"].get("addresses", []),
-                    "scriptPubKey": vout["scriptPubKey"].get("hex")
-                }
-                
-                total_output += vout["value"]
-                output_addresses.extend(vout["scriptPubKey"].get("addresses", []))
-                outputs.append(output_info)
-            
-            # Calcula a taxa se não for coinbase
-            fee = round(total_input - total_output, 8) if inputs and "coinbase" not in inputs[0] else 0
-            
-            # Prepara um resumo das transferências
-            transfers = []
-            for input_addr in set(input_addresses):
-                input_total = sum(
-                    inp.get("value", 0) 
-                    for inp in inputs 
-                    if inp.get("addresses") and input_addr in inp["addresses"]
+        # Blocos já gravados no block store dispensam RPC e cache
+        stored = await read_stored_block(block_number, offset, end)
+        if stored is not None:
+            header, transactions = stored
+            if stream:
+                return StreamingResponse(
+                    stream_block(header, offset, limit, _cached_chunks(transactions)),
+                    media_type="application/json"
                 )
-                
-                for output_addr in set(output_addresses):
-                    output_total = sum(
-                        out["value"] 
-                        for out in outputs 
-                        if out["addresses"] and output_addr in out["addresses"]
+            if not paged:
+                return {**header, "transactions": transactions}
+            return {**header, **_page_fields(header, offset, limit), "transactions": transactions}
+
+        async with bitcoin.get_rpc() as rpc:
+            block_hash = await resolve_block_hash(rpc, block_number)
+
+            summary = cache.blocks.get(block_hash)
+            if summary is None:
+                summary = (await shared_lookup(cache.blocks, [block_hash])).get(block_hash)
+            # No modo raw o bloco inteiro em hex já é barato: resume tudo e pagina pelo cache
+            if summary is None and (RAW_BLOCKS or (not paged and not stream)):
+                summary = await fetch_block_summary(rpc, block_hash, block_number)
+
+            if summary is not None:
+                if not paged and not stream:
+                    return summary
+                header = {k: v for k, v in summary.items() if k != "transactions"}
+                transactions = summary["transactions"][offset:end]
+                if stream:
+                    return StreamingResponse(
+                        stream_block(header, offset, limit, _cached_chunks(transactions)),
+                        media_type="application/json"
                     )
-                    
-                    if input_addr != output_addr:  # Ignora transferências para o mesmo endereço
-                        transfers.append({
-                            "from": input_addr,
-                            "to": output_addr,
-                            "value": min(input_total, output_total)  # Usa o menor valor para evitar dupla contagem
-                        })
-            
-            result = {
-                "txid": tx_info["txid"],
-                "size": tx_info["size"],
-                "vsize": tx_info["vsize"],
-                "weight": tx_info["weight"],
-                "fee": fee,
-                "total_input": total_input,
-                "total_output": total_output,
-                "confirmations": tx_info.get("confirmations", 0),
-                "time": tx_info.get("time"),
-                "in_mempool": in_mempool,
-                "inputs": inputs,
-                "outputs": outputs,
-                "transfers": transfers,  # Nova seção com resumo das transferências
-                "input_addresses": list(set(input_addresses)),
-                "output_addresses": list(set(output_addresses))
+                return {**header, **_page_fields(header, offset, limit), "transactions": transactions}
+
+            # Bloco fora do cache: busca só a lista de txids e resume a página pedida
+            block_info = await rpc.getblock(block_hash, 1)
+            header = block_header(block_info)
+            txids = block_info["tx"][offset:end]
+            del block_info
+            if stream:
+                return StreamingResponse(
+                    stream_block(header, offset, limit, fetch_block_txs(rpc, block_hash, txids)),
+                    media_type="application/json"
+                )
+            transactions = []
+            async for chunk in fetch_block_txs(rpc, block_hash, txids):
+                transactions.extend(chunk)
+            return {**header, **_page_fields(header, offset, limit), "transactions": transactions}
+    except AdmissionError:
+        raise
+    except Exception as ex:
+        raise HTTPException(status_code=404, detail=f"Bloco não encontrado: {str(ex)}")
+
+# Limites por requisição dos endpoints em lote
+MAX_BATCH_TRANSACTIONS = 100
+MAX_BATCH_BLOCKS = 25
+MAX_BATCH_ADDRESSES = 50
+
+class TransactionBatch(BaseModel):
+    txids: List[str]
+    fields: Optional[List[str]] = None
+    view: Literal["summary", "full"] = "full"
+
+class BlockBatch(BaseModel):
+    heights: List[int]
+
+class AddressBatch(BaseModel):
+    addresses: List[str]
+
+def batch_items(items: List[Any], limit: int, name: str) -> List[Any]:
+    """
+    Itens distintos do corpo de um endpoint em lote, na ordem recebida
+    """
+    unique = list(dict.fromkeys(items))
+    if not unique:
+        raise HTTPException(status_code=400, detail=f"Informe ao menos um item em {name}")
+    if len(unique) > limit:
+        raise HTTPException(status_code=400, detail=f"Lote maior que o limite de {limit} itens em {name}")
+    return unique
+
+def parse_fields(fields: Optional[List[str]], view: str) -> Optional[FrozenSet[str]]:
+    """
+    Campos pedidos de uma transação (None = resposta completa): `fields`
+    separados por vírgula têm prioridade sobre `view`
+    """
+    if not fields:
+        return SUMMARY_FIELDS if view == "summary" else None
+    names = {name.strip() for item in fields for name in item.split(",") if name.strip()}
+    unknown = names - set(TRANSACTION_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos desconhecidos: {', '.join(sorted(unknown))} (disponíveis: {', '.join(TRANSACTION_FIELDS)})"
+        )
+    return frozenset(names | {"txid"})
+
+async def locate_transactions(txids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Bloco de cada transação já indexada pelo localizador do índice local
+    """
+    return await address_index.locate(txids) if address_index.config.enabled else {}
+
+def getrawtransaction_call(txid: str, verbosity: Any, location: Optional[Dict[str, Any]]) -> tuple:
+    # Com o hash do bloco o node encontra a transação sem -txindex
+    return ("getrawtransaction", [txid, verbosity, location["hash"]] if location else [txid, verbosity])
+
+async def resolve_transactions(rpc, txids: List[str], fields: Optional[FrozenSet[str]] = None) -> Dict[str, Any]:
+    """
+    Resume várias transações com até duas requisições ao node: uma com a
+    transação de cada txid, outra com as transações anteriores e os
+    cabeçalhos dos blocos (cada um uma única vez, mesmo se compartilhado).
+    O localizador do índice dá o bloco das transações confirmadas; com
+    `fields`, só busca o que os campos pedidos exigem. Devolve txid →
+    resumo ou a exceção da busca.
+    """
+    results: Dict[str, Any] = {}
+    found: Dict[str, Any] = {}
+    # A verbosity 2 já traz a taxa, dispensando as transações anteriores nas projeções
+    verbosity = True if fields is None else 2
+    # Transações no espelho da mempool não estão em blocos: não consulta o localizador
+    locations = await locate_transactions([txid for txid in txids if txid not in mempool.entries])
+    fetched = await rpc.batch(
+        [getrawtransaction_call(txid, verbosity, locations.get(txid)) for txid in txids], return_exceptions=True
+    )
+    # Localização desatualizada (ex.: reorg ainda não processado pelo índice): busca sem a dica
+    stale = [txid for txid, tx_info in zip(txids, fetched) if isinstance(tx_info, Exception) and txid in locations]
+    if stale:
+        retried = dict(zip(stale, await rpc.batch(
+            [getrawtransaction_call(txid, verbosity, None) for txid in stale], return_exceptions=True
+        )))
+        fetched = [retried.get(txid, tx_info) for txid, tx_info in zip(txids, fetched)]
+        for txid in stale:
+            locations.pop(txid)
+    for txid, tx_info in zip(txids, fetched):
+        if isinstance(tx_info, Exception):
+            results[txid] = tx_info
+        elif "blockhash" in tx_info:
+            found[txid] = (tx_info, False)
+        else:
+            # Sem blockhash, o node encontrou a transação na mempool; o horário
+            # de entrada vem do espelho local
+            entry = mempool.entries.get(txid)
+            found[txid] = ({"time": entry.time, **tx_info} if entry is not None else tx_info, True)
+
+    # Transações anteriores: do cache, do próprio lote ou buscadas uma vez cada
+    parents: Dict[str, Any] = {}
+    missing: List[str] = []
+    for tx_info, _ in found.values():
+        if not needs_prevouts(tx_info, fields):
+            continue
+        for vin in tx_info["vin"]:
+            txid = vin.get("txid")
+            if txid is None or txid in parents or txid in missing:
+                continue
+            cached = cache.get_transaction(txid)
+            if cached is None and txid in found:
+                cached = found[txid][0]
+            if cached is None:
+                missing.append(txid)
+            else:
+                parents[txid] = cached
+    shared_parents = await shared_lookup(cache.transactions, missing)
+    parents.update(shared_parents)
+    missing = [txid for txid in missing if txid not in shared_parents]
+    parent_locations = await locate_transactions(missing)
+    # Altura e horário do bloco: do localizador ou do cabeçalho em cache (ex.: aquecido pelo prefetcher)
+    blocks: Dict[str, Any] = {}
+    if fields is None or "block" in fields:
+        for txid, (tx_info, _) in found.items():
+            block_hash = tx_info.get("blockhash")
+            location = locations.get(txid)
+            if location is not None and location["hash"] == block_hash:
+                blocks[block_hash] = location
+            elif block_hash is not None and blocks.get(block_hash) is None:
+                blocks[block_hash] = cache.headers.get(block_hash)
+    blocks.update(await shared_lookup(cache.headers, [block_hash for block_hash, header in blocks.items() if header is None]))
+    block_hashes = [block_hash for block_hash, header in blocks.items() if header is None]
+    calls = [getrawtransaction_call(txid, True, parent_locations.get(txid)) for txid in missing]
+    calls.extend(("getblockheader", [block_hash]) for block_hash in block_hashes)
+    fetched = await rpc.batch(calls, return_exceptions=True)
+    new_parents, new_headers = {}, {}
+    for txid, prev_tx in zip(missing, fetched):
+        parents[txid] = prev_tx
+        if not isinstance(prev_tx, Exception):
+            new_parents[txid] = cache.put_transaction(prev_tx)
+    for block_hash, header in zip(block_hashes, fetched[len(missing):]):
+        blocks[block_hash] = header
+        if not isinstance(header, Exception):
+            cache.headers.put(block_hash, header)
+            new_headers[block_hash] = header
+    await shared.put_many("transactions", new_parents)
+    await shared.put_many("headers", new_headers)
+
+    for txid, (tx_info, in_mempool) in found.items():
+        result = summarize_transaction(tx_info, parents, in_mempool, fields)
+        # Adiciona informações do bloco se a transação estiver confirmada
+        if "blockhash" in tx_info and tx_info["blockhash"] in blocks:
+            block_info = blocks[tx_info["blockhash"]]
+            if isinstance(block_info, Exception):
+                results[txid] = block_info
+                continue
+            result["block"] = {
+                "hash": block_info["hash"],
+                "height": block_info["height"],
+                "time": block_info["time"]
             }
+        results[txid] = result
+    return results
 
-            # Adiciona informações do bloco se a transação estiver confirmada
-            if "blockhash" in tx_info:
-                block_info = rpc.getblock(tx_info["blockhash"])
-                result["block"] = {
-                    "hash": block_info["hash"],
-                    "height": block_info["height"],
-                    "time": block_info["time"]
-                }
-            
+@app.post("/blocks/batch")
+async def get_blocks_batch(request: BlockBatch) -> Dict[str, Any]:
+    """
+    Resume até MAX_BATCH_BLOCKS blocos inteiros em uma requisição: os que
+    não estão no block store ou no cache são buscados em um único lote de
+    getblockhash e outro de getblock
+    """
+    heights = batch_items(request.heights, MAX_BATCH_BLOCKS, "heights")
+    results: Dict[int, Any] = {}
+    try:
+        for height in heights:
+            stored = await read_stored_block(height)
+            if stored is not None:
+                header, transactions = stored
+                results[height] = {**header, "transactions": transactions}
+
+        async with bitcoin.get_rpc() as rpc:
+            pending = [height for height in heights if height not in results]
+            hashes = {height: cache.hash_at(height) for height in pending}
+            unknown = [height for height, block_hash in hashes.items() if block_hash is None]
+            for height, block_hash in zip(unknown, await rpc.batch(
+                [("getblockhash", [height]) for height in unknown], return_exceptions=True
+            )):
+                hashes[height] = block_hash
+                if not isinstance(block_hash, Exception):
+                    cache.remember_height(height, block_hash)
+
+            to_fetch = []
+            for height in pending:
+                block_hash = hashes[height]
+                summary = None if isinstance(block_hash, Exception) else cache.blocks.get(block_hash)
+                if isinstance(block_hash, Exception):
+                    results[height] = block_hash
+                elif summary is not None:
+                    results[height] = summary
+                else:
+                    to_fetch.append(height)
+            found = await shared_lookup(cache.blocks, [hashes[height] for height in to_fetch])
+            for height in to_fetch:
+                if hashes[height] in found:
+                    results[height] = found[hashes[height]]
+            to_fetch = [height for height in to_fetch if hashes[height] not in found]
+            fetched = await rpc.batch(
+                [("getblock", [hashes[height], BLOCK_VERBOSITY]) for height in to_fetch], return_exceptions=True
+            )
+            for height, block in zip(to_fetch, fetched):
+                if isinstance(block, Exception):
+                    results[height] = block
+                    continue
+                summary = summarize_fetched_block(block, height)
+                cache.blocks.put(summary["hash"], summary)
+                results[height] = summary
+            await shared.put_many("blocks", {results[height]["hash"]: results[height] for height in to_fetch
+                                             if not isinstance(results[height], Exception)})
+    except AdmissionError:
+        raise
+    except Exception as ex:
+        raise HTTPException(status_code=503, detail=f"Erro ao obter blocos: {str(ex)}")
+    return {
+        "blocks": [
+            {"height": height, "error": f"Bloco não encontrado: {str(results[height])}"}
+            if isinstance(results[height], Exception) else results[height]
+            for height in heights
+        ]
+    }
+
+@app.get("/transactions/{tx_hash}")
+async def get_transaction_by_hash(
+    tx_hash: str,
+    fields: Optional[List[str]] = Query(None),
+    view: str = Query("full", pattern="^(summary|full)$")
+) -> Dict[str, Any]:
+    """
+    Obtém informações de uma transação específica pelo seu hash,
+    incluindo endereços de origem e destino com seus respectivos valores.
+
+    view=summary devolve só taxa, tamanhos e confirmação; fields=a,b,...
+    escolhe os campos. Inputs, endereços e transferências exigem as
+    transações anteriores; sem eles a consulta dispensa essas chamadas.
+    """
+    wanted = parse_fields(fields, view)
+    try:
+        async with bitcoin.get_rpc() as rpc:
+            result = (await resolve_transactions(rpc, [tx_hash], wanted))[tx_hash]
+            if isinstance(result, Exception):
+                raise result
             return result
             
+    except AdmissionError:
+        raise
     except Exception as ex:
         raise HTTPException(status_code=404, detail=f"Transação não encontrada: {str(ex)}")
 
+@app.post("/transactions/batch")
+async def get_transactions_batch(request: TransactionBatch) -> Dict[str, Any]:
+    """
+    Resume até MAX_BATCH_TRANSACTIONS transações em uma requisição; as não
+    encontradas vêm com o campo error na mesma posição do pedido. Aceita
+    fields e view com o mesmo significado de /transactions/{tx_hash}
+    """
+    txids = batch_items(request.txids, MAX_BATCH_TRANSACTIONS, "txids")
+    wanted = parse_fields(request.fields, request.view)
+    try:
+        async with bitcoin.get_rpc() as rpc:
+            results = await resolve_transactions(rpc, txids, wanted)
+    except AdmissionError:
+        raise
+    except Exception as ex:
+        raise HTTPException(status_code=503, detail=f"Erro ao obter transações: {str(ex)}")
+    return {
+        "transactions": [
+            {"txid": txid, "error": f"Transação não encontrada: {str(result)}"}
+            if isinstance(result, Exception) else result
+            for txid, result in ((txid, results[txid]) for txid in txids)
+        ]
+    }
+
+def balance_from_index(address: str, summary: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Saldo, UTXOs e histórico de um endereço a partir do resumo do índice local
+    """
+    tip_height = address_index.height
+    unspent_outputs = [
+        {
+            "txid": txid,
+            "vout": vout,
+            "amount": sat_to_btc(value),
+            "confirmations": tip_height - height + 1,
+            "height": height
+        }
+        for txid, vout, value, height in summary["unspent"]
+    ]
+    return {
+        "address": address,
+        "network": address_index.chain,
+        "balance": sat_to_btc(sum(value for _, _, value, _ in summary["unspent"])),
+        "total_received": sat_to_btc(summary["received"]),
+        "tx_count": summary["tx_count"],
+        "unspent_count": len(unspent_outputs),
+        "unspent_outputs": unspent_outputs,
+        "indexer": address_index.status()
+    }
+
+async def address_balance_from_index(address: str) -> Dict[str, Any]:
+    """
+    Saldo, UTXOs e histórico de um endereço a partir do índice local
+    """
+    return balance_from_index(address, await address_index.address_summary(address))
+
+def balances_from_scan(addresses: Dict[str, str], scan: Dict[str, Any], chain: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Separa por endereço o resultado de um scantxoutset com vários
+    descritores (addresses: scriptPubKey em hex → endereço)
+    """
+    unspents: Dict[str, List[Dict[str, Any]]] = {address: [] for address in addresses.values()}
+    for utxo in scan.get("unspents", []):
+        address = addresses.get(utxo["scriptPubKey"])
+        if address is not None:
+            unspents[address].append(utxo)
+    results = {}
+    for address, utxos in unspents.items():
+        unspent_outputs = [
+            {
+                "txid": utxo["txid"],
+                "vout": utxo["vout"],
+                "amount": utxo["amount"],
+                "confirmations": scan["height"] - utxo["height"] + 1,
+                "height": utxo["height"]
+            }
+            for utxo in utxos
+        ]
+        results[address] = {
+            "address": address,
+            "network": chain,
+            "balance": sat_to_btc(sum(btc_to_sat(utxo["amount"]) for utxo in utxos)),
+            "unspent_count": len(unspent_outputs),
+            "unspent_outputs": unspent_outputs,
+            "indexer": address_index.status()
+        }
+    return results
+
+@app.post("/balance/batch")
+async def get_balances_batch(request: AddressBatch) -> Dict[str, Any]:
+    """
+    Saldos de até MAX_BATCH_ADDRESSES endereços: uma consulta ao índice
+    local ou, enquanto ele não alcançou o tip, um único scantxoutset com
+    um descritor por endereço
+    """
+    addresses = batch_items(request.addresses, MAX_BATCH_ADDRESSES, "addresses")
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        async with bitcoin.get_rpc() as rpc:
+            validations = await rpc.batch([("validateaddress", [address]) for address in addresses])
+            valid = {}
+            for address, validation in zip(addresses, validations):
+                if validation.get("isvalid", False):
+                    valid[validation["scriptPubKey"]] = address
+                else:
+                    results[address] = {"address": address, "error": "Endereço inválido"}
+
+            if valid and address_index.ready:
+                summaries = await address_index.address_summaries(list(valid.values()))
+                for address, summary in summaries.items():
+                    results[address] = balance_from_index(address, summary)
+            elif valid:
+                scan, chain_info = await rpc.batch([
+                    ("scantxoutset", ["start", [f"addr({address})" for address in valid.values()]]),
+                    ("getblockchaininfo", [])
+                ])
+                if not scan["success"]:
+                    raise HTTPException(status_code=503, detail="scantxoutset não concluiu a varredura")
+                results.update(balances_from_scan(valid, scan, chain_info["chain"]))
+    except (HTTPException, AdmissionError):
+        raise
+    except Exception as ex:
+        raise HTTPException(status_code=400, detail=f"Erro ao obter saldos: {str(ex)}")
+    return {"balances": [results[address] for address in addresses]}
+
 @app.get("/balance/{address}")
 async def get_address_balance(address: str) -> Dict[str, Any]:
     """
     Obtém o saldo e histórico de transações de um endereço específico
     """
     try:
-        with bitcoin.get_rpc() as rpc:
+        async with bitcoin.get_rpc() as rpc:
             # Verifica se a carteira está disponível
             try:
-                validation = rpc.validateaddress(address)
+                validation = await rpc.validateaddress(address)
                 if not validation.get("isvalid", False):
                     raise HTTPException(status_code=404, detail="Endereço inválido")
             except JSONRPCError as e:
                 raise HTTPException(status_code=400, detail=f"Erro na validação do endereço: {str(e)}")
 
+            # Responde pelo índice local quando ele já alcançou o tip
+            if address_index.ready:
+                return await address_balance_from_index(address)
+
             # Primeiro tenta obter o saldo via getreceivedbyaddress
             try:
-                received = rpc.getreceivedbyaddress(address)
+                received = await rpc.getreceivedbyaddress(address)
             except JSONRPCError:
                 # Se falhar (endereço não na carteira), usa scantxoutset
                 descriptor = f"addr({address})"
-                scan_result = rpc.scantxoutset("start", [descriptor])
+                scan_result = await rpc.scantxoutset("start", [descriptor])
                 received = scan_result["total_amount"] if scan_result["success"] else 0
             
             # Obtém UTXOs para informações detalhadas
             try:
-                utxos = rpc.listunspent(0, 9999999, [address])
+                utxos = await rpc.listunspent(0, 9999999, [address])
             except JSONRPCError:
                 descriptor = f"addr({address})"
-                scan_result = rpc.scantxoutset("start", [descriptor])
+                scan_result = await rpc.scantxoutset("start", [descriptor])
                 utxos = scan_result.get("unspents", []) if scan_result["success"] else []
             
             # Formata os UTXOs
@@ -311,7 +1146,7 @@ async def get_address_balance(address: str) -> Dict[str, Any]:
                     output["height"] = utxo["height"]
                 unspent_outputs.append(output)
             
-            chain_info = rpc.getblockchaininfo()
+            chain_info = await rpc.getblockchaininfo()
             
             return {
                 "address": address,
@@ -319,64 +1154,196 @@ async def get_address_balance(address: str) -> Dict[str, Any]:
                 "balance": received,
                 "unspent_count": len(unspent_outputs),
                 "unspent_outputs": unspent_outputs,
+                "indexer": address_index.status()
             }
             
+    except AdmissionError:
+        raise
     except Exception as ex:
         raise HTTPException(status_code=400, detail=f"Erro ao obter saldo: {str(ex)}")
 
 @app.get("/mempool")
-async def get_mempool_info() -> Dict[str, Any]:
+async def get_mempool_info(
+    request: Request,
+    sort: str = Query("feerate", pattern="^(feerate|time|size)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
     """
-    Obtém informações detalhadas sobre a mempool
+    Obtém informações sobre a mempool a partir do espelho local, com as
+    transações paginadas por cursor e ordenadas por taxa, horário ou tamanho
     """
     try:
-        with bitcoin.get_rpc() as rpc:
-            mempool_info = rpc.getmempoolinfo()
-            # Obtém todas as transações na mempool
-            mempool_txs = rpc.getrawmempool(True)
-            
-            return {
-                "size": mempool_info["size"],
-                "bytes": mempool_info["bytes"],
-                "usage": mempool_info["usage"],
-                "transactions": [
-                    {
-                        "txid": txid,
-                        "size": info["size"],
-                        "fee": info["fee"],
-                        "time": info["time"]
-                    }
-                    for txid, info in mempool_txs.items()
-                ]
-            }
+        await mempool.ensure_loaded(bitcoin)
+    except AdmissionError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao obter informações da mempool: {str(e)}")
+
+    async def compute():
+        try:
+            entries, next_cursor = mempool.page(sort, limit, cursor)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        stats = mempool.stats()
+
+        return {
+            "size": mempool.info["size"],
+            "bytes": mempool.info["bytes"],
+            "usage": mempool.info["usage"],
+            "total_fee": sat_to_btc(stats["total_fee"]),
+            "feerate": {
+                "min": stats["min_feerate"],
+                "median": stats["median_feerate"],
+                "max": stats["max_feerate"]
+            },
+            "sort": sort,
+            "limit": limit,
+            "next_cursor": next_cursor,
+            "transactions": [
+                {
+                    "txid": entry.txid,
+                    "size": entry.vsize,
+                    "vsize": entry.vsize,
+                    "weight": entry.weight,
+                    "fee": sat_to_btc(entry.fee),
+                    "feerate": entry.feerate / 1000,
+                    "time": entry.time
+                }
+                for entry in entries
+            ]
+        }
+
+    return await cached_json(request, ("/mempool", sort, limit, cursor), mempool.version, compute)
+
+@app.get("/stats/fees")
+async def get_fee_stats(request: Request) -> Dict[str, Any]:
+    """
+    Distribuição das taxas na mempool: histograma por faixa de sat/vB,
+    percentis (por transação e por vbyte) e taxas dos próximos blocos
+    """
+    try:
+        await mempool.ensure_loaded(bitcoin)
+    except AdmissionError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao obter informações da mempool: {str(e)}")
 
+    async def compute():
+        return fee_histogram(list(mempool.entries.values()))
+
+    return await cached_json(request, "/stats/fees", mempool.version, compute)
+
+MAX_STATS_BLOCKS = 10000
+
+def parse_range(raw: str, first: int, last: int) -> Tuple[int, int]:
+    """
+    Intervalo de alturas de /stats/blocks: "N" (últimos N blocos), "A-B"
+    ou "A-" (de A até o tip), limitado às alturas já indexadas
+    """
+    try:
+        if "-" not in raw:
+            count = int(raw)
+            if count < 1:
+                raise ValueError
+            start, end = last - count + 1, last
+        else:
+            lo, hi = raw.split("-", 1)
+            start, end = int(lo), int(hi) if hi else last
+    except ValueError:
+        raise HTTPException(status_code=400, detail="range inválido: use N, A-B ou A-")
+    start, end = max(start, first), min(end, last)
+    if start > end:
+        raise HTTPException(status_code=404, detail=f"Nenhum bloco indexado no intervalo (disponível: {first}-{last})")
+    if end - start + 1 > MAX_STATS_BLOCKS:
+        raise HTTPException(status_code=400, detail=f"Intervalo máximo de {MAX_STATS_BLOCKS} blocos")
+    return start, end
+
+@app.get("/stats/blocks")
+async def get_block_stats(request: Request, heights: str = Query("144", alias="range")) -> Dict[str, Any]:
+    """
+    Séries por bloco (intervalo, transações, tamanho, taxas) e agregados
+    de um intervalo de alturas, calculados sobre as colunas em memória
+    """
+    if not block_stats.config.enabled:
+        raise HTTPException(status_code=503, detail="Estatísticas de blocos desativadas (STATS_ENABLED=0)")
+    if not block_stats.blocks.count:
+        raise HTTPException(status_code=503, detail="Estatísticas de blocos ainda não indexadas")
+    start, end = parse_range(heights, block_stats.blocks.base, block_stats.blocks.tip_height)
+
+    async def compute():
+        return {
+            "from": start,
+            "to": end,
+            "synced": block_stats.synced,
+            **block_stats.summary(start, end)
+        }
+
+    return await cached_json(request, ("/stats/blocks", start, end), block_stats.version, compute)
+
 @app.get("/network/info")
-async def get_network_info() -> Dict[str, Any]:
+async def get_network_info(request: Request) -> Dict[str, Any]:
     """
     Obtém informações gerais sobre a rede Bitcoin
     """
-    try:
-        with bitcoin.get_rpc() as rpc:
-            # Obtém informações da blockchain
-            chain_info = rpc.getblockchaininfo()
-            
-            # Obtém informações da mempool
-            mempool_info = rpc.getmempoolinfo()
-            
-            return {
-                "isTestnet": chain_info["chain"] != "main",
-                "networkName": chain_info["chain"],
-                "lastBlock": chain_info["blocks"],
-                "mempoolSize": mempool_info["size"]
-            }
-            
-    except Exception as ex:
-        raise HTTPException(
-            status_code=503, 
-            detail=f"Erro ao obter informações da rede: {str(ex)}"
-        )
+    async def compute():
+        try:
+            async with bitcoin.get_rpc() as rpc:
+                # Obtém informações da blockchain e da mempool em um único lote
+                chain_info, mempool_info = await rpc.batch([
+                    ("getblockchaininfo", []),
+                    ("getmempoolinfo", [])
+                ])
+                
+                return {
+                    "isTestnet": chain_info["chain"] != "main",
+                    "networkName": chain_info["chain"],
+                    "lastBlock": chain_info["blocks"],
+                    "mempoolSize": mempool_info["size"]
+                }
+                
+        except AdmissionError:
+            raise
+        except Exception as ex:
+            raise HTTPException(
+                status_code=503, 
+                detail=f"Erro ao obter informações da rede: {str(ex)}"
+            )
+
+    return await cached_json(request, "/network/info", (cache.tip_hash, mempool.version), compute)
+
+@app.get("/events")
+async def stream_events():
+    """
+    Stream Server-Sent Events com novos blocos (block), mudanças na mempool
+    (mempool) e o resumo da rede (network, mesmo formato de /network/info)
+    """
+    return StreamingResponse(
+        sse_stream(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/cache/stats")
+async def get_cache_stats() -> Dict[str, Any]:
+    """
+    Contadores de acerto/erro e ocupação dos caches em memória e do cache
+    compartilhado entre workers
+    """
+    return {**cache.stats(), "responses": responses.stats(), "block_store": block_store.status(),
+            "block_stats": block_stats.status(), "prefetch": prefetcher.status(),
+            "shared": await shared.status(), "worker": {"pid": os.getpid(), "leader": leader.leader or not shared.enabled}}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Métricas no formato texto do Prometheus
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    # Com UVICORN_WORKERS > 1 o uvicorn precisa do app como string de import
+    if workers() > 1:
+        uvicorn.run("app.main:app", host="0.0.0.0", port=8001, workers=workers())
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
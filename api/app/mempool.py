@@ -0,0 +1,317 @@
+from bisect import bisect_right, insort
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .amounts import btc_to_sat
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class MempoolConfig:
+    poll_interval: float = 2.0
+    fetch_chunk: int = 1000
+    snapshot_every: int = 50        # diffs publicados no cache compartilhado entre dois snapshots
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            poll_interval=float(os.getenv("MEMPOOL_POLL_INTERVAL", "2")),
+            fetch_chunk=int(os.getenv("MEMPOOL_FETCH_CHUNK", "1000")),
+            snapshot_every=int(os.getenv("MEMPOOL_SNAPSHOT_EVERY", "50"))
+        )
+
+@dataclass(slots=True)
+class MempoolEntry:
+    txid: str
+    vsize: int
+    weight: int
+    fee: int        # satoshis
+    time: int
+    feerate: int    # sat/kvB, inteiro para ordenação estável
+
+    @classmethod
+    def from_rpc(cls, txid: str, info: Dict[str, Any]) -> "MempoolEntry":
+        fee = btc_to_sat(info["fees"]["base"] if "fees" in info else info["fee"])
+        vsize = info.get("vsize") or info.get("size") or 1
+        return cls(
+            txid=txid,
+            vsize=vsize,
+            weight=info.get("weight", vsize * 4),
+            fee=fee,
+            time=info["time"],
+            feerate=fee * 1000 // vsize
+        )
+
+    def row(self) -> tuple:
+        return (self.txid, self.vsize, self.weight, self.fee, self.time, self.feerate)
+
+# Chaves de ordenação (decrescentes): maior taxa, mais recente, maior tamanho
+SORT_KEYS: Dict[str, Callable[[MempoolEntry], Tuple[int, str]]] = {
+    "feerate": lambda e: (-e.feerate, e.txid),
+    "time": lambda e: (-e.time, e.txid),
+    "size": lambda e: (-e.vsize, e.txid),
+}
+
+def encode_cursor(key: Tuple[int, str]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    value, txid = json.loads(base64.urlsafe_b64decode(padded))
+    return int(value), str(txid)
+
+# Chaves no estado compartilhado: cabeçalho (época, sequência do último diff
+# e do último snapshot, getmempoolinfo), snapshot e um diff por sequência
+STATE_HEAD = "mempool"
+STATE_SNAPSHOT = "mempool:snapshot"
+
+def _diff_key(seq: int) -> str:
+    return f"mempool:diff:{seq}"
+
+class MempoolMirror:
+    """
+    Espelho local da mempool, atualizado em background aplicando apenas o
+    diff (txids adicionados e removidos) entre consultas, com índices
+    ordenados por taxa, horário e tamanho.
+
+    Com vários workers só o líder consulta o node (`run`) e publica cada
+    diff no cache compartilhado, com um snapshot a cada snapshot_every
+    diffs; os demais aplicam os diffs publicados (`follow`).
+    """
+    def __init__(self, config: MempoolConfig, shared: Optional[Any] = None):
+        self.config = config
+        self.shared = shared
+        self.entries: Dict[str, MempoolEntry] = {}
+        self._indexes: Dict[str, List[Tuple[int, str]]] = {name: [] for name in SORT_KEYS}
+        self.info: Dict[str, Any] = {}
+        self.total_fee = 0
+        self.total_vsize = 0
+        self.loaded = False
+        # Incrementada a cada mudança; usada como chave de versão de respostas em cache
+        self.version = 0
+        self._lock = asyncio.Lock()
+        # Posição no estado compartilhado: publicada (líder) ou aplicada (seguidores)
+        self.following = False
+        self._epoch: Optional[str] = None
+        self._seq = 0
+        self._snapshot_seq = 0
+        self._published_info: Optional[Dict[str, Any]] = None
+
+    def _add(self, entry: MempoolEntry):
+        if entry.txid in self.entries:
+            self._remove(entry.txid)
+        self.entries[entry.txid] = entry
+        for name, key in SORT_KEYS.items():
+            insort(self._indexes[name], key(entry))
+        self.total_fee += entry.fee
+        self.total_vsize += entry.vsize
+
+    def _remove(self, txid: str):
+        entry = self.entries.pop(txid, None)
+        if entry is None:
+            return
+        for name, key in SORT_KEYS.items():
+            index = self._indexes[name]
+            pos = bisect_right(index, key(entry)) - 1
+            if pos >= 0 and index[pos][1] == txid:
+                del index[pos]
+        self.total_fee -= entry.fee
+        self.total_vsize -= entry.vsize
+
+    async def _load(self, rpc):
+        # Carga inicial: uma única chamada verbosa é mais barata que N getmempoolentry
+        verbose, info = await rpc.batch([("getrawmempool", [True]), ("getmempoolinfo", [])])
+        for txid, entry_info in verbose.items():
+            self._add(MempoolEntry.from_rpc(txid, entry_info))
+        self.info = info
+        self.loaded = True
+        self.version += 1
+
+    async def refresh(self, rpc) -> Tuple[List[str], List[str]]:
+        """
+        Sincroniza com o node e retorna os txids adicionados e removidos
+        """
+        async with self._lock:
+            if not self.loaded:
+                await self._load(rpc)
+                return list(self.entries), []
+
+            txids, info = await rpc.batch([("getrawmempool", [False]), ("getmempoolinfo", [])])
+            current = set(txids)
+            removed = [txid for txid in self.entries if txid not in current]
+            added = [txid for txid in txids if txid not in self.entries]
+            for txid in removed:
+                self._remove(txid)
+
+            chunk = self.config.fetch_chunk
+            for start in range(0, len(added), chunk):
+                part = added[start:start + chunk]
+                results = await rpc.batch(
+                    [("getmempoolentry", [txid]) for txid in part], return_exceptions=True
+                )
+                for txid, entry_info in zip(part, results):
+                    # A transação pode ter saído da mempool entre as duas consultas
+                    if not isinstance(entry_info, Exception):
+                        self._add(MempoolEntry.from_rpc(txid, entry_info))
+            if added or removed or info != self.info:
+                self.version += 1
+            self.info = info
+            return added, removed
+
+    async def ensure_loaded(self, rpc):
+        if not self.loaded and self.following:
+            await self.pull()
+        if not self.loaded:
+            await self.refresh(rpc)
+
+    # Estado compartilhado --------------------------------------------------------
+
+    @property
+    def _sharing(self) -> bool:
+        return self.shared is not None and self.shared.enabled
+
+    async def publish(self, added: List[str], removed: List[str]):
+        """
+        Publica o diff da última consulta (líder); o primeiro de cada época e
+        um a cada snapshot_every viram snapshot, que descarta os diffs anteriores
+        """
+        if not self._sharing or (self._epoch is not None and not added and not removed and self._published_info == self.info):
+            return
+        if self._epoch is None:
+            self._epoch, self._seq, self._snapshot_seq = f"{os.getpid()}:{time.time()}", 0, 0
+        previous_snapshot, self._seq = self._snapshot_seq, self._seq + 1
+        if self._seq == 1 or self._seq - self._snapshot_seq >= self.config.snapshot_every:
+            self._snapshot_seq = self._seq
+            items = {STATE_SNAPSHOT: {
+                "epoch": self._epoch, "seq": self._seq, "info": self.info,
+                "rows": [entry.row() for entry in self.entries.values()]
+            }}
+            drop = [_diff_key(seq) for seq in range(previous_snapshot + 1, self._seq)]
+        else:
+            items = {_diff_key(self._seq): {
+                "info": self.info,
+                "rows": [self.entries[txid].row() for txid in added if txid in self.entries],
+                "removed": removed
+            }}
+            drop = []
+        items[STATE_HEAD] = {"epoch": self._epoch, "seq": self._seq, "snapshot_seq": self._snapshot_seq}
+        await self.shared.set_state(items, drop)
+        self._published_info = self.info
+
+    def _restore(self, snapshot: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+        before = set(self.entries)
+        self.entries = {}
+        self._indexes = {name: [] for name in SORT_KEYS}
+        self.total_fee = self.total_vsize = 0
+        for row in snapshot["rows"]:
+            self._add(MempoolEntry(*row))
+        self.info = snapshot["info"]
+        self.loaded = True
+        self.version += 1
+        self._epoch, self._seq = snapshot["epoch"], snapshot["seq"]
+        return [txid for txid in self.entries if txid not in before], [txid for txid in before if txid not in self.entries]
+
+    async def pull(self) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Aplica o que o líder publicou desde a última leitura (seguidores);
+        retorna os txids adicionados e removidos, ou None se nada mudou
+        """
+        if not self._sharing:
+            return None
+        async with self._lock:
+            head = (await self.shared.get_state([STATE_HEAD])).get(STATE_HEAD)
+            if head is None or (head["epoch"] == self._epoch and head["seq"] == self._seq):
+                return None
+            added, removed = [], []
+            # Outro líder (época nova) ou diffs já descartados: recomeça do snapshot
+            if head["epoch"] != self._epoch or self._seq < head["snapshot_seq"]:
+                snapshot = (await self.shared.get_state([STATE_SNAPSHOT])).get(STATE_SNAPSHOT)
+                if snapshot is None:
+                    return None
+                added, removed = self._restore(snapshot)
+            keys = [_diff_key(seq) for seq in range(self._seq + 1, head["seq"] + 1)]
+            diffs = await self.shared.get_state(keys)
+            for seq, key in enumerate(keys, self._seq + 1):
+                diff = diffs.get(key)
+                if diff is None:
+                    # Descartado por um snapshot mais novo: a próxima leitura recomeça dele
+                    self._epoch = None
+                    break
+                for txid in diff["removed"]:
+                    self._remove(txid)
+                for row in diff["rows"]:
+                    self._add(MempoolEntry(*row))
+                self.info = diff["info"]
+                self._seq = seq
+                added.extend(row[0] for row in diff["rows"])
+                removed.extend(diff["removed"])
+            if keys:
+                self.version += 1
+            return added, removed
+
+    async def follow(self, on_update: Optional[Callable[[List[str], List[str]], None]] = None):
+        """
+        Acompanha em background o espelho publicado pelo líder, chamando
+        on_update com os txids adicionados e removidos
+        """
+        self.following = True
+        try:
+            while True:
+                try:
+                    changes = await self.pull()
+                    if changes is not None and on_update is not None:
+                        on_update(*changes)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as ex:
+                    logger.warning(f"Erro ao ler a mempool compartilhada: {ex}")
+                await asyncio.sleep(self.config.poll_interval)
+        finally:
+            self.following = False
+
+    async def run(self, rpc, on_update: Optional[Callable[[List[str], List[str]], None]] = None):
+        """
+        Atualiza o espelho periodicamente em background, chamando on_update
+        com os txids adicionados e removidos a cada consulta e publicando o
+        diff para os demais workers
+        """
+        # Diffs aplicados como seguidor não valem para a época que este processo publicar
+        self._epoch = None
+        while True:
+            try:
+                added, removed = await self.refresh(rpc)
+                await self.publish(added, removed)
+                if on_update is not None:
+                    on_update(added, removed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                logger.warning(f"Erro ao atualizar a mempool: {ex}")
+            await asyncio.sleep(self.config.poll_interval)
+
+    def page(self, sort: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[MempoolEntry], Optional[str]]:
+        """
+        Página de entradas na ordem pedida, a partir do cursor (exclusivo)
+        """
+        index = self._indexes[sort]
+        start = bisect_right(index, decode_cursor(cursor)) if cursor else 0
+        keys = index[start:start + limit]
+        next_cursor = encode_cursor(keys[-1]) if keys and start + limit < len(index) else None
+        return [self.entries[txid] for _, txid in keys], next_cursor
+
+    def stats(self) -> Dict[str, Any]:
+        by_rate = self._indexes["feerate"]
+        count = len(by_rate)
+        return {
+            "count": count,
+            "total_vsize": self.total_vsize,
+            "total_fee": self.total_fee,
+            "max_feerate": -by_rate[0][0] / 1000 if count else None,
+            "median_feerate": -by_rate[count // 2][0] / 1000 if count else None,
+            "min_feerate": -by_rate[-1][0] / 1000 if count else None
+        }
@@ -0,0 +1,223 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import os
+import threading
+
+# Buckets em segundos (latência) e em número de chamadas/bytes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> Iterable[str]:
+        """
+        Linhas de amostra da métrica no formato texto
+        """
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # Por série: contagem em cada bucket (não cumulativa), soma e total
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1][0] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.label_names, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+# Coletor chamado a cada scrape: devolve (nome, tipo, ajuda, [(labels, valor)])
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+class Registry:
+    """
+    Conjunto de métricas exportado no formato texto do Prometheus
+    """
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def collector(self, fn: Collector) -> Collector:
+        """
+        Registra uma função que lê valores já mantidos em outro lugar
+        (ex.: contadores dos caches) no momento do scrape
+        """
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for fn in self._collectors:
+            for name, kind, help, samples in fn():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    names = tuple(labels)
+                    lines.append(f"{name}{_format_labels(names, [labels[n] for n in names])} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+rpc_seconds = registry.histogram(
+    "bitcoin_rpc_request_seconds", "Tempo de cada requisição ao bitcoind (lotes rotulados como method=batch)", ["method"]
+)
+rpc_calls = registry.counter("bitcoin_rpc_calls_total", "Chamadas RPC individuais, inclusive dentro de lotes", ["method"])
+rpc_errors = registry.counter("bitcoin_rpc_errors_total", "Requisições ao bitcoind que falharam", ["method"])
+rpc_json_seconds = registry.histogram(
+    "bitcoin_rpc_json_seconds", "Tempo gasto serializando e decodificando JSON do RPC", ["method"]
+)
+http_seconds = registry.histogram("http_request_seconds", "Duração das requisições HTTP", ["route"])
+http_requests = registry.counter("http_requests_total", "Requisições HTTP atendidas", ["route", "method", "status"])
+http_in_flight = registry.gauge("http_requests_in_flight", "Requisições HTTP em andamento")
+http_rpc_calls = registry.histogram(
+    "http_request_rpc_calls", "Chamadas RPC feitas por requisição HTTP", ["route"], COUNT_BUCKETS
+)
+http_response_bytes = registry.histogram(
+    "http_response_bytes", "Tamanho do corpo das respostas (quando conhecido)", ["route"], SIZE_BUCKETS
+)
+
+admission_rejected = registry.counter(
+    "bitcoin_rpc_admission_rejected_total", "Chamadas recusadas pelo controle de admissão", ["class", "reason"]
+)
+admission_wait_seconds = registry.histogram(
+    "bitcoin_rpc_admission_wait_seconds", "Espera por uma vaga no controle de admissão", ["class"]
+)
+
+@dataclass(slots=True)
+class RequestTiming:
+    """
+    Contabilidade de uma requisição HTTP: chamadas ao node, tempo de espera
+    e tempo de JSON do RPC (preenchida pelo BitcoinRPC via contextvar)
+    """
+    rpc_calls: int = 0
+    rpc_requests: int = 0
+    rpc_wait: float = 0.0
+    rpc_json: float = 0.0
+
+current_request: ContextVar[Optional[RequestTiming]] = ContextVar("current_request", default=None)
+
+def record_rpc(method: str, calls: int, wait: float, json_time: float, failed: bool = False):
+    """
+    Registra uma requisição ao bitcoind (uma chamada ou um lote com `calls` chamadas)
+    """
+    rpc_seconds.observe(wait, method=method)
+    rpc_json_seconds.observe(json_time, method=method)
+    if failed:
+        rpc_errors.inc(method=method)
+    timing = current_request.get()
+    if timing is not None:
+        timing.rpc_calls += calls
+        timing.rpc_requests += 1
+        timing.rpc_wait += wait
+        timing.rpc_json += json_time
+
+def server_timing(timing: RequestTiming, total: float) -> str:
+    """
+    Valor do header Server-Timing (durações em milissegundos)
+    """
+    return ", ".join([
+        f'rpc;dur={timing.rpc_wait * 1000:.1f};desc="{timing.rpc_calls} calls in {timing.rpc_requests} requests"',
+        f"rpc-json;dur={timing.rpc_json * 1000:.1f}",
+        f"app;dur={max(total - timing.rpc_wait - timing.rpc_json, 0) * 1000:.1f}",
+        f"total;dur={total * 1000:.1f}"
+    ])
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") not in ("0", "false", "no")
@@ -0,0 +1,165 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+from .admission import background_work
+from .cache import ChainCache
+from .shared import SharedCache
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Campos de getblock ausentes em getblockheader
+BLOCK_ONLY_FIELDS = ("tx", "size", "strippedsize", "weight")
+
+@dataclass
+class PrefetchConfig:
+    enabled: bool = True
+    warm_blocks: int = 3            # blocos mais recentes aquecidos no startup (e mantidos a cada tip)
+    concurrency: int = 1            # lotes de RPC simultâneos do prefetcher
+    batch_size: int = 100           # transações anteriores por lote de getrawtransaction
+    max_parents: int = 20000        # limite de transações anteriores buscadas por bloco
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv("PREFETCH_ENABLED", "1") not in ("0", "false", "no"),
+            warm_blocks=int(os.getenv("PREFETCH_WARM_BLOCKS", "3")),
+            concurrency=int(os.getenv("PREFETCH_CONCURRENCY", "1")),
+            batch_size=int(os.getenv("PREFETCH_BATCH_SIZE", "100")),
+            max_parents=int(os.getenv("PREFETCH_MAX_PARENTS", "20000"))
+        )
+
+class Prefetcher:
+    """
+    Aquece o cache com os blocos mais recentes, que são os mais abertos:
+    no startup os últimos warm_blocks e, a cada novo tip, o bloco novo com
+    o resumo, as transações e as transações anteriores dos seus inputs.
+    Cede a vez às requisições: usa no máximo `concurrency` chamadas ao node
+    e as faz na classe de fundo do controle de admissão, que só chama o
+    node quando nenhuma requisição espera vaga.
+    Roda só no líder, que grava também no cache compartilhado.
+    """
+    def __init__(self, config: PrefetchConfig, cache: ChainCache, shared: Optional[SharedCache] = None):
+        self.config = config
+        self.cache = cache
+        self.shared = shared
+        self._wake = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(max(config.concurrency, 1))
+        # Hashes já aquecidos (por hash, então um reorg aquece o bloco novo da mesma altura)
+        self._warmed: deque = deque(maxlen=max(config.warm_blocks, 1) * 4)
+        self.blocks = 0
+        self.transactions = 0
+        self.parents = 0
+        self.errors = 0
+
+    def notify(self):
+        """
+        Avisa que o tip mudou (chamado por follow_tip)
+        """
+        self._wake.set()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.config.enabled,
+            "warmed": list(self._warmed)[-self.config.warm_blocks:],
+            "blocks": self.blocks,
+            "transactions": self.transactions,
+            "parents": self.parents,
+            "errors": self.errors
+        }
+
+    async def _share(self, namespace: str, items: Dict[str, Any]):
+        if self.shared is not None:
+            await self.shared.put_many(namespace, items)
+
+    async def _batch(self, rpc, calls: List[tuple]) -> List[Any]:
+        async with self._semaphore:
+            return await rpc.batch(calls, return_exceptions=True)
+
+    async def warm_block(self, rpc, block_hash: str, summarize: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]):
+        """
+        Busca o bloco com verbosity 2 e guarda o resumo (se `summarize`),
+        as transações e as transações anteriores dos inputs no cache
+        """
+        block, = await self._batch(rpc, [("getblock", [block_hash, 2])])
+        if isinstance(block, Exception):
+            raise block
+        if summarize is not None and block_hash not in self.cache.blocks:
+            summary = summarize(block)
+            self.cache.blocks.put(block_hash, summary)
+            await self._share("blocks", {block_hash: summary})
+        # Mesmos campos de getblockheader (altura e horário das transações do bloco)
+        if block_hash not in self.cache.headers:
+            header = {k: v for k, v in block.items() if k not in BLOCK_ONLY_FIELDS}
+            self.cache.headers.put(block_hash, header)
+            await self._share("headers", {block_hash: header})
+
+        transactions = {tx["txid"]: self.cache.put_transaction(tx) for tx in block["tx"]}
+        await self._share("transactions", transactions)
+        in_block = set(transactions)
+        del transactions
+        self.transactions += len(in_block)
+        parents = list(dict.fromkeys(
+            vin["txid"] for tx in block["tx"] for vin in tx["vin"]
+            if "txid" in vin and vin["txid"] not in in_block and vin["txid"] not in self.cache.transactions
+        ))[:self.config.max_parents]
+        del block
+
+        async def fetch(chunk: List[str]):
+            fetched = {}
+            for parent in await self._batch(rpc, [("getrawtransaction", [txid, True]) for txid in chunk]):
+                if isinstance(parent, Exception):
+                    self.errors += 1
+                else:
+                    fetched[parent["txid"]] = self.cache.put_transaction(parent)
+            self.parents += len(fetched)
+            await self._share("transactions", fetched)
+
+        size = max(self.config.batch_size, 1)
+        await asyncio.gather(*(fetch(parents[i:i + size]) for i in range(0, len(parents), size)))
+        self._warmed.append(block_hash)
+        self.blocks += 1
+
+    async def _catch_up(self, rpc, summarize):
+        tip = self.cache.tip_height
+        if tip is None:
+            return
+        # Do mais novo para o mais antigo: o bloco do tip é o mais requisitado
+        heights = list(range(tip, max(tip - self.config.warm_blocks, -1), -1))
+        hashes = {height: self.cache.hash_at(height) for height in heights}
+        missing = [height for height, block_hash in hashes.items() if block_hash is None]
+        if missing:
+            for height, block_hash in zip(missing, await self._batch(rpc, [("getblockhash", [h]) for h in missing])):
+                if isinstance(block_hash, Exception):
+                    heights.remove(height)
+                    continue
+                hashes[height] = block_hash
+                self.cache.remember_height(height, block_hash)
+        for height in heights:
+            if hashes[height] in self._warmed:
+                continue
+            try:
+                await self.warm_block(rpc, hashes[height], summarize)
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                self.errors += 1
+                logger.warning(f"Erro ao pré-carregar o bloco {height}: {ex}")
+
+    async def run(self, rpc, summarize: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        """
+        Aquece os últimos blocos e segue o tip em background, sem atrasar
+        o startup
+        """
+        background_work.set(True)
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            try:
+                await self._catch_up(rpc, summarize)
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                logger.warning(f"Erro no prefetcher: {ex}")
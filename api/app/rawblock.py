@@ -0,0 +1,148 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import List, Tuple, Union
+import hashlib
+import json
+import struct
+
+# Alvo de dificuldade 1 (bits 0x1d00ffff)
+DIFF1_TARGET = 0xFFFF << 208
+
+@dataclass(slots=True)
+class RawTxSummary:
+    txid: str
+    size: int
+    vsize: int
+    weight: int
+    input_count: int
+    output_count: int
+    total_output: int   # satoshis
+    is_coinbase: bool
+
+@dataclass(slots=True)
+class RawBlock:
+    hash: str
+    version: int
+    previous_hash: str
+    merkle_root: str
+    time: int
+    bits: int
+    nonce: int
+    size: int
+    weight: int
+    transactions: List[RawTxSummary]
+
+    @property
+    def difficulty(self) -> float:
+        return bits_to_difficulty(self.bits)
+
+def bits_to_difficulty(bits: int) -> float:
+    exponent, mantissa = bits >> 24, bits & 0xFFFFFF
+    target = mantissa << (8 * (exponent - 3)) if exponent >= 3 else mantissa >> (8 * (3 - exponent))
+    return DIFF1_TARGET / target if target else 0.0
+
+def node_difficulty(difficulty: float) -> Union[int, Decimal]:
+    """
+    Dificuldade no formato de getblockheader: o node escreve o double com 16
+    dígitos significativos e o cliente RPC lê números com casas como
+    Decimal (e inteiros como int), então o JSON não depende de onde veio
+    """
+    return json.loads(f"{difficulty:.16g}", parse_float=Decimal)
+
+def _sha256d(*parts) -> bytes:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part)
+    return hashlib.sha256(h.digest()).digest()
+
+def _varint(data: memoryview, pos: int) -> Tuple[int, int]:
+    prefix = data[pos]
+    if prefix < 0xFD:
+        return prefix, pos + 1
+    if prefix == 0xFD:
+        return struct.unpack_from("<H", data, pos + 1)[0], pos + 3
+    if prefix == 0xFE:
+        return struct.unpack_from("<I", data, pos + 1)[0], pos + 5
+    return struct.unpack_from("<Q", data, pos + 1)[0], pos + 9
+
+def _parse_tx(data: memoryview, pos: int) -> Tuple[RawTxSummary, int, int]:
+    """
+    Lê uma transação a partir de pos sem copiar bytes: o txid é calculado
+    sobre fatias do memoryview (sem marker/flag e witness, como no consenso).
+    Retorna o resumo, a nova posição e o tamanho sem witness.
+    """
+    start = pos
+    pos += 4  # version
+    segwit = data[pos] == 0 and data[pos + 1] != 0
+    if segwit:
+        pos += 2  # marker + flag
+    io_start = pos
+
+    input_count, pos = _varint(data, pos)
+    is_coinbase = False
+    for i in range(input_count):
+        if i == 0 and input_count == 1:
+            is_coinbase = data[pos:pos + 32] == bytes(32) and data[pos + 32:pos + 36] == b"\xff\xff\xff\xff"
+        pos += 36  # prevout (txid + vout)
+        script_len, pos = _varint(data, pos)
+        pos += script_len + 4  # scriptSig + sequence
+
+    output_count, pos = _varint(data, pos)
+    total_output = 0
+    for _ in range(output_count):
+        total_output += struct.unpack_from("<q", data, pos)[0]
+        script_len, pos = _varint(data, pos + 8)
+        pos += script_len
+    io_end = pos
+
+    if segwit:
+        for _ in range(input_count):
+            items, pos = _varint(data, pos)
+            for _ in range(items):
+                item_len, pos = _varint(data, pos)
+                pos += item_len
+    lock = pos
+    pos += 4
+
+    stripped_size = 4 + (io_end - io_start) + 4
+    size = pos - start
+    weight = stripped_size * 3 + size
+    txid = _sha256d(data[start:start + 4], data[io_start:io_end], data[lock:pos])[::-1].hex()
+    summary = RawTxSummary(
+        txid=txid,
+        size=size,
+        vsize=(weight + 3) // 4,
+        weight=weight,
+        input_count=input_count,
+        output_count=output_count,
+        total_output=total_output,
+        is_coinbase=is_coinbase
+    )
+    return summary, pos, stripped_size
+
+def parse_block(raw: bytes) -> RawBlock:
+    """
+    Desserializa um bloco (getblock com verbosity 0) calculando, direto dos
+    bytes, hash, txids, tamanhos, weight e somas dos outputs
+    """
+    data = memoryview(raw)
+    version, prev, merkle, block_time, bits, nonce = struct.unpack_from("<i32s32sIII", data, 0)
+    tx_count, pos = _varint(data, 80)
+    stripped_size = pos
+    transactions = []
+    for _ in range(tx_count):
+        tx, pos, tx_stripped = _parse_tx(data, pos)
+        stripped_size += tx_stripped
+        transactions.append(tx)
+    return RawBlock(
+        hash=_sha256d(data[:80])[::-1].hex(),
+        version=version,
+        previous_hash=prev[::-1].hex(),
+        merkle_root=merkle[::-1].hex(),
+        time=block_time,
+        bits=bits,
+        nonce=nonce,
+        size=len(raw),
+        weight=stripped_size * 3 + len(raw),
+        transactions=transactions
+    )
@@ -0,0 +1,243 @@
+from bitcoin.rpc import JSONRPCError
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+from .admission import AdmissionConfig, AdmissionController
+from .metrics import record_rpc, rpc_calls
+import itertools
+import json
+import os
+import time
+import httpx
+
+@dataclass
+class BitcoinConfig:
+    host: str
+    port: str
+    user: str
+    password: str
+    pool_size: int = 16
+    timeout: float = 30.0
+    connect_timeout: float = 5.0
+    pool_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            host=os.getenv("BITCOIN_RPC_HOST", "localhost"),
+            port=os.getenv("BITCOIN_RPC_PORT", "18443"),
+            user=os.getenv("BITCOIN_RPC_USER", "user"),
+            password=os.getenv("BITCOIN_RPC_PASSWORD", "pass"),
+            pool_size=int(os.getenv("BITCOIN_RPC_POOL_SIZE", "16")),
+            timeout=float(os.getenv("BITCOIN_RPC_TIMEOUT", "30")),
+            connect_timeout=float(os.getenv("BITCOIN_RPC_CONNECT_TIMEOUT", "5")),
+            pool_timeout=float(os.getenv("BITCOIN_RPC_POOL_TIMEOUT", "10"))
+        )
+
+    @property
+    def service_url(self) -> str:
+        return f"http://{self.user}:{self.password}@{self.host}:{self.port}"
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+def _json_default(value: Any):
+    # Valores em BTC chegam como Decimal (parse_float) e podem voltar como parâmetro
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+class BitcoinRPC:
+    """
+    Cliente JSON-RPC assíncrono para o bitcoind, com um pool limitado
+    de conexões HTTP keep-alive compartilhado entre todas as requisições
+    e controle de admissão por classe de método
+    """
+    def __init__(self, config: BitcoinConfig, admission: Optional[AdmissionController] = None):
+        self.config = config
+        self.admission = admission or AdmissionController(AdmissionConfig(enabled=False))
+        self._client: Optional[httpx.AsyncClient] = None
+        self._ids = itertools.count(1)
+
+    def _create_client(self) -> httpx.AsyncClient:
+        """
+        Cria o cliente HTTP com o pool de conexões configurado
+        """
+        return httpx.AsyncClient(
+            base_url=self.config.base_url,
+            auth=(self.config.user, self.config.password),
+            headers={"Content-Type": "application/json"},
+            limits=httpx.Limits(
+                max_connections=self.config.pool_size,
+                max_keepalive_connections=self.config.pool_size
+            ),
+            timeout=httpx.Timeout(
+                self.config.timeout,
+                connect=self.config.connect_timeout,
+                pool=self.config.pool_timeout
+            )
+        )
+
+    async def start(self):
+        """
+        Abre o pool de conexões (chamado no startup da aplicação)
+        """
+        if self._client is None:
+            self._client = self._create_client()
+
+    async def close(self):
+        """
+        Fecha todas as conexões do pool
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _post(self, payload: Any, method: str) -> Any:
+        """
+        Envia a requisição após o controle de admissão, respeitando o prazo
+        da requisição HTTP atual
+        """
+        methods = [request["method"] for request in payload] if isinstance(payload, list) else [payload["method"]]
+        klass = self.admission.classify(methods)
+        async with self.admission.admit(methods) as left:
+            timeout = None
+            if left is not None:
+                if left <= 0:
+                    raise self.admission.reject(503, "Prazo da requisição esgotado", klass, "deadline")
+                # O prazo restante limita a espera; ao estourar, a conexão é abortada
+                timeout = httpx.Timeout(
+                    min(left, self.config.timeout),
+                    connect=min(left, self.config.connect_timeout),
+                    pool=min(left, self.config.pool_timeout)
+                )
+            try:
+                return await self._send(payload, method, klass, timeout)
+            except httpx.TimeoutException:
+                if timeout is None:
+                    raise
+                raise self.admission.reject(503, "Prazo da requisição esgotado aguardando o node", klass, "deadline")
+
+    async def _send(self, payload: Any, method: str, klass: str, timeout: Optional[httpx.Timeout]) -> Any:
+        """
+        Envia a requisição e registra separadamente o tempo de espera pelo
+        node e o tempo gasto com JSON (rotulados por `method`)
+        """
+        if self._client is None:
+            await self.start()
+        started = time.perf_counter()
+        content = json.dumps(payload, default=_json_default)
+        sent = received = time.perf_counter()
+        failed = True
+        try:
+            if timeout is None:
+                response = await self._client.post("/", content=content)
+            else:
+                response = await self._client.post("/", content=content, timeout=timeout)
+            received = time.perf_counter()
+            # O bitcoind responde erros RPC com status 404/500 e corpo JSON
+            if response.status_code == 401:
+                raise JSONRPCError({"code": -342, "message": "autenticação RPC recusada"})
+            # 503 sem corpo JSON: fila de trabalho do bitcoind (-rpcworkqueue) cheia
+            if response.status_code == 503 and not response.content.lstrip().startswith((b"{", b"[")):
+                raise self.admission.reject(503, "Fila de trabalho do node cheia", klass, "node-busy")
+            try:
+                result = json.loads(response.content, parse_float=Decimal)
+            except ValueError:
+                raise JSONRPCError({
+                    "code": -342,
+                    "message": f"resposta HTTP {response.status_code} inválida do servidor"
+                })
+            failed = False
+            return result
+        finally:
+            if received == sent:
+                received = time.perf_counter()
+            done = time.perf_counter()
+            calls = len(payload) if isinstance(payload, list) else 1
+            record_rpc(method, calls, received - sent, (sent - started) + (done - received), failed)
+
+    def _unwrap(self, response: Any) -> Any:
+        """
+        Extrai o result de uma resposta JSON-RPC ou levanta JSONRPCError
+        """
+        err = response.get("error")
+        if err is not None:
+            if isinstance(err, dict):
+                raise JSONRPCError({
+                    "code": err.get("code", -345),
+                    "message": err.get("message", "error message not specified")
+                })
+            raise JSONRPCError({"code": -344, "message": str(err)})
+        if "result" not in response:
+            raise JSONRPCError({"code": -343, "message": "missing JSON-RPC result"})
+        return response["result"]
+
+    async def call(self, method: str, *params: Any) -> Any:
+        """
+        Executa uma chamada RPC e retorna o campo result
+        """
+        payload = {"jsonrpc": "1.0", "id": next(self._ids), "method": method, "params": list(params)}
+        rpc_calls.inc(method=method)
+        return self._unwrap(await self._post(payload, method))
+
+    async def batch(self, calls: Iterable[Tuple[str, Sequence[Any]]],
+                    return_exceptions: bool = False) -> List[Any]:
+        """
+        Envia várias chamadas em uma única requisição JSON-RPC (array) e
+        devolve os resultados na mesma ordem das chamadas.
+
+        Com return_exceptions=True os erros individuais são devolvidos como
+        instâncias de JSONRPCError na posição correspondente, em vez de
+        interromper o lote inteiro.
+        """
+        payload = [
+            {"jsonrpc": "1.0", "id": next(self._ids), "method": method, "params": list(params)}
+            for method, params in calls
+        ]
+        if not payload:
+            return []
+        methods = Counter(request["method"] for request in payload)
+        for name, count in methods.items():
+            rpc_calls.inc(count, method=name)
+        # As chamadas são contadas por método; o tempo do lote, sob um rótulo fixo
+        responses = await self._post(payload, "batch")
+        if not isinstance(responses, list):
+            # Erros de lote (ex.: requisição malformada) vêm como objeto único
+            self._unwrap(responses)
+            raise JSONRPCError({"code": -343, "message": "resposta de lote inválida"})
+        by_id = {response.get("id"): response for response in responses}
+        results = []
+        for request in payload:
+            response = by_id.get(request["id"])
+            try:
+                if response is None:
+                    raise JSONRPCError({"code": -343, "message": "missing JSON-RPC result"})
+                results.append(self._unwrap(response))
+            except JSONRPCError as ex:
+                if not return_exceptions:
+                    raise
+                results.append(ex)
+        return results
+
+    def __getattr__(self, name: str):
+        # Permite usar `await rpc.getblockhash(n)` como no RawProxy
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def method(*params: Any) -> Any:
+            return await self.call(name, *params)
+
+        method.__name__ = name
+        return method
+
+    @asynccontextmanager
+    async def get_rpc(self):
+        """
+        Context manager que entrega o cliente compartilhado; as conexões
+        voltam para o pool ao final de cada chamada
+        """
+        yield self
@@ -0,0 +1,306 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+from .admission import AdmissionConfig, AdmissionController, remaining
+from .cache import SingleFlight
+import asyncio
+import fcntl
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_stored ON entries (stored);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner INTEGER NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+);
+"""
+
+def workers() -> int:
+    return max(int(os.getenv("UVICORN_WORKERS", "1")), 1)
+
+@dataclass
+class SharedCacheConfig:
+    # Por padrão só com mais de um worker; com um processo o cache em memória basta
+    enabled: bool = False
+    path: str = "data/shared_cache.sqlite"
+    max_bytes: int = 512 * 1024 * 1024
+    lease: float = 15.0             # tempo máximo de preenchimento de uma chave antes de outro worker assumir
+    poll_interval: float = 0.02     # intervalo entre verificações de quem espera outro worker
+    leader_path: str = "data/leader.lock"
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv("SHARED_CACHE_ENABLED", "1" if workers() > 1 else "0") not in ("0", "false", "no"),
+            path=os.getenv("SHARED_CACHE_PATH", "data/shared_cache.sqlite"),
+            max_bytes=int(os.getenv("SHARED_CACHE_BYTES", str(512 * 1024 * 1024))),
+            lease=float(os.getenv("SHARED_CACHE_LEASE", "15")),
+            poll_interval=float(os.getenv("SHARED_CACHE_POLL_INTERVAL", "0.02")),
+            leader_path=os.getenv("LEADER_LOCK_PATH", "data/leader.lock")
+        )
+
+def encode(value: Any) -> bytes:
+    # pickle preserva Decimal e tuplas; o arquivo só é escrito pelos workers da própria API
+    return zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+def decode(blob: bytes) -> Any:
+    return pickle.loads(zlib.decompress(blob))
+
+class SharedCache:
+    """
+    Cache compartilhado pelos workers de um host (SQLite em modo WAL), abaixo
+    do cache em memória de cada processo: entradas serializadas e
+    comprimidas, despejadas das mais antigas para as mais novas quando o
+    total passa de max_bytes. `fill` faz single-flight entre processos:
+    só o worker que obtém a concessão (lease) da chave consulta o node; os
+    demais esperam o valor aparecer no banco, no máximo até o prazo da
+    requisição (503 como no controle de admissão).
+
+    O estado publicado pelo líder (tip, mempool) fica em uma tabela à parte,
+    fora do despejo: `set_state` grava e `get_state` lê.
+    """
+    def __init__(self, config: SharedCacheConfig, admission: Optional[AdmissionController] = None):
+        self.config = config
+        self.admission = admission or AdmissionController(AdmissionConfig(enabled=False))
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self._flight = SingleFlight()
+        self._written = 0
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.waits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled and self._reader is not None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.config.path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def open(self):
+        directory = os.path.dirname(self.config.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._writer = self._connect()
+        with self._write_lock:
+            self._writer.executescript(SCHEMA)
+        self._reader = self._connect()
+
+    def close(self):
+        for conn in (self._writer, self._reader):
+            if conn is not None:
+                conn.close()
+        self._writer = self._reader = None
+
+    # Entradas --------------------------------------------------------------------
+
+    def _get_many(self, names: list) -> Dict[str, Any]:
+        found = {}
+        with self._read_lock:
+            for start in range(0, len(names), 500):
+                chunk = names[start:start + 500]
+                rows = self._reader.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for name, blob in rows:
+                    found[name] = decode(blob)
+        return found
+
+    def _put_many(self, items: Dict[str, Any]):
+        rows = [(name, blob, len(blob), time.time()) for name, blob in ((n, encode(v)) for n, v in items.items())]
+        with self._write_lock, self._writer:
+            self._writer.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, stored) VALUES (?, ?, ?, ?)", rows
+            )
+        self._written += sum(row[2] for row in rows)
+        # O despejo varre a tabela: só a cada ~10% de max_bytes escritos
+        if self._written > self.config.max_bytes // 10:
+            self._written = 0
+            self._trim()
+
+    def _trim(self):
+        with self._write_lock, self._writer:
+            # Mantém as entradas mais novas cuja soma cabe em max_bytes
+            self._writer.execute(
+                "DELETE FROM entries WHERE stored <= (SELECT stored FROM ("
+                "SELECT stored, SUM(size) OVER (ORDER BY stored DESC) AS kept FROM entries"
+                ") WHERE kept > ? ORDER BY stored DESC LIMIT 1)",
+                (self.config.max_bytes,)
+            )
+
+    async def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Valores já presentes para as chaves (as ausentes ficam de fora)
+        """
+        names = {f"{namespace}:{key}": key for key in keys}
+        if not names or not self.enabled:
+            return {}
+        found = await asyncio.to_thread(self._get_many, list(names))
+        self.hits += len(found)
+        self.misses += len(names) - len(found)
+        return {names[name]: value for name, value in found.items()}
+
+    async def put_many(self, namespace: str, items: Dict[str, Any]):
+        if items and self.enabled:
+            await asyncio.to_thread(self._put_many, {f"{namespace}:{key}": value for key, value in items.items()})
+
+    # Estado publicado pelo líder --------------------------------------------------
+
+    def _set_state(self, items: Dict[str, Any], drop: list):
+        rows = [(name, encode(value)) for name, value in items.items()]
+        with self._write_lock, self._writer:
+            if drop:
+                self._writer.executemany("DELETE FROM state WHERE key = ?", [(name,) for name in drop])
+            self._writer.executemany("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", rows)
+
+    def _get_state(self, names: list) -> Dict[str, Any]:
+        with self._read_lock:
+            rows = self._reader.execute(
+                f"SELECT key, value FROM state WHERE key IN ({', '.join('?' * len(names))})", names
+            ).fetchall()
+        return {name: decode(blob) for name, blob in rows}
+
+    async def set_state(self, items: Dict[str, Any], drop: Iterable[str] = ()):
+        """
+        Grava (e remove as chaves `drop`) em uma única transação
+        """
+        if self.enabled:
+            await asyncio.to_thread(self._set_state, items, list(drop))
+
+    async def get_state(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Estado das chaves (as ausentes ficam de fora), lido em uma única consulta
+        """
+        names = list(keys)
+        if not names or not self.enabled:
+            return {}
+        return await asyncio.to_thread(self._get_state, names)
+
+    # Single-flight entre processos -----------------------------------------------
+
+    def _acquire(self, name: str) -> bool:
+        now = time.time()
+        with self._write_lock, self._writer:
+            cursor = self._writer.execute(
+                "INSERT INTO leases (key, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.expires < ?",
+                (name, os.getpid(), now + self.config.lease, now)
+            )
+            return cursor.rowcount == 1
+
+    def _release(self, name: str):
+        with self._write_lock, self._writer:
+            self._writer.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (name, os.getpid()))
+
+    async def _fill(self, name: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        found = await asyncio.to_thread(self._get_many, [name])
+        if name in found:
+            self.hits += 1
+            return found[name]
+        self.misses += 1
+        # Outro worker está preenchendo a chave: espera o valor ou o fim da concessão
+        while not await asyncio.to_thread(self._acquire, name):
+            left = remaining()
+            if left is not None and left <= 0:
+                raise self.admission.reject(503, "Prazo da requisição esgotado aguardando outro worker", "shared", "deadline")
+            await asyncio.sleep(self.config.poll_interval if left is None else min(self.config.poll_interval, left))
+            found = await asyncio.to_thread(self._get_many, [name])
+            if name in found:
+                self.waits += 1
+                return found[name]
+        try:
+            value = await compute()
+            await asyncio.to_thread(self._put_many, {name: value})
+            self.fills += 1
+            return value
+        finally:
+            await asyncio.to_thread(self._release, name)
+
+    async def fill(self, namespace: str, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Valor da chave; na ausência, `compute` roda em um único worker do
+        host (e uma única vez por processo) e o resultado fica para os demais
+        """
+        if not self.enabled:
+            return await compute()
+        name = f"{namespace}:{key}"
+        return await self._flight.do(name, lambda: self._fill(name, compute))
+
+    def _totals(self) -> tuple:
+        with self._read_lock:
+            return self._reader.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+
+    async def status(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+        entries, size = await asyncio.to_thread(self._totals)
+        return {
+            "enabled": True,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.config.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "fills": self.fills,
+            "waits": self.waits
+        }
+
+class LeaderLock:
+    """
+    Eleição do worker que roda as tarefas de fundo que não devem se repetir
+    por processo (lock exclusivo não bloqueante em arquivo, como no block
+    store); se o líder terminar, o próximo `acquire` de outro worker assume
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def leader(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        logger.info(f"Processo {os.getpid()} assumiu as tarefas de fundo")
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
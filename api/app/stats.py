@@ -0,0 +1,437 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class StatsConfig:
+    enabled: bool = True
+    start_height: int = 0
+    batch_size: int = 100           # blocos por lote de getblockstats
+    poll_interval: float = 2.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.getenv("STATS_ENABLED", "1") not in ("0", "false", "no"),
+            start_height=int(os.getenv("STATS_START_HEIGHT", "0")),
+            batch_size=int(os.getenv("STATS_BATCH_SIZE", "100")),
+            poll_interval=float(os.getenv("STATS_POLL_INTERVAL", "2"))
+        )
+
+BLOCK_STATS_FIELDS = ["txs", "total_size", "total_weight", "totalfee", "avgfeerate", "feerate_percentiles"]
+# Percentis de feerate_percentiles do getblockstats (sat/vB)
+PERCENTILES = (10, 25, 50, 75, 90)
+MAX_BLOCK_WEIGHT = 4_000_000
+
+# Colunas por bloco: (dtype, formato de cada linha)
+COLUMNS: Dict[str, Tuple[Any, Tuple[int, ...]]] = {
+    "hash": ("S32", ()),
+    "time": (np.uint32, ()),
+    "txs": (np.uint32, ()),
+    "size": (np.uint32, ()),
+    "weight": (np.uint32, ()),
+    "fee": (np.int64, ()),          # satoshis
+    "avg_feerate": (np.float32, ()),
+    "feerates": (np.float32, (len(PERCENTILES),))
+}
+
+# Linhas por trecho publicado no estado compartilhado; o líder só regrava
+# os trechos a partir da primeira linha alterada
+CHUNK_ROWS = 1024
+STATE_HEAD = "stats"
+
+def _chunk_key(index: int) -> str:
+    return f"stats:chunk:{index}"
+
+# Cabeçalhos já conhecidos (hash, hash anterior, time) das alturas [first, last],
+# consecutivos a partir de first; ex.: BlockStore.headers
+HeaderSource = Callable[[int, int], Awaitable[List[Tuple[str, Optional[str], int]]]]
+
+class BlockColumns:
+    """
+    Estatísticas por bloco em arrays NumPy contíguos (uma linha por altura a
+    partir de `base`), com capacidade dobrada conforme a chain cresce
+    """
+    def __init__(self, base: int):
+        self.base = base
+        self.count = 0
+        self.columns = {name: np.zeros((0, *shape), dtype=dtype) for name, (dtype, shape) in COLUMNS.items()}
+
+    @property
+    def tip_height(self) -> int:
+        return self.base + self.count - 1
+
+    def tip_hash(self) -> Optional[str]:
+        return self.columns["hash"][self.count - 1][::-1].hex() if self.count else None
+
+    def _reserve(self, needed: int):
+        capacity = len(self.columns["time"])
+        if needed > capacity:
+            capacity = max(needed, capacity * 2, 1024)
+            for name, column in self.columns.items():
+                grown = np.zeros((capacity, *column.shape[1:]), dtype=column.dtype)
+                grown[:self.count] = column[:self.count]
+                self.columns[name] = grown
+
+    def append(self, rows: List[Dict[str, Any]]):
+        needed = self.count + len(rows)
+        self._reserve(needed)
+        for offset, row in enumerate(rows):
+            i = self.count + offset
+            for name, value in row.items():
+                self.columns[name][i] = value
+        self.count = needed
+
+    def append_columns(self, columns: Dict[str, np.ndarray]):
+        """
+        Acrescenta linhas já em colunas (ex.: um trecho publicado pelo líder)
+        """
+        rows = len(columns["time"])
+        self._reserve(self.count + rows)
+        for name, column in columns.items():
+            self.columns[name][self.count:self.count + rows] = column
+        self.count += rows
+
+    def rows(self, start: int, end: int) -> Dict[str, np.ndarray]:
+        """
+        Cópia das colunas para as posições [start, end)
+        """
+        return {name: column[start:end].copy() for name, column in self.columns.items()}
+
+    def truncate(self, count: int):
+        self.count = max(min(count, self.count), 0)
+
+    def window(self, start: int, end: int) -> Dict[str, np.ndarray]:
+        """
+        Views das colunas para as alturas [start, end]
+        """
+        lo, hi = start - self.base, end - self.base + 1
+        return {name: column[lo:hi] for name, column in self.columns.items()}
+
+def _row(block_hash: str, block_time: int, stats: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "hash": bytes.fromhex(block_hash)[::-1],
+        "time": block_time,
+        "txs": stats["txs"],
+        "size": stats["total_size"],
+        "weight": stats["total_weight"],
+        "fee": stats["totalfee"],
+        "avg_feerate": stats["avgfeerate"],
+        "feerates": stats["feerate_percentiles"]
+    }
+
+class BlockStats:
+    """
+    Mantém as colunas por bloco em dia com o node, em lotes, desfazendo
+    blocos que saírem da chain ativa.
+
+    Com vários workers só o líder consulta o node (`run`) e publica as
+    colunas no cache compartilhado em trechos de CHUNK_ROWS linhas, cada um
+    com a versão em que foi gravado; os demais recarregam só os trechos
+    cuja versão mudou (`follow`).
+    """
+    def __init__(self, config: StatsConfig, shared: Optional[Any] = None):
+        self.config = config
+        self.shared = shared
+        self.blocks = BlockColumns(config.start_height)
+        self.synced = False
+        # Incrementada a cada mudança; chave de versão das respostas em cache
+        self.version = 0
+        # Estado compartilhado: época do líder, versão de cada trecho e a
+        # primeira linha alterada desde a última publicação
+        self._epoch: Optional[str] = None
+        self._chunk_versions: List[int] = []
+        self._chunk_seq = 0
+        self._dirty_from: Optional[int] = None
+        self._published_synced: Optional[bool] = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.config.enabled,
+            "from": self.blocks.base,
+            "height": self.blocks.tip_height,
+            "synced": self.synced
+        }
+
+    def _changed(self, position: int):
+        self._dirty_from = position if self._dirty_from is None else min(self._dirty_from, position)
+        self.version += 1
+
+    async def _headers(self, rpc, first: int, last: int,
+                       headers: Optional[HeaderSource]) -> List[Tuple[str, Optional[str], int]]:
+        known = await headers(first, last) if headers is not None else []
+        if known:
+            return known
+        hashes = await rpc.batch([("getblockhash", [height]) for height in range(first, last + 1)])
+        return [
+            (header["hash"], header.get("previousblockhash"), header["time"])
+            for header in await rpc.batch([("getblockheader", [block_hash]) for block_hash in hashes])
+        ]
+
+    async def sync_step(self, rpc, headers: Optional[HeaderSource] = None, limit: Optional[int] = None) -> bool:
+        """
+        Acrescenta um lote de blocos até a altura `limit` (ou desfaz o topo).
+        Retorna False no tip ou no limite. Hash, hash anterior e time vêm de
+        `headers` quando as alturas já estão lá (só getblockstats vai ao
+        node); senão, de getblockheader.
+        """
+        blocks = self.blocks
+        calls = [("getblockcount", [])]
+        if blocks.count:
+            calls.append(("getblockhash", [blocks.tip_height]))
+        tip, *current = await rpc.batch(calls, return_exceptions=True)
+        if isinstance(tip, Exception):
+            raise tip
+        # Topo fora da chain ativa (ou acima do tip, se ela encolheu): desfaz
+        if current and current[0] != blocks.tip_hash():
+            blocks.truncate(blocks.count - 1)
+            self._changed(blocks.count)
+            return True
+
+        first = blocks.tip_height + 1
+        last = min(tip, first + self.config.batch_size - 1, tip if limit is None else limit)
+        if last < first:
+            self.synced = blocks.tip_height >= tip
+            return False
+
+        fetched = await self._headers(rpc, first, last, headers)
+        stats = await rpc.batch([("getblockstats", [block_hash, BLOCK_STATS_FIELDS]) for block_hash, _, _ in fetched])
+        # Aceita só a sequência encadeada ao topo atual (um reorg pode ocorrer no meio do lote)
+        rows = []
+        previous = blocks.tip_hash()
+        for (block_hash, previous_hash, block_time), block_stats in zip(fetched, stats):
+            if previous is not None and previous_hash != previous:
+                break
+            rows.append(_row(block_hash, block_time, block_stats))
+            previous = block_hash
+        if not rows:
+            blocks.truncate(blocks.count - 1)
+            self._changed(blocks.count)
+        else:
+            self._changed(blocks.count)
+            blocks.append(rows)
+        self.synced = blocks.tip_height >= tip
+        return True
+
+    # Estado compartilhado --------------------------------------------------------
+
+    @property
+    def _sharing(self) -> bool:
+        return self.shared is not None and self.shared.enabled
+
+    async def publish(self):
+        """
+        Regrava os trechos a partir da primeira linha alterada e o cabeçalho
+        (líder); trechos além do fim (após um reorg) são removidos
+        """
+        if not self._sharing or (self._dirty_from is None and self._published_synced == self.synced):
+            return
+        if self._epoch is None:
+            self._epoch, self._chunk_versions, self._dirty_from = f"{os.getpid()}:{time.time()}", [], 0
+        blocks = self.blocks
+        chunks = -(-blocks.count // CHUNK_ROWS)
+        first = chunks if self._dirty_from is None else min(self._dirty_from // CHUNK_ROWS, len(self._chunk_versions), chunks)
+        drop = [_chunk_key(index) for index in range(chunks, len(self._chunk_versions))]
+        self._chunk_seq += 1
+        self._chunk_versions = self._chunk_versions[:first] + [self._chunk_seq] * (chunks - first)
+        items = {
+            _chunk_key(index): {
+                "version": self._chunk_seq,
+                "columns": blocks.rows(index * CHUNK_ROWS, min((index + 1) * CHUNK_ROWS, blocks.count))
+            }
+            for index in range(first, chunks)
+        }
+        items[STATE_HEAD] = {
+            "epoch": self._epoch, "base": blocks.base, "count": blocks.count,
+            "synced": self.synced, "chunks": self._chunk_versions
+        }
+        await self.shared.set_state(items, drop)
+        self._dirty_from, self._published_synced = None, self.synced
+
+    async def pull(self) -> bool:
+        """
+        Recarrega os trechos publicados pelo líder que mudaram desde a última
+        leitura (seguidores). Retorna True se as colunas mudaram.
+        """
+        if not self._sharing:
+            return False
+        head = (await self.shared.get_state([STATE_HEAD])).get(STATE_HEAD)
+        if head is None or head["base"] != self.blocks.base:
+            return False
+        self.synced = head["synced"]
+        local = self._chunk_versions if head["epoch"] == self._epoch else []
+        first = 0
+        while first < min(len(local), len(head["chunks"])) and local[first] == head["chunks"][first]:
+            first += 1
+        if first == len(local) == len(head["chunks"]):
+            return False
+        keys = [_chunk_key(index) for index in range(first, len(head["chunks"]))]
+        chunks = await self.shared.get_state(keys)
+        # O líder removeu trechos entre as duas leituras: tenta de novo na próxima
+        if len(chunks) != len(keys):
+            return False
+        blocks = self.blocks
+        blocks.truncate(first * CHUNK_ROWS)
+        versions = local[:first]
+        for key in keys:
+            blocks.append_columns(chunks[key]["columns"])
+            versions.append(chunks[key]["version"])
+        self._epoch, self._chunk_versions = head["epoch"], versions
+        self._chunk_seq = max(self._chunk_seq, *versions) if versions else self._chunk_seq
+        self.version += 1
+        return True
+
+    async def follow(self):
+        """
+        Acompanha em background as colunas publicadas pelo líder
+        """
+        while True:
+            try:
+                await self.pull()
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                logger.warning(f"Erro ao ler as estatísticas compartilhadas: {ex}")
+            await asyncio.sleep(self.config.poll_interval)
+
+    async def run(self, rpc, headers: Optional[HeaderSource] = None, limit: Optional[Callable[[], Optional[int]]] = None):
+        """
+        Segue a chain em background, publicando as colunas para os demais
+        workers; começa do que o líder anterior publicou. `limit` devolve a
+        altura até onde avançar (ex.: a da fonte de `headers` enquanto ela
+        sincroniza; None: até o tip).
+        """
+        try:
+            await self.pull()
+        except Exception as ex:
+            logger.warning(f"Erro ao ler as estatísticas compartilhadas: {ex}")
+        while True:
+            try:
+                progressed = await self.sync_step(rpc, headers, None if limit is None else limit())
+                await self.publish()
+                if progressed:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                logger.warning(f"Erro nas estatísticas de blocos: {ex}")
+            await asyncio.sleep(self.config.poll_interval)
+
+    def summary(self, start: int, end: int) -> Dict[str, Any]:
+        """
+        Séries por bloco (colunares) e agregados do intervalo [start, end]
+        """
+        columns = self.blocks.window(start, end)
+        times = columns["time"].astype(np.int64)
+        # Intervalo até o bloco anterior, inclusive para o primeiro da janela
+        if start > self.blocks.base:
+            previous = np.int64(self.blocks.columns["time"][start - self.blocks.base - 1])
+        else:
+            previous = times[0] if len(times) else np.int64(0)
+        intervals = np.diff(times, prepend=previous)
+        feerates = columns["feerates"]
+        fill = columns["weight"] / MAX_BLOCK_WEIGHT
+        series = {
+            "height": np.arange(start, end + 1).tolist(),
+            "time": times.tolist(),
+            "interval": intervals.tolist(),
+            "txs": columns["txs"].tolist(),
+            "size": columns["size"].tolist(),
+            "weight": columns["weight"].tolist(),
+            "total_fee": columns["fee"].tolist(),
+            "avg_feerate": np.round(columns["avg_feerate"], 3).tolist()
+        }
+        for i, percentile in enumerate(PERCENTILES):
+            series[f"feerate_p{percentile}"] = np.round(feerates[:, i], 3).tolist()
+        if start == self.blocks.base:
+            series["interval"][0] = None
+            intervals = intervals[1:]
+        return {
+            "blocks": series,
+            "summary": {
+                "txs": _describe(columns["txs"]),
+                "size": _describe(columns["size"]),
+                "interval": _describe(intervals),
+                "fill": _describe(fill, digits=4),
+                "median_feerate": _describe(feerates[:, PERCENTILES.index(50)]) if len(feerates) else None,
+                "total_fee": int(columns["fee"].sum())
+            }
+        }
+
+def _describe(values: np.ndarray, digits: int = 2) -> Optional[Dict[str, float]]:
+    if not len(values):
+        return None
+    p10, p50, p90 = np.percentile(values, (10, 50, 90))
+    return {
+        "mean": round(float(values.mean()), digits),
+        "min": round(float(values.min()), digits),
+        "p10": round(float(p10), digits),
+        "median": round(float(p50), digits),
+        "p90": round(float(p90), digits),
+        "max": round(float(values.max()), digits)
+    }
+
+# Limites das faixas de taxa do histograma da mempool (sat/vB)
+FEE_BANDS = (1, 2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 30, 40, 50, 60, 70, 80, 90, 100,
+             125, 150, 175, 200, 250, 300, 350, 400, 500, 600, 700, 800, 900, 1000, 1200, 1500, 2000)
+# Tamanho virtual de um bloco cheio, para estimar a taxa de entrada nos próximos blocos
+BLOCK_VSIZE = MAX_BLOCK_WEIGHT // 4
+
+def fee_histogram(entries: List[Any], blocks: int = 3) -> Dict[str, Any]:
+    """
+    Histograma (transações e vbytes por faixa de taxa), percentis e a taxa
+    mínima para entrar em cada um dos próximos `blocks` blocos
+    """
+    count = len(entries)
+    if not count:
+        return {"count": 0, "vsize": 0, "histogram": [], "percentiles": None, "weighted_percentiles": None, "next_blocks": []}
+    feerates = np.fromiter((entry.feerate for entry in entries), dtype=np.float64, count=count) / 1000
+    vsizes = np.fromiter((entry.vsize for entry in entries), dtype=np.int64, count=count)
+    edges = np.array((0, *FEE_BANDS, np.inf))
+    counts, _ = np.histogram(feerates, bins=edges)
+    weights, _ = np.histogram(feerates, bins=edges, weights=vsizes)
+    histogram = [
+        {"min": float(lo), "max": None if np.isinf(hi) else float(hi), "count": int(n), "vsize": int(v)}
+        for lo, hi, n, v in zip(edges[:-1], edges[1:], counts, weights)
+        if n
+    ]
+
+    # Percentis por vbyte: ordena por taxa e acumula o tamanho virtual
+    order = np.argsort(feerates)
+    sorted_rates = feerates[order]
+    cumulative = np.cumsum(vsizes[order])
+    total = int(cumulative[-1])
+    weighted = {
+        f"p{p}": round(float(sorted_rates[min(np.searchsorted(cumulative, total * p / 100), count - 1)]), 3)
+        for p in PERCENTILES
+    }
+    # Próximos blocos: da maior para a menor taxa, cada bloco leva BLOCK_VSIZE vbytes
+    descending = np.cumsum(vsizes[order][::-1])
+    next_blocks = []
+    for block in range(blocks):
+        start = np.searchsorted(descending, block * BLOCK_VSIZE, side="right")
+        if start >= count:
+            break
+        end = min(np.searchsorted(descending, (block + 1) * BLOCK_VSIZE, side="right"), count - 1)
+        rates = sorted_rates[::-1][start:end + 1]
+        next_blocks.append({
+            "block": block + 1,
+            "min_feerate": round(float(rates.min()), 3),
+            "median_feerate": round(float(np.median(rates)), 3),
+            "max_feerate": round(float(rates.max()), 3)
+        })
+    return {
+        "count": count,
+        "vsize": total,
+        "histogram": histogram,
+        "percentiles": dict(zip((f"p{p}" for p in PERCENTILES),
+                                (round(float(v), 3) for v in np.percentile(feerates, PERCENTILES)))),
+        "weighted_percentiles": weighted,
+        "next_blocks": next_blocks
+    }
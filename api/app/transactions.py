@@ -0,0 +1,183 @@
+from dataclasses import dataclass, field
+from typing import AbstractSet, Any, Dict, List, Optional
+from .amounts import btc_to_sat, sat_to_btc, script_addresses
+
+@dataclass(slots=True)
+class TxInput:
+    txid: Optional[str]
+    vout: Optional[int]
+    sequence: Optional[int]
+    addresses: List[str] = field(default_factory=list)
+    value: Optional[int] = None     # satoshis; None se o input não foi resolvido
+    type: Optional[str] = None
+    coinbase: Optional[str] = None
+    script_sig: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        info: Dict[str, Any] = {"txid": self.txid, "vout": self.vout, "sequence": self.sequence}
+        if self.coinbase is not None:
+            info.update({"coinbase": self.coinbase, "type": "coinbase"})
+        elif self.error is not None:
+            info["error"] = self.error
+        else:
+            info.update({"addresses": self.addresses, "value": sat_to_btc(self.value), "type": self.type})
+        if self.script_sig is not None:
+            info["scriptSig"] = self.script_sig
+        return info
+
+@dataclass(slots=True)
+class TxOutput:
+    value: int                      # satoshis
+    n: int
+    type: Optional[str]
+    addresses: List[str]
+    script_pub_key: Optional[str]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "value": sat_to_btc(self.value),
+            "n": self.n,
+            "type": self.type,
+            "addresses": self.addresses,
+            "scriptPubKey": self.script_pub_key
+        }
+
+def build_inputs(tx_info: Dict[str, Any], parents: Dict[str, Any]) -> List[TxInput]:
+    """
+    Monta os inputs resolvendo valor e endereços pelas transações anteriores
+    (parents: txid → transação decodificada ou a exceção da busca)
+    """
+    inputs = []
+    for vin in tx_info["vin"]:
+        record = TxInput(txid=vin.get("txid"), vout=vin.get("vout"), sequence=vin.get("sequence"))
+        if "txid" in vin:
+            try:
+                prev_tx = parents[vin["txid"]]
+                if isinstance(prev_tx, Exception):
+                    raise prev_tx
+                prev_spk = prev_tx["vout"][vin["vout"]]["scriptPubKey"]
+                record.addresses = script_addresses(prev_spk)
+                record.value = btc_to_sat(prev_tx["vout"][vin["vout"]]["value"])
+                record.type = prev_spk.get("type")
+            except Exception as e:
+                record.error = f"Não foi possível obter detalhes do input: {str(e)}"
+        else:
+            record.coinbase = vin.get("coinbase")
+        if "scriptSig" in vin:
+            record.script_sig = {"asm": vin["scriptSig"].get("asm"), "hex": vin["scriptSig"].get("hex")}
+        inputs.append(record)
+    return inputs
+
+def build_outputs(tx_info: Dict[str, Any]) -> List[TxOutput]:
+    return [
+        TxOutput(
+            value=btc_to_sat(vout["value"]),
+            n=vout["n"],
+            type=vout["scriptPubKey"].get("type"),
+            addresses=script_addresses(vout["scriptPubKey"]),
+            script_pub_key=vout["scriptPubKey"].get("hex")
+        )
+        for vout in tx_info["vout"]
+    ]
+
+def address_totals(records) -> Dict[str, int]:
+    """
+    Soma, em uma única passada, o valor movimentado por endereço
+    (na ordem em que cada endereço aparece pela primeira vez)
+    """
+    totals: Dict[str, int] = {}
+    for record in records:
+        if record.value is None:
+            continue
+        for address in record.addresses:
+            totals[address] = totals.get(address, 0) + record.value
+    return totals
+
+def summarize_transfers(input_totals: Dict[str, int], output_totals: Dict[str, int]) -> List[Dict[str, Any]]:
+    """
+    Resumo origem → destino: cada par de endereços distintos recebe o menor
+    entre o total enviado pela origem e o recebido pelo destino, para evitar
+    dupla contagem
+    """
+    return [
+        {"from": source, "to": target, "value": sat_to_btc(min(sent, received))}
+        for source, sent in input_totals.items()
+        for target, received in output_totals.items()
+        if source != target  # Ignora transferências para o mesmo endereço
+    ]
+
+# Campos do resumo de uma transação, na ordem da resposta ("block" é
+# acrescentado por resolve_transactions nas confirmadas)
+TRANSACTION_FIELDS = (
+    "txid", "size", "vsize", "weight", "fee", "total_input", "total_output", "confirmations", "time",
+    "in_mempool", "inputs", "outputs", "transfers", "input_addresses", "output_addresses", "block"
+)
+# view=summary: taxa e confirmação, sem inputs, outputs nem endereços
+SUMMARY_FIELDS = frozenset({"txid", "size", "vsize", "weight", "fee", "confirmations", "time", "in_mempool", "block"})
+# Campos que exigem as transações anteriores (valor e endereços de cada input)
+PREVOUT_FIELDS = frozenset({"inputs", "transfers", "input_addresses"})
+
+def node_fee(tx_info: Dict[str, Any]) -> Optional[int]:
+    """
+    Taxa informada pelo node (getrawtransaction com verbosity 2), em
+    satoshis; None se ausente e a transação não for coinbase
+    """
+    if "fee" in tx_info:
+        return btc_to_sat(tx_info["fee"])
+    if tx_info["vin"] and "coinbase" in tx_info["vin"][0]:
+        return 0
+    return None
+
+def needs_prevouts(tx_info: Dict[str, Any], fields: Optional[AbstractSet[str]]) -> bool:
+    if fields is None or fields & PREVOUT_FIELDS:
+        return True
+    return bool(fields & {"fee", "total_input"}) and node_fee(tx_info) is None
+
+def summarize_transaction(tx_info: Dict[str, Any], parents: Dict[str, Any], in_mempool: bool,
+                          fields: Optional[AbstractSet[str]] = None) -> Dict[str, Any]:
+    """
+    Resumo de uma transação com inputs resolvidos, outputs, taxa e
+    transferências, com toda a aritmética em satoshis. Com `fields`, monta
+    só os campos pedidos; sem os que dependem dos inputs, a taxa vem do
+    node e as transações anteriores não são consultadas.
+    """
+    wanted = fields if fields is not None else frozenset(TRANSACTION_FIELDS)
+    is_coinbase = bool(tx_info["vin"]) and "coinbase" in tx_info["vin"][0]
+    inputs = build_inputs(tx_info, parents) if needs_prevouts(tx_info, fields) else None
+    outputs = build_outputs(tx_info) if wanted & {"outputs", "transfers", "output_addresses"} else None
+
+    total_output = sum(btc_to_sat(vout["value"]) for vout in tx_info["vout"])
+    if inputs is not None:
+        total_input = sum(record.value for record in inputs if record.value is not None)
+        # Calcula a taxa se não for coinbase
+        fee = total_input - total_output if not is_coinbase else 0
+    else:
+        fee = node_fee(tx_info) or 0
+        total_input = total_output + fee if not is_coinbase else 0
+
+    summary = {
+        "txid": tx_info["txid"],
+        "size": tx_info["size"],
+        "vsize": tx_info["vsize"],
+        "weight": tx_info["weight"],
+        "fee": sat_to_btc(fee),
+        "total_input": sat_to_btc(total_input),
+        "total_output": sat_to_btc(total_output),
+        "confirmations": tx_info.get("confirmations", 0),
+        "time": tx_info.get("time"),
+        "in_mempool": in_mempool
+    }
+    if inputs is not None and "inputs" in wanted:
+        summary["inputs"] = [record.to_dict() for record in inputs]
+    if outputs is not None and "outputs" in wanted:
+        summary["outputs"] = [record.to_dict() for record in outputs]
+    if wanted & {"transfers", "input_addresses", "output_addresses"}:
+        input_totals = address_totals(inputs) if inputs is not None else {}
+        output_totals = address_totals(outputs) if outputs is not None else {}
+        summary.update({
+            "transfers": summarize_transfers(input_totals, output_totals),
+            "input_addresses": list(input_totals),
+            "output_addresses": list(output_totals)
+        })
+    return {field: summary[field] for field in TRANSACTION_FIELDS if field in wanted and field in summary}
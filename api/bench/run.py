@@ -0,0 +1,344 @@
+"""
+Benchmark de carga da API contra o bitcoind falso.
+
+Sobe o bitcoind falso e a API (ou usa uma API já rodando com --api), gera
+carga em cada endpoint e reporta vazão, latências p50/p95/p99 e chamadas
+RPC por requisição (lidas de /metrics). Termina com código 1 se houver
+regressão em relação aos baselines:
+
+- bench/baseline.json (versionado): só números que não dependem da máquina,
+  chamadas RPC por requisição e erros;
+- bench/timings.local.json (fora do git): vazão e latências, gravadas na
+  própria máquina com --save-timings; sem ele as latências não são comparadas.
+
+Uso:
+    python -m bench.run                        # compara com os baselines
+    python -m bench.run --save-baseline        # grava chamadas RPC e erros em bench/baseline.json
+    python -m bench.run --save-timings         # grava vazão e latências desta máquina
+    python -m bench.run --api http://localhost:8001 --scenarios block_full,transaction
+"""
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.dirname(BENCH_DIR)
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_TIMINGS = os.path.join(BENCH_DIR, "timings.local.json")
+# Campos de cada cenário que não dependem da máquina (os únicos versionados)
+PORTABLE_FIELDS = ("requests", "errors", "rpc_calls_per_request")
+TIMING_FIELDS = ("throughput", "p50_ms", "p95_ms", "p99_ms")
+
+@dataclass
+class BenchConfig:
+    requests: int = 300
+    concurrency: int = 8
+    seed: int = 1
+    # Tolerâncias relativas: latência/vazão oscilam entre execuções, chamadas RPC não
+    tolerance: float = 0.5
+    rpc_tolerance: float = 0.1
+    # Diferença mínima em ms para contar como regressão (ruído em latências muito baixas)
+    min_delta_ms: float = 2.0
+    blocks: int = 200
+    txs_per_block: int = 50
+    mempool_txs: int = 500
+    latency_ms: float = 1.0
+    scan_latency_ms: float = 50.0
+
+@dataclass
+class Samples:
+    tip: int
+    txids: List[str]
+    addresses: List[str]
+
+# Cenário: rota (template usado nas métricas da API) e gerador de caminhos
+SCENARIOS: Dict[str, Tuple[str, Callable[[Samples, random.Random], str]]] = {
+    "root": ("/", lambda s, rng: "/"),
+    "network_info": ("/network/info", lambda s, rng: "/network/info"),
+    "blocks_list": ("/blocks", lambda s, rng: f"/blocks?before={rng.randint(20, s.tip + 1)}&limit=20"),
+    "block_full": ("/blocks/{block_number}", lambda s, rng: f"/blocks/{rng.randint(1, s.tip)}"),
+    "block_page": ("/blocks/{block_number}", lambda s, rng: f"/blocks/{rng.randint(1, s.tip)}?limit=25"),
+    "transaction": ("/transactions/{tx_hash}", lambda s, rng: f"/transactions/{rng.choice(s.txids)}"),
+    "balance": ("/balance/{address}", lambda s, rng: f"/balance/{rng.choice(s.addresses)}"),
+    "mempool": ("/mempool", lambda s, rng: "/mempool?limit=50"),
+}
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+_METRIC_LINE = re.compile(r'^http_request_rpc_calls_(sum|count)\{route="([^"]*)"\} (\S+)$')
+
+async def rpc_counters(client: httpx.AsyncClient) -> Dict[str, Tuple[float, float]]:
+    """
+    Soma e contagem do histograma de chamadas RPC por requisição, por rota
+    """
+    response = await client.get("/metrics")
+    if response.status_code != 200:
+        return {}
+    counters: Dict[str, List[float]] = {}
+    for line in response.text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if match:
+            kind, route, value = match.groups()
+            counters.setdefault(route, [0.0, 0.0])[0 if kind == "sum" else 1] = float(value)
+    return {route: (values[0], values[1]) for route, values in counters.items()}
+
+async def collect_samples(client: httpx.AsyncClient, rng: random.Random) -> Samples:
+    """
+    Escolhe alturas, txids e endereços reais consultando a própria API
+    """
+    info = (await client.get("/network/info")).json()
+    tip = info["lastBlock"]
+    txids: List[str] = []
+    for height in rng.sample(range(1, tip + 1), min(10, tip)):
+        block = (await client.get(f"/blocks/{height}", params={"limit": 20})).json()
+        txids.extend(tx["txid"] for tx in block["transactions"][1:])
+    addresses: List[str] = []
+    for txid in txids[:20]:
+        tx = (await client.get(f"/transactions/{txid}")).json()
+        addresses.extend(tx.get("output_addresses", []))
+    return Samples(tip=tip, txids=txids, addresses=sorted(set(addresses)) or ["invalid"])
+
+async def run_scenario(client: httpx.AsyncClient, name: str, samples: Samples, config: BenchConfig) -> Dict[str, Any]:
+    route, make_path = SCENARIOS[name]
+    rng = random.Random(f"{config.seed}:{name}")
+    paths = [make_path(samples, rng) for _ in range(config.requests)]
+    latencies: List[float] = []
+    errors = 0
+    queue = iter(paths)
+
+    async def worker():
+        nonlocal errors
+        for path in queue:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    before = await rpc_counters(client)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(config.concurrency)))
+    elapsed = time.perf_counter() - started
+    after = await rpc_counters(client)
+
+    calls = after.get(route, (0.0, 0.0))[0] - before.get(route, (0.0, 0.0))[0]
+    handled = after.get(route, (0.0, 0.0))[1] - before.get(route, (0.0, 0.0))[1]
+    latencies.sort()
+    return {
+        "requests": len(paths),
+        "errors": errors,
+        "throughput": round(len(paths) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "rpc_calls_per_request": round(calls / handled, 2) if handled else None
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], config: BenchConfig) -> List[str]:
+    """
+    Lista as regressões em relação ao baseline; só compara os campos que o
+    baseline tem (o versionado não tem latências nem vazão)
+    """
+    problems = []
+    tolerance = config.tolerance
+    for name, result in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        # Caudas oscilam mais que a mediana: p95 tem o dobro da tolerância e o
+        # p99, com poucas centenas de requisições, fica só no relatório
+        for field, factor in (("p50_ms", 1), ("p95_ms", 2)):
+            if field not in base:
+                continue
+            limit = max(base[field] * (1 + tolerance * factor), base[field] + config.min_delta_ms)
+            if result[field] > limit:
+                problems.append(f"{name}: {field} {result[field]} > {limit:.2f} (baseline {base[field]})")
+        if "throughput" in base and result["throughput"] < base["throughput"] * (1 - tolerance):
+            problems.append(f"{name}: vazão {result['throughput']} < baseline {base['throughput']}")
+        if "errors" in base and result["errors"] > base["errors"]:
+            problems.append(f"{name}: {result['errors']} erros (baseline {base['errors']})")
+        calls, base_calls = result["rpc_calls_per_request"], base.get("rpc_calls_per_request")
+        if calls is not None and base_calls is not None and calls > base_calls * (1 + config.rpc_tolerance) + 0.5:
+            problems.append(f"{name}: {calls} chamadas RPC por requisição (baseline {base_calls})")
+    return problems
+
+def select_fields(report: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """
+    Relatório só com os campos `fields` de cada cenário (PORTABLE_FIELDS para
+    o baseline versionado, TIMING_FIELDS para o local)
+    """
+    return {
+        "config": report["config"],
+        "scenarios": {
+            name: {field: result[field] for field in fields}
+            for name, result in report["scenarios"].items()
+        }
+    }
+
+def print_report(report: Dict[str, Any]):
+    header = f"{'cenário':<14}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'rpc/req':>9}{'erros':>7}"
+    print(header)
+    print("-" * len(header))
+    for name, r in report["scenarios"].items():
+        calls = "-" if r["rpc_calls_per_request"] is None else r["rpc_calls_per_request"]
+        print(f"{name:<14}{r['throughput']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{calls:>9}{r['errors']:>7}")
+
+def _wait_http(url: str, timeout: float, method: str = "GET"):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.request(method, url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} não respondeu em {timeout:.0f}s")
+
+def _wait_synced(api_url: str, timeout: float):
+    """
+    Espera as tarefas de background (block store) alcançarem o tip, para
+    que as medições não dependam do momento em que o benchmark começou
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = httpx.get(f"{api_url}/cache/stats", timeout=5).json()
+        store = stats.get("block_store")
+        if store is None or store.get("synced"):
+            return
+        time.sleep(0.5)
+
+class Stack:
+    """
+    bitcoind falso e API em subprocessos, com diretório de dados temporário
+    """
+    def __init__(self, config: BenchConfig, fake_port: int, api_port: int):
+        self.config = config
+        self.fake_port = fake_port
+        self.api_port = api_port
+        self.data = tempfile.TemporaryDirectory(prefix="bench-")
+        self.processes: List[subprocess.Popen] = []
+
+    @property
+    def api_url(self) -> str:
+        return f"http://127.0.0.1:{self.api_port}"
+
+    def __enter__(self) -> "Stack":
+        c = self.config
+        self.processes.append(subprocess.Popen([
+            sys.executable, "-m", "bench.fake_bitcoind", "--port", str(self.fake_port),
+            "--blocks", str(c.blocks), "--txs-per-block", str(c.txs_per_block),
+            "--mempool-txs", str(c.mempool_txs), "--latency-ms", str(c.latency_ms),
+            "--scan-latency-ms", str(c.scan_latency_ms), "--seed", str(c.seed)
+        ], cwd=API_DIR))
+        _wait_http(f"http://127.0.0.1:{self.fake_port}/calls", 300)
+        env = {
+            **os.environ,
+            "BITCOIN_RPC_HOST": "127.0.0.1",
+            "BITCOIN_RPC_PORT": str(self.fake_port),
+            "ADDRESS_INDEX_PATH": os.path.join(self.data.name, "address_index.sqlite"),
+            "BLOCK_STORE_PATH": os.path.join(self.data.name, "blockstore"),
+        }
+        self.processes.append(subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(self.api_port), "--log-level", "warning"
+        ], cwd=API_DIR, env=env))
+        _wait_http(f"{self.api_url}/", 60)
+        _wait_synced(self.api_url, 300)
+        return self
+
+    def __exit__(self, *exc):
+        for process in reversed(self.processes):
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.data.cleanup()
+
+async def benchmark(api_url: str, config: BenchConfig, scenarios: List[str]) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=config.concurrency, max_keepalive_connections=config.concurrency)
+    async with httpx.AsyncClient(base_url=api_url, limits=limits, timeout=60) as client:
+        samples = await collect_samples(client, random.Random(config.seed))
+        results = {}
+        for name in scenarios:
+            results[name] = await run_scenario(client, name, samples, config)
+    return {"config": asdict(config), "scenarios": results}
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de carga da API")
+    parser.add_argument("--api", help="URL de uma API já rodando (não sobe o bitcoind falso)")
+    parser.add_argument("--fake-port", type=int, default=18600)
+    parser.add_argument("--api-port", type=int, default=18601)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="lista separada por vírgulas")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--timings", default=DEFAULT_TIMINGS)
+    parser.add_argument("--save-baseline", action="store_true", help="grava chamadas RPC e erros como baseline versionado")
+    parser.add_argument("--save-timings", action="store_true", help="grava vazão e latências como baseline local")
+    parser.add_argument("--output", help="grava o relatório JSON neste arquivo")
+    defaults = BenchConfig()
+    for name, value in vars(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    config = BenchConfig(**{k: v for k, v in vars(args).items() if k in BenchConfig.__dataclass_fields__})
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Cenários desconhecidos: {', '.join(unknown)}")
+
+    if args.api:
+        report = asyncio.run(benchmark(args.api.rstrip("/"), config, scenarios))
+    else:
+        with Stack(config, args.fake_port, args.api_port) as stack:
+            report = asyncio.run(benchmark(stack.api_url, config, scenarios))
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    saved = False
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(select_fields(report, PORTABLE_FIELDS), f, indent=2)
+            f.write("\n")
+        print(f"Baseline gravado em {args.baseline}")
+        saved = True
+    if args.save_timings:
+        with open(args.timings, "w") as f:
+            json.dump(select_fields(report, TIMING_FIELDS), f, indent=2)
+        print(f"Latências gravadas em {args.timings}")
+        saved = True
+    if saved:
+        return 0
+
+    problems = []
+    for path, hint in ((args.baseline, "--save-baseline"), (args.timings, "--save-timings")):
+        if not os.path.exists(path):
+            print(f"Sem {os.path.basename(path)} para comparar (use {hint})")
+            continue
+        with open(path) as f:
+            problems.extend(compare(report, json.load(f), config))
+    for problem in problems:
+        print(f"REGRESSÃO {problem}")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+from app.admission import BACKGROUND, AdmissionConfig, AdmissionController, AdmissionError, background_work
+from app.metrics import admission_rejected
+from app.rpc import BitcoinConfig, BitcoinRPC
+import asyncio
+import httpx
+import pytest
+
+def controller(**limits) -> AdmissionController:
+    return AdmissionController(AdmissionConfig(**{"standard_limit": 1, "background_limit": 1, **limits}))
+
+def rejected(klass: str) -> int:
+    prefix = f'bitcoin_rpc_admission_rejected_total{{class="{klass}",reason="node-busy"}} '
+    return sum(int(float(line[len(prefix):])) for line in admission_rejected.samples() if line.startswith(prefix))
+
+async def hold(admission: AdmissionController, events: list, name: str, release: asyncio.Event, background: bool = False):
+    background_work.set(background)
+    async with admission.admit(["getblock"]):
+        events.append(name)
+        await release.wait()
+
+def test_background_waits_for_queued_requests():
+    async def scenario():
+        admission = controller()
+        events = []
+        release_live, release_background = asyncio.Event(), asyncio.Event()
+        first = asyncio.create_task(hold(admission, events, "live-1", release_live))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(hold(admission, events, "live-2", release_live))
+        await asyncio.sleep(0)
+        assert admission.status()["standard"]["waiting"] == 1
+
+        # Há requisição na fila: o trabalho de fundo espera, mesmo com a própria vaga livre
+        background = asyncio.create_task(hold(admission, events, "background", release_background, background=True))
+        await asyncio.sleep(0.01)
+        assert events == ["live-1"]
+        assert admission.status()[BACKGROUND]["waiting"] == 1
+
+        # A fila esvazia (live-2 obtém a vaga): o fundo entra na própria vaga sem
+        # ocupar a das requisições
+        release_live.set()
+        await asyncio.sleep(0.01)
+        assert events == ["live-1", "live-2", "background"]
+        assert admission.status()[BACKGROUND]["in_flight"] == 1
+        assert admission.status()["standard"]["in_flight"] == 0
+        release_background.set()
+        await asyncio.gather(first, second, background)
+    asyncio.run(scenario())
+
+def test_background_does_not_take_live_slots():
+    async def scenario():
+        admission = controller()
+        events = []
+        release = asyncio.Event()
+        background = asyncio.create_task(hold(admission, events, "background", release, background=True))
+        await asyncio.sleep(0)
+        # Uma requisição não espera pelo trabalho de fundo em andamento
+        async with admission.admit(["getblock"]):
+            events.append("live")
+        assert events == ["background", "live"]
+        release.set()
+        await background
+    asyncio.run(scenario())
+
+def test_background_yields_to_requests_queued_during_acquire():
+    async def scenario():
+        admission = controller(background_limit=1)
+        events = []
+        release_first, release_live, release_second = asyncio.Event(), asyncio.Event(), asyncio.Event()
+        # O fundo ocupa a própria vaga; outro lote de fundo espera por ela
+        first = asyncio.create_task(hold(admission, events, "background-1", release_first, background=True))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(hold(admission, events, "background-2", release_second, background=True))
+        await asyncio.sleep(0)
+        # Chega uma requisição que precisa esperar (vaga padrão ocupada)
+        live_holder = asyncio.create_task(hold(admission, events, "live-1", release_live))
+        await asyncio.sleep(0)
+        live_waiter = asyncio.create_task(hold(admission, events, "live-2", release_live))
+        await asyncio.sleep(0)
+
+        # A vaga de fundo libera enquanto há requisição na fila: background-2 não entra
+        release_first.set()
+        await asyncio.sleep(0.01)
+        assert "background-2" not in events
+        release_live.set()
+        await asyncio.sleep(0.01)
+        assert events[-1] == "background-2"
+        release_second.set()
+        await asyncio.gather(first, second, live_holder, live_waiter)
+    asyncio.run(scenario())
+
+def test_rejects_use_the_admitted_class():
+    async def scenario():
+        admission = controller()
+        background_work.set(True)
+        assert admission.classify(["getblock"]) == BACKGROUND
+        rpc = BitcoinRPC(BitcoinConfig("localhost", "18443", "user", "pass"), admission)
+        # Fila de trabalho do node cheia: 503 sem corpo JSON
+        rpc._client = httpx.AsyncClient(base_url=rpc.config.base_url, transport=httpx.MockTransport(
+            lambda request: httpx.Response(503, content=b"Work queue depth exceeded")
+        ))
+        with pytest.raises(AdmissionError):
+            await rpc.getblock("ab" * 32)
+        await rpc.close()
+    before = rejected(BACKGROUND), rejected("standard")
+    asyncio.run(scenario())
+    assert (rejected(BACKGROUND), rejected("standard")) == (before[0] + 1, before[1])
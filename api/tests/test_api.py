@@ -0,0 +1,285 @@
+from collections import Counter
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from bitcoin.rpc import JSONRPCError
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from app import main
+from app.amounts import sat_to_btc
+from app.blockstore import BlockStore, BlockStoreConfig
+from app.cache import CacheConfig, ChainCache
+import asyncio
+import json
+import pytest
+
+def block_header() -> dict:
+    return {
+        "height": 10, "hash": "ab" * 32, "time": 1_700_000_000, "nonce": 1,
+        "difficulty": Decimal("4.656542373906925E-10"), "num_transactions": 3,
+        "size": 1000, "weight": 4000, "merkle_root": "cd" * 32
+    }
+
+def block_transactions() -> list:
+    return [
+        {"txid": f"{n:064x}", "size": 200, "vsize": 150, "fee": "0" if n == 0 else sat_to_btc(1234 * n),
+         "input_count": 1, "output_count": 2, "total_output": sat_to_btc(5_000_000_000 - n)}
+        for n in range(3)
+    ]
+
+def chain_hashes(length: int, tag: str = "") -> List[str]:
+    return [f"{tag}{height:x}".rjust(64, "0") for height in range(length)]
+
+def raw_tx(txid: str, spends: List[tuple], pays: List[tuple], block: Optional[str] = None) -> Dict[str, Any]:
+    vin = [{"txid": parent, "vout": n, "sequence": 0} for parent, n in spends] or [{"coinbase": "03", "sequence": 0}]
+    vout = [
+        {"value": Decimal(value), "n": n, "scriptPubKey": {"type": "witness_v0_keyhash", "hex": SCRIPTS[address], "address": address}}
+        for n, (address, value) in enumerate(pays)
+    ]
+    tx = {"txid": txid, "size": 200, "vsize": 150, "weight": 600, "vin": vin, "vout": vout}
+    if block is not None:
+        tx.update({"blockhash": block, "confirmations": 1, "time": 1_700_000_000})
+    return tx
+
+SCRIPTS = {"alice": "0014" + "a1" * 20, "bob": "0014" + "b0" * 20, "carol": "0014" + "c4" * 20}
+
+class FakeNode:
+    """
+    Node em memória para os endpoints: cinco blocos, uma transação
+    confirmada que gasta a coinbase do bloco 1, uma na mempool que gasta a
+    anterior e o UTXO set correspondente. Conta as chamadas por método
+    (inclusive dentro de lotes).
+    """
+    def __init__(self, hashes: Optional[List[str]] = None):
+        self.hashes = hashes or chain_hashes(5)
+        self.calls: Counter = Counter()
+        coinbase, spend, pending = "c0" * 32, "5e" * 32, "3e" * 32
+        self.transactions = {
+            coinbase: raw_tx(coinbase, [], [("alice", "50")], self.hashes[1]),
+            spend: raw_tx(spend, [(coinbase, 0)], [("bob", "30"), ("alice", "19.9999")], self.hashes[3]),
+            pending: raw_tx(pending, [(spend, 0)], [("carol", "29.99")])
+        }
+        self.fees = {spend: Decimal("0.0001"), pending: Decimal("0.01")}
+        self.utxos = [
+            {"txid": spend, "vout": 1, "scriptPubKey": SCRIPTS["alice"], "amount": Decimal("19.9999"), "height": 3},
+            {"txid": pending, "vout": 0, "scriptPubKey": SCRIPTS["carol"], "amount": Decimal("29.99"), "height": 4},
+            {"txid": "0f" * 32, "vout": 2, "scriptPubKey": SCRIPTS["alice"], "amount": Decimal("0.5"), "height": 2}
+        ]
+
+    @asynccontextmanager
+    async def get_rpc(self):
+        yield self
+
+    def _call(self, method: str, params: List[Any]) -> Any:
+        self.calls[method] += 1
+        if method == "getblockhash":
+            if not 0 <= params[0] < len(self.hashes):
+                raise JSONRPCError({"code": -8, "message": "Block height out of range"})
+            return self.hashes[params[0]]
+        if method in ("getblock", "getblockheader"):
+            height = self.hashes.index(params[0])
+            header = {"hash": params[0], "height": height, "time": 1_700_000_000 + height * 600}
+            if method == "getblockheader":
+                return header
+            txs = [tx for tx in self.transactions.values() if tx.get("blockhash") == params[0]]
+            return {**header, "nonce": height, "difficulty": Decimal("1"), "size": 1000, "weight": 4000,
+                    "merkleroot": "ee" * 32, "tx": txs}
+        if method == "getrawtransaction":
+            if params[0] not in self.transactions:
+                raise JSONRPCError({"code": -5, "message": "No such mempool or blockchain transaction"})
+            tx = dict(self.transactions[params[0]])
+            if params[1] == 2 and params[0] in self.fees:
+                tx["fee"] = self.fees[params[0]]
+            return tx
+        if method == "validateaddress":
+            if params[0] not in SCRIPTS:
+                return {"isvalid": False}
+            return {"isvalid": True, "address": params[0], "scriptPubKey": SCRIPTS[params[0]]}
+        if method == "scantxoutset":
+            scripts = {SCRIPTS[descriptor[len("addr("):-1]] for descriptor in params[1]}
+            unspents = [utxo for utxo in self.utxos if utxo["scriptPubKey"] in scripts]
+            return {"success": True, "height": 4, "unspents": unspents,
+                    "total_amount": sum(utxo["amount"] for utxo in unspents)}
+        if method == "getblockchaininfo":
+            return {"chain": "regtest", "blocks": len(self.hashes) - 1, "bestblockhash": self.hashes[-1]}
+        raise AssertionError(method)
+
+    async def batch(self, calls, return_exceptions: bool = False) -> List[Any]:
+        results = []
+        for method, params in calls:
+            try:
+                results.append(self._call(method, list(params)))
+            except JSONRPCError as ex:
+                if not return_exceptions:
+                    raise
+                results.append(ex)
+        return results
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def method(*params: Any) -> Any:
+            return self._call(name, list(params))
+        return method
+
+@pytest.fixture
+def node(monkeypatch) -> FakeNode:
+    """
+    FakeNode no lugar do bitcoind, com caches vazios e sem block store
+    """
+    node = FakeNode()
+    monkeypatch.setattr(main, "bitcoin", node)
+    monkeypatch.setattr(main, "cache", ChainCache(CacheConfig()))
+    monkeypatch.setattr(main, "block_store", BlockStore(BlockStoreConfig(enabled=False)))
+    return node
+
+@pytest.fixture
+def client(node) -> TestClient:
+    return TestClient(main.app)
+
+def stored_chain(tmp_path, hashes: List[str]) -> BlockStore:
+    store = BlockStore(BlockStoreConfig(path=str(tmp_path / "blockstore")))
+    store.open()
+    blocks = [
+        {"height": height, "hash": block_hash, "previousblockhash": hashes[height - 1] if height else None}
+        for height, block_hash in enumerate(hashes)
+    ]
+
+    def summarize(block: Dict) -> Dict:
+        return {**block_header(), "height": block["height"], "hash": block["hash"], "num_transactions": 0, "transactions": []}
+    asyncio.run(store.extend(blocks, summarize))
+    return store
+
+def test_stored_blocks_are_checked_against_the_active_chain(tmp_path, monkeypatch):
+    original = chain_hashes(6)
+    store = stored_chain(tmp_path, original)
+    cache = ChainCache(CacheConfig())
+    monkeypatch.setattr(main, "block_store", store)
+    monkeypatch.setattr(main, "cache", cache)
+    node = FakeNode(original)
+    monkeypatch.setattr(main, "bitcoin", node)
+
+    # Topo do store igual ao tip: tudo abaixo é canônico, sem consultar o node
+    cache.tip_height, cache.tip_hash = 5, original[5]
+    assert asyncio.run(main.read_stored_block(3))[0]["hash"] == original[3]
+    assert node.calls["getblockhash"] == 0 and cache.hash_at(3) == original[3]
+
+    # Reorg ainda não aplicado no store: os blocos 4 e 5 gravados saíram da chain
+    node.hashes = original[:4] + chain_hashes(7, tag="f")[4:]
+    cache.heights.clear()
+    cache.tip_height, cache.tip_hash = 6, node.hashes[6]
+    assert asyncio.run(main.read_stored_block(4)) is None
+    assert asyncio.run(main.read_stored_block(5)) is None
+    assert asyncio.run(main.read_stored_block(2))[0]["hash"] == original[2]
+    assert node.calls["getblockhash"] == 3
+
+    # Com a altura já no mapa, o hash gravado é conferido sem RPC
+    assert asyncio.run(main.read_stored_block(4)) is None
+    assert node.calls["getblockhash"] == 3
+    store.close()
+
+def test_stream_has_the_same_shape_as_the_plain_response():
+    header, transactions = block_header(), block_transactions()
+
+    async def chunks():
+        yield transactions[:2]
+        yield []
+        yield transactions[2:]
+
+    async def collect() -> bytes:
+        return b"".join([part async for part in main.stream_block(header, 1, 2, chunks())])
+    streamed = json.loads(asyncio.run(collect()))
+    plain = jsonable_encoder({**header, **main._page_fields(header, 1, 2), "transactions": transactions})
+    assert streamed == plain
+    assert isinstance(streamed["transactions"][1]["fee"], float)
+
+def test_transaction_batch_keeps_order_and_reports_missing(client, node):
+    spend, pending, coinbase = "5e" * 32, "3e" * 32, "c0" * 32
+    response = client.post("/transactions/batch", json={"txids": [pending, "00" * 32, spend, pending, coinbase]})
+    assert response.status_code == 200
+    transactions = response.json()["transactions"]
+    assert [tx["txid"] for tx in transactions] == [pending, "00" * 32, spend, coinbase]
+    assert transactions[1]["error"].startswith("Transação não encontrada")
+    assert "error" not in transactions[0] and transactions[0]["in_mempool"]
+    assert transactions[2]["fee"] == 0.0001 and transactions[2]["block"]["height"] == 3
+    assert transactions[3]["fee"] == 0 and transactions[3]["block"]["height"] == 1
+    # Transações do lote servem de anteriores umas às outras: uma busca por txid
+    assert node.calls["getrawtransaction"] == 4
+
+def test_block_batch_keeps_order_and_reports_missing(client, node):
+    response = client.post("/blocks/batch", json={"heights": [3, 9, 0, 3]})
+    assert response.status_code == 200
+    blocks = response.json()["blocks"]
+    assert [block["height"] for block in blocks] == [3, 9, 0]
+    assert blocks[1]["error"].startswith("Bloco não encontrado")
+    assert blocks[0]["hash"] == node.hashes[3] and blocks[0]["num_transactions"] == 1
+    assert blocks[2]["transactions"] == []
+    assert node.calls["getblock"] == 2
+
+    # Na segunda vez os blocos vêm do cache
+    assert client.post("/blocks/batch", json={"heights": [0, 3]}).json()["blocks"] == [blocks[2], blocks[0]]
+    assert node.calls["getblock"] == 2
+
+def test_balance_batch_splits_the_scan_by_script(client, node):
+    response = client.post("/balance/batch", json={"addresses": ["carol", "nobody", "alice", "bob"]})
+    assert response.status_code == 200
+    balances = response.json()["balances"]
+    assert [balance["address"] for balance in balances] == ["carol", "nobody", "alice", "bob"]
+    assert balances[1] == {"address": "nobody", "error": "Endereço inválido"}
+    assert (balances[0]["balance"], balances[0]["unspent_count"]) == (29.99, 1)
+    assert (balances[2]["balance"], balances[2]["unspent_count"]) == (20.4999, 2)
+    assert [utxo["confirmations"] for utxo in balances[2]["unspent_outputs"]] == [2, 3]
+    assert (balances[3]["balance"], balances[3]["unspent_outputs"]) == (0, [])
+    # Um único scantxoutset com um descritor por endereço válido
+    assert node.calls["scantxoutset"] == 1
+
+@pytest.mark.parametrize("path, name, limit", [
+    ("/transactions/batch", "txids", main.MAX_BATCH_TRANSACTIONS),
+    ("/blocks/batch", "heights", main.MAX_BATCH_BLOCKS),
+    ("/balance/batch", "addresses", main.MAX_BATCH_ADDRESSES)
+])
+def test_batch_size_limits(client, node, path, name, limit):
+    item = (lambda n: n) if name == "heights" else (lambda n: f"{n:064x}")
+    assert client.post(path, json={name: []}).status_code == 400
+    assert client.post(path, json={name: [item(n) for n in range(limit + 1)]}).status_code == 400
+    assert not node.calls
+    # Repetições não contam para o limite
+    assert client.post(path, json={name: [item(0)] * (limit + 1)}).status_code == 200
+
+def test_projections_skip_prevouts(client, node):
+    spend = "5e" * 32
+    summary = client.get(f"/transactions/{spend}", params={"view": "summary"}).json()
+    assert list(summary) == ["txid", "size", "vsize", "weight", "fee", "confirmations", "time", "in_mempool", "block"]
+    assert summary["fee"] == 0.0001 and summary["block"]["height"] == 3
+    # Só a própria transação (verbosity 2, com a taxa) e o cabeçalho do bloco
+    assert node.calls == Counter({"getrawtransaction": 1, "getblockheader": 1})
+
+    node.calls.clear()
+    projected = client.get(f"/transactions/{spend}", params={"fields": "fee,outputs"}).json()
+    assert list(projected) == ["txid", "fee", "outputs"]
+    assert node.calls == Counter({"getrawtransaction": 1})
+
+    # A resposta completa busca também a transação anterior (o cabeçalho já está no cache)
+    node.calls.clear()
+    full = client.get(f"/transactions/{spend}").json()
+    assert full["inputs"][0]["addresses"] == ["alice"]
+    assert (projected["fee"], projected["outputs"]) == (full["fee"], full["outputs"])
+    assert node.calls == Counter({"getrawtransaction": 2})
+
+def test_projections_of_a_batch(client, node):
+    txids = ["5e" * 32, "3e" * 32]
+    response = client.post("/transactions/batch", json={"txids": txids, "fields": ["fee", "in_mempool"]})
+    assert response.json()["transactions"] == [
+        {"txid": txids[0], "fee": 0.0001, "in_mempool": False},
+        {"txid": txids[1], "fee": 0.01, "in_mempool": True}
+    ]
+    assert node.calls == Counter({"getrawtransaction": 2})
+    assert "getmempoolentry" not in node.calls
+
+def test_unknown_fields_are_rejected(client, node):
+    response = client.get(f"/transactions/{'5e' * 32}", params={"fields": "fee,color"})
+    assert response.status_code == 400 and "color" in response.json()["detail"]
+    response = client.post("/transactions/batch", json={"txids": ["5e" * 32], "fields": ["weight", "nonce"]})
+    assert response.status_code == 400 and "nonce" in response.json()["detail"]
+    assert not node.calls
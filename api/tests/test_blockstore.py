@@ -0,0 +1,155 @@
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from bitcoin.rpc import JSONRPCError
+from app.blockstore import BLOCK_RECORD, TX_RECORD, BlockStore, BlockStoreConfig, decode_tx, encode_block
+from app.rawblock import node_difficulty
+import asyncio
+import hashlib
+import pytest
+
+def fake_hash(*parts: Any) -> str:
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+def make_summary(height: int, tag: str = "", num_tx: int = 3) -> Dict[str, Any]:
+    return {
+        "height": height,
+        "hash": fake_hash("block", height, tag),
+        "time": 1_700_000_000 + height * 600,
+        "nonce": 2_083_236_893 + height,
+        "difficulty": node_difficulty(1.0 + height / 3),
+        "num_transactions": num_tx,
+        "size": 1000 + height,
+        "weight": 4000 + height,
+        "merkle_root": fake_hash("merkle", height, tag),
+        "transactions": [
+            {
+                "txid": fake_hash("tx", height, tag, n),
+                "size": 200 + n,
+                "vsize": 150 + n,
+                "fee": "0" if n == 0 else (None if n == 2 else Decimal("0.00012345")),
+                "input_count": n + 1,
+                "output_count": 2,
+                "total_output": Decimal("50.00000000") if n == 0 else Decimal("1.23456789")
+            }
+            for n in range(num_tx)
+        ]
+    }
+
+class FakeChain:
+    """
+    Node mínimo para o block store: getblockcount e getblockhash sobre uma
+    lista de resumos, que `fetch` devolve com o hash anterior
+    """
+    def __init__(self, length: int):
+        self.blocks: List[Dict[str, Any]] = [make_summary(height) for height in range(length)]
+        self.fetched = 0
+
+    def _call(self, method: str, params: List[Any]) -> Any:
+        if method == "getblockcount":
+            return len(self.blocks) - 1
+        if method == "getblockhash":
+            if not 0 <= params[0] < len(self.blocks):
+                raise JSONRPCError({"code": -8, "message": "Block height out of range"})
+            return self.blocks[params[0]]["hash"]
+        raise AssertionError(method)
+
+    async def batch(self, calls, return_exceptions: bool = False) -> List[Any]:
+        results = []
+        for method, params in calls:
+            try:
+                results.append(self._call(method, list(params)))
+            except JSONRPCError as ex:
+                if not return_exceptions:
+                    raise
+                results.append(ex)
+        return results
+
+    def previous_hash(self, height: int) -> Optional[str]:
+        return self.blocks[height - 1]["hash"] if height else None
+
+    async def fetch(self, rpc, blocks) -> List[Any]:
+        self.fetched += len(blocks)
+        return [(self.blocks[height], self.previous_hash(height)) for _, height in blocks]
+
+async def sync(store: BlockStore, chain: FakeChain):
+    while await store.sync_step(chain, chain.fetch):
+        pass
+
+@pytest.fixture
+def store(tmp_path):
+    store = BlockStore(BlockStoreConfig(path=str(tmp_path / "blockstore")))
+    store.open()
+    yield store
+    store.close()
+
+def test_encode_decode_round_trip():
+    summary = make_summary(7)
+    previous = fake_hash("block", 6, "")
+    record, txs = encode_block(summary, previous, 4096)
+    assert len(record) == BLOCK_RECORD.size
+    assert len(txs) == TX_RECORD.size * 3
+
+    (data_offset, block_hash, previous_hash, merkle_root, block_time, nonce,
+     difficulty, num_tx, size, weight) = BLOCK_RECORD.unpack(record)
+    assert data_offset == 4096
+    assert (block_hash.hex(), previous_hash.hex(), merkle_root.hex()) == (summary["hash"], previous, summary["merkle_root"])
+    assert (block_time, nonce, num_tx, size, weight) == (summary["time"], summary["nonce"], 3, summary["size"], summary["weight"])
+    assert node_difficulty(difficulty) == summary["difficulty"]
+
+    decoded = [decode_tx(txs, position * TX_RECORD.size, position) for position in range(3)]
+    assert decoded == summary["transactions"]
+    # Sem hash anterior (gênese) o registro guarda zeros
+    assert BLOCK_RECORD.unpack(encode_block(summary, None, 0)[0])[2] == bytes(32)
+
+def test_sync_and_read(store):
+    chain = FakeChain(25)
+    asyncio.run(sync(store, chain))
+    assert store.status()["height"] == 24 and store.synced
+    assert chain.fetched == 25
+
+    header, transactions = asyncio.run(store.read(10))
+    expected = make_summary(10)
+    assert header == {key: value for key, value in expected.items() if key != "transactions"}
+    assert transactions == expected["transactions"]
+    assert asyncio.run(store.read(10, 1, 2))[1] == expected["transactions"][1:2]
+    assert asyncio.run(store.read(25)) is None
+
+def test_extend_appends_only_chained_blocks(store):
+    chain = FakeChain(5)
+    asyncio.run(sync(store, chain))
+    tip_hash = chain.blocks[4]["hash"]
+    verbose = [
+        {"height": 5, "hash": "05" * 32, "previousblockhash": tip_hash},
+        {"height": 6, "hash": "06" * 32, "previousblockhash": "ff" * 32}
+    ]
+    appended = asyncio.run(store.extend(verbose, lambda block: make_summary(block["height"]) | {"hash": block["hash"]}))
+    assert appended == 1
+    assert (store.status()["height"], store.tip_hash) == (5, "05" * 32)
+
+def test_reorg_truncates_only_the_tip(store):
+    chain = FakeChain(6)
+    asyncio.run(sync(store, chain))
+    before = store.status()
+    data_end = store.data_end
+
+    # O bloco 5 é substituído: só o registro do topo sai
+    chain.blocks[5] = make_summary(5, tag="reorg")
+    assert asyncio.run(store.sync_step(chain, chain.fetch))
+    after = store.status()
+    assert after["height"] == 4
+    assert after["generation"] == before["generation"] + 1
+    assert asyncio.run(store.read(5)) is None
+    assert asyncio.run(store.read(4))[0]["hash"] == chain.blocks[4]["hash"]
+    assert store.tip_hash == chain.blocks[4]["hash"]
+    assert store.data_end == data_end - 3 * TX_RECORD.size
+
+    # Sincronizar de novo grava o bloco substituto na mesma altura
+    asyncio.run(sync(store, chain))
+    assert asyncio.run(store.read(5))[0]["hash"] == chain.blocks[5]["hash"]
+    assert store.status()["height"] == 5
+
+def test_stale_truncate_is_ignored(store):
+    chain = FakeChain(3)
+    asyncio.run(sync(store, chain))
+    store._truncate("00" * 32)
+    assert store.status()["height"] == 2
@@ -0,0 +1,98 @@
+from decimal import Decimal
+from typing import Any, Dict, List
+from fastapi import FastAPI, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from bitcoin.rpc import JSONRPCError
+from app.amounts import sat_to_btc
+from app.main import EncodedRoute
+from app.cache import CacheConfig, ChainCache, ResponseCache
+import asyncio
+import json
+
+def test_plain_and_cached_responses_encode_amounts_alike():
+    value = {"fee": sat_to_btc(12345), "total_fee": sat_to_btc(100_000_000), "count": 3}
+    app = FastAPI()
+    app.router.route_class = EncodedRoute
+    responses = ResponseCache(1024 * 1024, 10)
+
+    async def compute():
+        return value
+
+    @app.get("/plain")
+    async def plain() -> Dict[str, Any]:
+        return value
+
+    @app.get("/cached")
+    async def cached() -> Response:
+        body, _ = await responses.get("key", 1, compute)
+        return Response(body, media_type="application/json")
+    client = TestClient(app)
+    assert client.get("/plain").json() == client.get("/cached").json() == {"fee": 0.00012345, "total_fee": 1.0, "count": 3}
+
+class FakeNode:
+    """
+    Node mínimo para o mapa de alturas: getblockchaininfo e getblockhash
+    sobre uma lista de hashes que o teste troca para simular um reorg
+    """
+    def __init__(self, hashes: List[str]):
+        self.hashes = hashes
+
+    async def getblockchaininfo(self) -> dict:
+        return {"blocks": len(self.hashes) - 1, "bestblockhash": self.hashes[-1], "chain": "regtest"}
+
+    async def getblockhash(self, height: int) -> str:
+        if not 0 <= height < len(self.hashes):
+            raise JSONRPCError({"code": -8, "message": "Block height out of range"})
+        return self.hashes[height]
+
+    async def batch(self, calls, return_exceptions: bool = False) -> List[Any]:
+        results = []
+        for _, params in calls:
+            try:
+                results.append(await self.getblockhash(*params))
+            except JSONRPCError as ex:
+                if not return_exceptions:
+                    raise
+                results.append(ex)
+        return results
+
+def chain_hashes(length: int, tag: str = "") -> List[str]:
+    return [f"{tag}{height:x}".rjust(64, "0") for height in range(length)]
+
+def test_cached_body_matches_fastapi_encoding():
+    value = {"fee": sat_to_btc(12345), "total_fee": sat_to_btc(100_000_000), "count": 3, "rate": Decimal("1.5")}
+
+    async def compute():
+        return value
+    body, etag = asyncio.run(ResponseCache(1024 * 1024, 10).get("key", 1, compute))
+    decoded = json.loads(body)
+    assert decoded == jsonable_encoder(value)
+    assert decoded["fee"] == 0.00012345 and isinstance(decoded["total_fee"], float)
+    assert etag.startswith('"')
+
+def test_reorg_drops_heights_and_blocks_of_the_old_tip():
+    original = chain_hashes(6)
+    node = FakeNode(original)
+    cache = ChainCache(CacheConfig())
+    assert asyncio.run(cache.sync_tip(node))
+    for height in range(2, 6):
+        cache.remember_height(height, original[height])
+        cache.blocks.put(original[height], {"height": height, "hash": original[height]})
+        cache.headers.put(original[height], {"height": height})
+    assert not asyncio.run(cache.sync_tip(node))
+
+    # Tip concorrente mais longo que compartilha os blocos até a altura 3
+    node.hashes = original[:4] + chain_hashes(7, tag="f")[4:]
+    assert asyncio.run(cache.sync_tip(node))
+    assert (cache.tip_height, cache.tip_hash, cache.reorgs) == (6, node.hashes[6], 1)
+    assert [cache.hash_at(height) for height in range(2, 7)] == [original[2], original[3], None, None, node.hashes[6]]
+    assert original[3] in cache.blocks and original[3] in cache.headers
+    for stale in original[4:]:
+        assert stale not in cache.blocks and stale not in cache.headers
+
+    # Reorg para um tip mais curto: as alturas acima dele saem do mapa
+    node.hashes = original[:3] + chain_hashes(4, tag="e")[3:]
+    assert asyncio.run(cache.sync_tip(node))
+    assert cache.hash_at(6) is None and 6 not in cache.heights
+    assert cache.hash_at(2) == original[2] and original[3] not in cache.blocks
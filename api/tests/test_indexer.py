@@ -0,0 +1,168 @@
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from bitcoin.rpc import JSONRPCError
+from app.indexer import AddressIndex, IndexerConfig, tx_key
+import asyncio
+import hashlib
+import pytest
+
+def fake_hash(*parts: Any) -> str:
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+def coinbase(height: int, address: str, value: str = "50", txid: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "txid": txid or fake_hash("coinbase", height, address),
+        "vin": [{"coinbase": f"{height:02x}"}],
+        "vout": [{"n": 0, "value": Decimal(value), "scriptPubKey": {"address": address}}]
+    }
+
+def spend(txid: str, vout: int, outputs: List[tuple], tag: str = "") -> Dict[str, Any]:
+    return {
+        "txid": fake_hash("spend", txid, vout, tag),
+        "vin": [{"txid": txid, "vout": vout}],
+        "vout": [
+            {"n": n, "value": Decimal(value), "scriptPubKey": {"address": address}}
+            for n, (address, value) in enumerate(outputs)
+        ]
+    }
+
+class FakeChain:
+    """
+    Node mínimo para o índice: getblockcount, getblockhash e getblock 2
+    sobre uma lista de blocos, contando as requisições em lote
+    """
+    def __init__(self):
+        self.blocks: List[Dict[str, Any]] = []
+        self.requests = 0
+
+    def add(self, txs: List[Dict[str, Any]], tag: str = "") -> Dict[str, Any]:
+        height = len(self.blocks)
+        block = {
+            "hash": fake_hash("block", height, tag, [tx["txid"] for tx in txs]),
+            "height": height,
+            "time": 1_700_000_000 + height * 600,
+            "tx": txs
+        }
+        if height:
+            block["previousblockhash"] = self.blocks[-1]["hash"]
+        self.blocks.append(block)
+        return block
+
+    def _call(self, method: str, params: List[Any]) -> Any:
+        if method == "getblockchaininfo":
+            return {"chain": "regtest"}
+        if method == "getblockcount":
+            return len(self.blocks) - 1
+        if method == "getblockhash":
+            if not 0 <= params[0] < len(self.blocks):
+                raise JSONRPCError({"code": -8, "message": "Block height out of range"})
+            return self.blocks[params[0]]["hash"]
+        if method == "getblock":
+            for block in self.blocks:
+                if block["hash"] == params[0]:
+                    return block
+            raise JSONRPCError({"code": -5, "message": "Block not found"})
+        raise AssertionError(method)
+
+    async def batch(self, calls, return_exceptions: bool = False) -> List[Any]:
+        self.requests += 1
+        results = []
+        for method, params in calls:
+            try:
+                results.append(self._call(method, list(params)))
+            except JSONRPCError as ex:
+                if not return_exceptions:
+                    raise
+                results.append(ex)
+        return results
+
+    async def getblockchaininfo(self):
+        return self._call("getblockchaininfo", [])
+
+async def sync(index: AddressIndex, rpc: FakeChain):
+    while await index.sync_step(rpc):
+        pass
+
+@pytest.fixture
+def index(tmp_path):
+    index = AddressIndex(IndexerConfig(path=str(tmp_path / "index.sqlite")))
+    index.open()
+    yield index
+    index.close()
+
+def balance(index: AddressIndex, address: str) -> int:
+    return sum(value for _, _, value, _ in index._address_summary(address)["unspent"])
+
+def test_tx_key_is_signed_64_bit():
+    assert tx_key("00" * 32) == 0
+    assert tx_key("7f" + "ff" * 31) == 2 ** 63 - 1
+    assert tx_key("80" + "00" * 31) == -2 ** 63
+    assert tx_key("ff" * 32) == -1
+    # Só os 8 primeiros bytes entram na chave
+    assert tx_key("ab" * 8 + "00" * 24) == tx_key("ab" * 8 + "ff" * 24)
+
+def test_apply_undo_and_reapply(index):
+    chain = FakeChain()
+    genesis = chain.add([coinbase(0, "alice")])
+    funding = genesis["tx"][0]["txid"]
+    chain.add([coinbase(1, "miner")])
+    payment = spend(funding, 0, [("bob", "30"), ("alice", "19.9")])
+    chain.add([coinbase(2, "miner"), payment])
+
+    asyncio.run(sync(index, chain))
+    assert (index.height, index.tip_hash, index.synced) == (2, chain.blocks[2]["hash"], True)
+    assert balance(index, "alice") == 1_990_000_000
+    assert balance(index, "bob") == 3_000_000_000
+    assert set(asyncio.run(index.locate([funding, payment["txid"]]))) == {funding, payment["txid"]}
+
+    # Reorg: o bloco 2 é trocado por outro que gasta a mesma saída de outra forma
+    chain.blocks.pop()
+    replacement = spend(funding, 0, [("carol", "49.9")], tag="reorg")
+    chain.add([coinbase(2, "other"), replacement], tag="reorg")
+    chain.add([coinbase(3, "miner")])
+    asyncio.run(sync(index, chain))
+
+    assert (index.height, index.tip_hash) == (3, chain.blocks[3]["hash"])
+    assert balance(index, "bob") == 0
+    assert balance(index, "alice") == 0
+    assert balance(index, "carol") == 4_990_000_000
+    spent = index._read("SELECT spent_txid, spent_height FROM outputs WHERE txid = ?", (funding,))
+    assert spent == [(replacement["txid"], 2)]
+    located = asyncio.run(index.locate([payment["txid"], replacement["txid"]]))
+    assert list(located) == [replacement["txid"]]
+    assert located[replacement["txid"]]["hash"] == chain.blocks[2]["hash"]
+
+def test_undo_restores_spent_outputs(index):
+    chain = FakeChain()
+    funding = chain.add([coinbase(0, "alice")])["tx"][0]["txid"]
+    chain.add([coinbase(1, "miner"), spend(funding, 0, [("bob", "50")])])
+    asyncio.run(sync(index, chain))
+    assert balance(index, "alice") == 0
+
+    index._undo_tip()
+    assert (index.height, index.tip_hash) == (0, chain.blocks[0]["hash"])
+    assert balance(index, "alice") == 5_000_000_000
+    assert balance(index, "bob") == 0
+    assert index._read("SELECT COUNT(*) FROM tx_locations WHERE height = 1", ()) == [(0,)]
+
+    # Reaplicar o mesmo bloco volta ao estado anterior
+    asyncio.run(sync(index, chain))
+    assert balance(index, "alice") == 0
+    assert balance(index, "bob") == 5_000_000_000
+
+def test_locator_accepts_negative_keys(index):
+    chain = FakeChain()
+    high = "f" * 64
+    chain.add([coinbase(0, "alice", txid=high)])
+    asyncio.run(sync(index, chain))
+    assert tx_key(high) < 0
+    assert asyncio.run(index.locate([high]))[high]["height"] == 0
+
+def test_initial_sync_fetches_blocks_in_batches(index):
+    chain = FakeChain()
+    for height in range(250):
+        chain.add([coinbase(height, "miner")])
+    asyncio.run(sync(index, chain))
+    assert index.height == 249 and index.synced
+    # Dois lotes (hashes e blocos) por janela de até batch_size blocos
+    assert chain.requests <= 12
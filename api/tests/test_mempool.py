@@ -0,0 +1,174 @@
+from decimal import Decimal
+from typing import Any, Dict, List
+from bitcoin.rpc import JSONRPCError
+from app.mempool import SORT_KEYS, MempoolConfig, MempoolEntry, MempoolMirror, decode_cursor, encode_cursor
+from app.shared import SharedCache, SharedCacheConfig
+import asyncio
+import pytest
+
+def entry_info(fee_sats: int, vsize: int, time: int) -> Dict[str, Any]:
+    return {"vsize": vsize, "weight": vsize * 4, "fees": {"base": Decimal(fee_sats) / 100_000_000}, "time": time}
+
+class FakeMempool:
+    """
+    Node mínimo para o espelho: getrawmempool, getmempoolinfo e getmempoolentry
+    """
+    def __init__(self, entries: Dict[str, Dict[str, Any]]):
+        self.entries = dict(entries)
+
+    def _call(self, method: str, params: List[Any]) -> Any:
+        if method == "getrawmempool":
+            return dict(self.entries) if params and params[0] else list(self.entries)
+        if method == "getmempoolinfo":
+            return {"size": len(self.entries), "bytes": sum(e["vsize"] for e in self.entries.values()), "usage": 0}
+        if method == "getmempoolentry":
+            if params[0] not in self.entries:
+                raise JSONRPCError({"code": -5, "message": "Transaction not in mempool"})
+            return self.entries[params[0]]
+        raise AssertionError(method)
+
+    async def batch(self, calls, return_exceptions: bool = False) -> List[Any]:
+        results = []
+        for method, params in calls:
+            try:
+                results.append(self._call(method, list(params)))
+            except JSONRPCError as ex:
+                if not return_exceptions:
+                    raise
+                results.append(ex)
+        return results
+
+def txid(n: int) -> str:
+    return f"{n:064x}"
+
+def all_pages(mirror: MempoolMirror, sort: str, limit: int) -> List[str]:
+    seen, cursor = [], None
+    while True:
+        entries, cursor = mirror.page(sort, limit, cursor)
+        seen.extend(entry.txid for entry in entries)
+        if cursor is None:
+            return seen
+
+@pytest.fixture
+def node():
+    # Taxas repetidas de propósito: o desempate é pelo txid
+    return FakeMempool({txid(n): entry_info(1000 * (n % 7 + 1), 200 + n % 3, 1_700_000_000 + n) for n in range(50)})
+
+def test_cursor_round_trip():
+    for key in [(-5000, txid(1)), (0, txid(2)), (-1_700_000_123, "ab" * 32)]:
+        assert decode_cursor(encode_cursor(key)) == key
+
+def test_cursor_rejects_garbage():
+    with pytest.raises((ValueError, TypeError)):
+        decode_cursor("not-a-cursor")
+
+def test_pages_cover_every_entry_once(node):
+    mirror = MempoolMirror(MempoolConfig())
+    asyncio.run(mirror.refresh(node))
+    for sort in SORT_KEYS:
+        listed = all_pages(mirror, sort, 7)
+        assert sorted(listed) == sorted(node.entries)
+        assert listed == [key[1] for key in sorted(SORT_KEYS[sort](mirror.entries[t]) for t in listed)]
+
+def test_cursor_is_stable_across_refresh(node):
+    mirror = MempoolMirror(MempoolConfig())
+    asyncio.run(mirror.refresh(node))
+    first, cursor = mirror.page("feerate", 10, None)
+    last_key = SORT_KEYS["feerate"](first[-1])
+
+    # Entre as páginas: sai a própria transação do cursor e outras de antes e
+    # depois dele; entram transações com taxas acima e abaixo do cursor
+    removed = [first[-1].txid, first[0].txid, all_pages(mirror, "feerate", 100)[30]]
+    for removed_txid in removed:
+        del node.entries[removed_txid]
+    node.entries[txid(100)] = entry_info(100_000, 200, 1_700_001_000)
+    node.entries[txid(101)] = entry_info(1, 200, 1_700_001_001)
+    added, dropped = asyncio.run(mirror.refresh(node))
+    assert sorted(added) == [txid(100), txid(101)] and sorted(dropped) == sorted(removed)
+
+    rest, _ = mirror.page("feerate", 1000, cursor)
+    expected = sorted(
+        (SORT_KEYS["feerate"](entry), entry.txid) for entry in mirror.entries.values()
+        if SORT_KEYS["feerate"](entry) > last_key
+    )
+    assert [entry.txid for entry in rest] == [t for _, t in expected]
+    assert txid(101) in {entry.txid for entry in rest}
+    assert txid(100) not in {entry.txid for entry in rest}
+    assert not set(removed) & {entry.txid for entry in rest}
+
+def test_remove_drops_the_exact_key_from_every_index(node):
+    mirror = MempoolMirror(MempoolConfig())
+    asyncio.run(mirror.refresh(node))
+    # txid(0) e txid(21) têm a mesma taxa: só a removida sai do índice
+    assert mirror.entries[txid(0)].feerate == mirror.entries[txid(21)].feerate
+    mirror._remove(txid(0))
+    for name, index in mirror._indexes.items():
+        assert len(index) == len(mirror.entries) == 49
+        assert txid(0) not in {t for _, t in index}
+        assert txid(21) in {t for _, t in index}
+        assert index == sorted(index)
+    assert mirror.total_vsize == sum(entry.vsize for entry in mirror.entries.values())
+    assert mirror.total_fee == sum(entry.fee for entry in mirror.entries.values())
+
+    # Remover de novo (ou um txid desconhecido) não altera nada
+    mirror._remove(txid(0))
+    mirror._remove(txid(999))
+    assert all(len(index) == 49 for index in mirror._indexes.values())
+
+def test_readded_entry_replaces_the_old_keys(node):
+    mirror = MempoolMirror(MempoolConfig())
+    asyncio.run(mirror.refresh(node))
+    mirror._add(MempoolEntry.from_rpc(txid(3), entry_info(999_000, 300, 1_800_000_000)))
+    for index in mirror._indexes.values():
+        assert [t for _, t in index].count(txid(3)) == 1
+    assert all_pages(mirror, "feerate", 5)[0] == txid(3)
+
+@pytest.fixture
+def shared(tmp_path):
+    shared = SharedCache(SharedCacheConfig(enabled=True, path=str(tmp_path / "shared.sqlite")))
+    shared.open()
+    yield shared
+    shared.close()
+
+def assert_same(follower: MempoolMirror, leader: MempoolMirror):
+    assert follower.entries == leader.entries
+    assert follower._indexes == leader._indexes
+    assert follower.info == leader.info
+    assert (follower.total_fee, follower.total_vsize) == (leader.total_fee, leader.total_vsize)
+
+def test_follower_applies_published_diffs(node, shared):
+    async def scenario():
+        leader = MempoolMirror(MempoolConfig(snapshot_every=3), shared)
+        follower = MempoolMirror(MempoolConfig(), shared)
+        assert await follower.pull() is None
+        await leader.publish(*await leader.refresh(node))
+        added, removed = await follower.pull()
+        assert sorted(added) == sorted(node.entries) and removed == []
+        assert_same(follower, leader)
+        assert await follower.pull() is None
+
+        # Um diff por consulta; o seguidor que perde vários (inclusive um
+        # snapshot, que descarta os diffs anteriores) recomeça do snapshot
+        for round in range(7):
+            del node.entries[sorted(node.entries)[round]]
+            node.entries[txid(200 + round)] = entry_info(5000 + round, 250, 1_700_002_000 + round)
+            await leader.publish(*await leader.refresh(node))
+            if round in (0, 1, 6):
+                version = follower.version
+                added, removed = await follower.pull()
+                assert txid(200 + round) in added and len(removed) >= 1
+                assert follower.version > version
+                assert_same(follower, leader)
+
+        # Consulta sem mudanças não publica nada
+        await leader.publish(*await leader.refresh(node))
+        assert await follower.pull() is None
+
+        # Outro líder (época nova): o seguidor recarrega o snapshot dele
+        del node.entries[txid(200)]
+        successor = MempoolMirror(MempoolConfig(), shared)
+        await successor.publish(*await successor.refresh(node))
+        added, removed = await follower.pull()
+        assert removed == [txid(200)] and added == []
+        assert_same(follower, successor)
+    asyncio.run(scenario())
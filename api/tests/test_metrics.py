@@ -0,0 +1,69 @@
+from app.metrics import Registry, _Metric, rpc_calls, rpc_seconds
+from app.rpc import BitcoinConfig, BitcoinRPC
+import asyncio
+import httpx
+import json
+import pytest
+
+def test_counter_and_gauge_exposition():
+    registry = Registry()
+    requests = registry.counter("http_requests_total", "Requisições HTTP", ["route", "status"])
+    in_flight = registry.gauge("in_flight", "Em andamento")
+    requests.inc(route="/blocks", status="200")
+    requests.inc(2, route="/blocks", status="200")
+    requests.inc(route='/a"b\\c\nd', status="404")
+    in_flight.inc()
+    in_flight.dec(0.5)
+    assert registry.render() == "\n".join([
+        "# HELP http_requests_total Requisições HTTP",
+        "# TYPE http_requests_total counter",
+        'http_requests_total{route="/blocks",status="200"} 3',
+        'http_requests_total{route="/a\\"b\\\\c\\nd",status="404"} 1',
+        "# HELP in_flight Em andamento",
+        "# TYPE in_flight gauge",
+        "in_flight 0.5"
+    ]) + "\n"
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latência", ["method"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, method="getblock")
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{method="getblock",le="0.1"} 2',
+        'latency_seconds_bucket{method="getblock",le="1.0"} 3',
+        'latency_seconds_bucket{method="getblock",le="+Inf"} 4',
+        'latency_seconds_sum{method="getblock"} 3.65',
+        'latency_seconds_count{method="getblock"} 4'
+    ]
+
+def test_collectors_are_read_at_scrape_time():
+    registry = Registry()
+    entries = {"blocks": 1}
+    registry.collector(lambda: [("cache_entries", "gauge", "Entradas", [({"cache": name}, value) for name, value in entries.items()])])
+    entries["blocks"] = 7
+    assert registry.render().splitlines() == [
+        "# HELP cache_entries Entradas", "# TYPE cache_entries gauge", 'cache_entries{cache="blocks"} 7'
+    ]
+
+def test_metric_requires_samples():
+    with pytest.raises(TypeError):
+        _Metric("abstract", "Sem amostras")
+
+def test_batches_use_a_fixed_method_label():
+    def respond(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        return httpx.Response(200, json=[{"id": call["id"], "result": 1, "error": None} for call in payload])
+
+    async def scenario():
+        rpc = BitcoinRPC(BitcoinConfig("localhost", "18443", "user", "pass"))
+        rpc._client = httpx.AsyncClient(base_url=rpc.config.base_url, transport=httpx.MockTransport(respond))
+        await rpc.batch([("getblockhash", [1]), ("getblockheader", ["ab"]), ("getblockhash", [2])])
+        await rpc.batch([("getrawtransaction", ["cd", 2])])
+        await rpc.close()
+    before = {line for line in rpc_seconds.samples() if "_count" in line}
+    asyncio.run(scenario())
+    counts = [line for line in rpc_seconds.samples() if "_count" in line and line not in before]
+    assert [line.split(" ")[0] for line in counts] == ['bitcoin_rpc_request_seconds_count{method="batch"}']
+    # As chamadas continuam contadas por método
+    assert 'bitcoin_rpc_calls_total{method="getblockheader"}' in "\n".join(rpc_calls.samples())
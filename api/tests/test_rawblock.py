@@ -0,0 +1,94 @@
+from decimal import Decimal
+from app.rawblock import bits_to_difficulty, node_difficulty, parse_block
+from bitcoin.core import CBlock, b2lx
+import json
+import pytest
+
+# Bloco gênese da mainnet (sem witness)
+GENESIS_HEX = (
+    "0100000000000000000000000000000000000000000000000000000000000000000000003ba3edfd7a7b12b27ac72c3e6776"
+    "8f617fc81bc3888a51323a9fb8aa4b1e5e4a29ab5f49ffff001d1dac2b7c0101000000010000000000000000000000000000"
+    "000000000000000000000000000000000000ffffffff4d04ffff001d0104455468652054696d65732030332f4a616e2f3230"
+    "3039204368616e63656c6c6f72206f6e206272696e6b206f66207365636f6e64206261696c6f757420666f722062616e6b73"
+    "ffffffff0100f2052a01000000434104678afdb0fe5548271967f1a67130b7105cd6a828e03909a67962e0ea1f61deb649f6"
+    "bc3f4cef38c4f35504e51ec112de5c384df7ba0b8d578a4c702b6bf11d5fac00000000"
+)
+
+# Bloco com coinbase segwit (commitment de witness), uma transação legada e
+# uma segwit de dois inputs, montado com o python-bitcoinlib
+SEGWIT_HEX = (
+    "0000002000000000000000000000000000000000000000eeffc001000000000000000000ece9832bb688fc38b439fdafa6d0"
+    "87ad0fda7ef356b64016a5a29ceb87d1a9cd00f153651942031740e201000301000000000101000000000000000000000000"
+    "0000000000000000000000000000000000000000ffffffff0f03400d037365677769742d74657374ffffffff0279ee402500"
+    "00000016001411111111111111111111111111111111111111110000000000000000266a24aa21a9ed222222222222222222"
+    "2222222222222222222222222222222222222222222222012000000000000000000000000000000000000000000000000000"
+    "0000000000000000000000020000000133333333333333333333333333333333333333333333333333333333333333330100"
+    "00006a4730303030303030303030303030303030303030303030303030303030303030303030303030303030303030303030"
+    "3030303030303030303030303030303030303030303030303021020202020202020202020202020202020202020202020202"
+    "020202020202020202feffffff02a086010000000000160014444444444444444444444444444444444444444490d0030000"
+    "0000002200205555555555555555555555555555555555555555555555555555555555555555000000000200000000010266"
+    "666666666666666666666666666666666666666666666666666666666666660000000000fdffffff77777777777777777777"
+    "777777777777777777777777777777777777777777770300000000fdffffff01404b4c000000000016001488888888888888"
+    "8888888888888888888888888802483030303030303030303030303030303030303030303030303030303030303030303030"
+    "3030303030303030303030303030303030303030303030303030303030303030303030303021030303030303030303030303"
+    "0303030303030303030303030303030303030303030300473030303030303030303030303030303030303030303030303030"
+    "3030303030303030303030303030303030303030303030303030303030303030303030303030303030303030302851515151"
+    "51515151515151515151515151515151515151515151515151515151515151515151515140d10c00"
+)
+
+def test_parse_genesis_block():
+    block = parse_block(bytes.fromhex(GENESIS_HEX))
+    assert block.hash == "000000000019d6689c085ae165831e934ff763ae46a2a6c172b3f1b60a8ce26f"
+    assert block.previous_hash == "00" * 32
+    assert block.merkle_root == "4a5e1e4baab89f3a32518a88c31bc87f618f76673e2cc77ab2127b7afdeda33b"
+    assert (block.time, block.bits, block.nonce) == (1231006505, 0x1D00FFFF, 2083236893)
+    assert (block.size, block.weight) == (285, 1140)
+    assert block.difficulty == 1.0
+    tx, = block.transactions
+    assert tx.txid == block.merkle_root
+    assert (tx.size, tx.vsize, tx.weight) == (204, 204, 816)
+    assert (tx.input_count, tx.output_count, tx.total_output, tx.is_coinbase) == (1, 1, 5_000_000_000, True)
+
+def test_parse_segwit_block():
+    block = parse_block(bytes.fromhex(SEGWIT_HEX))
+    assert block.hash == "82b6092c18441e128aa4ebeb885c18b1f02352d49c15586c4e41ad643a2799f6"
+    assert block.merkle_root == "cda9d187eb9ca2a51640b656f37eda0fad87d0a6affd39b438fc88b62b83e9ec"
+    assert (block.size, block.weight) == (840, 2577)
+    summaries = [
+        (tx.txid, tx.size, tx.vsize, tx.weight, tx.input_count, tx.output_count, tx.total_output, tx.is_coinbase)
+        for tx in block.transactions
+    ]
+    assert summaries == [
+        ("ca267b04dcba645883c8f5a6848b03bc53a72b12887ed207b123cac29b8647a2", 180, 153, 612, 1, 2, 625_012_345, True),
+        ("abe23957ed7aa1d1f58cec5e0f6bfafd33361d43e0de526167bd866f433a85ed", 231, 231, 924, 1, 2, 350_000, False),
+        ("786fb0db2c32ff883baf0c2f772790dbb92e9ee20b86140483af125a01e8b94c", 348, 180, 717, 2, 1, 5_000_000, False),
+    ]
+
+@pytest.mark.parametrize("raw_hex", [GENESIS_HEX, SEGWIT_HEX])
+def test_parse_block_matches_bitcoinlib(raw_hex):
+    raw = bytes.fromhex(raw_hex)
+    block, reference = parse_block(raw), CBlock.deserialize(raw)
+    assert block.hash == b2lx(reference.GetHash())
+    assert [tx.txid for tx in block.transactions] == [b2lx(tx.GetTxid()) for tx in reference.vtx]
+    stripped = 81 + sum(len(tx.serialize({"include_witness": False})) for tx in reference.vtx)
+    assert block.weight == stripped * 3 + len(raw)
+    for tx, ref in zip(block.transactions, reference.vtx):
+        assert tx.size == len(ref.serialize())
+        assert tx.weight == len(ref.serialize({"include_witness": False})) * 3 + tx.size
+        assert tx.vsize == (tx.weight + 3) // 4
+
+def test_bits_to_difficulty():
+    assert bits_to_difficulty(0x1D00FFFF) == 1.0
+    assert bits_to_difficulty(0x207FFFFF) == pytest.approx(4.656542373906925e-10)
+
+@pytest.mark.parametrize("node_json", ["1", "4.656542373906925e-10", "95672703408223.94", "1e+16", "0.0001"])
+def test_node_difficulty_matches_the_rpc_value(node_json):
+    # O valor que o modo verboso recebe do node, depois de passar por um double
+    from_node = json.loads(node_json, parse_float=Decimal)
+    assert node_difficulty(float(from_node)) == from_node
+    assert type(node_difficulty(float(from_node))) is type(from_node)
+
+def test_raw_difficulty_uses_the_node_format():
+    assert node_difficulty(bits_to_difficulty(0x207FFFFF)) == Decimal("4.656542373906925E-10")
+    assert str(node_difficulty(bits_to_difficulty(0x207FFFFF))) == "4.656542373906925E-10"
+    assert node_difficulty(bits_to_difficulty(0x1D00FFFF)) == 1
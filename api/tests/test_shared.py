@@ -0,0 +1,85 @@
+from decimal import Decimal
+from app.admission import AdmissionError, request_deadline
+from app.shared import LeaderLock, SharedCache, SharedCacheConfig, decode, encode
+import asyncio
+import pytest
+import time
+
+@pytest.fixture
+def workers(tmp_path):
+    """
+    Dois "workers" sobre o mesmo arquivo, cada um com a própria conexão
+    """
+    config = SharedCacheConfig(enabled=True, path=str(tmp_path / "shared.sqlite"), lease=0.3, poll_interval=0.01)
+    caches = [SharedCache(config), SharedCache(config)]
+    for cache in caches:
+        cache.open()
+    yield caches
+    for cache in caches:
+        cache.close()
+
+class SlowCompute:
+    def __init__(self, value, delay: float = 0.1):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+def test_encode_decode_round_trip():
+    value = {"fee": Decimal("0.00012345"), "range": (1, 2), "rows": [{"txid": "ab" * 32}] * 50, "empty": None}
+    blob = encode(value)
+    assert decode(blob) == value
+    assert isinstance(decode(blob)["range"], tuple) and isinstance(decode(blob)["fee"], Decimal)
+    assert len(blob) < len(repr(value))
+
+def test_concurrent_fills_compute_once(workers):
+    first, second = workers
+    compute = SlowCompute({"height": 10})
+
+    async def scenario():
+        return await asyncio.gather(first.fill("block", "10", compute), second.fill("block", "10", compute))
+    assert asyncio.run(scenario()) == [{"height": 10}, {"height": 10}]
+    assert compute.calls == 1
+    assert (first.fills + second.fills, first.waits + second.waits) == (1, 1)
+    # Depois de preenchida, a chave é lida sem calcular de novo
+    assert asyncio.run(second.fill("block", "10", compute)) == {"height": 10}
+    assert compute.calls == 1 and second.hits == 1
+
+def test_expired_lease_is_taken_over(workers):
+    dead, survivor = workers
+    # O worker que obteve a concessão morre sem gravar nem liberar a chave
+    assert dead._acquire("block:11")
+    compute = SlowCompute("value", delay=0)
+    started = time.monotonic()
+    assert asyncio.run(survivor.fill("block", "11", compute)) == "value"
+    assert compute.calls == 1
+    assert time.monotonic() - started >= survivor.config.lease * 0.9
+    assert asyncio.run(dead.get_many("block", ["11"])) == {"11": "value"}
+
+def test_wait_stops_at_the_request_deadline(workers):
+    holder, waiter = workers
+    holder.config.lease = 15
+    assert holder._acquire("block:12")
+
+    async def request():
+        request_deadline.set(time.monotonic() + 0.1)
+        return await waiter.fill("block", "12", SlowCompute("value"))
+    started = time.monotonic()
+    with pytest.raises(AdmissionError) as raised:
+        asyncio.run(request())
+    assert raised.value.status_code == 503
+    assert time.monotonic() - started < 1
+
+def test_leader_lock_fails_over(tmp_path):
+    path = str(tmp_path / "leader.lock")
+    leader, follower = LeaderLock(path), LeaderLock(path)
+    assert leader.acquire() and leader.leader
+    assert not follower.acquire() and not follower.leader
+    leader.release()
+    assert follower.acquire() and follower.leader
+    assert not leader.acquire()
+    follower.release()
@@ -0,0 +1,161 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from bitcoin.rpc import JSONRPCError
+from app.shared import SharedCache, SharedCacheConfig
+from app.stats import CHUNK_ROWS, BlockColumns, BlockStats, StatsConfig, _chunk_key
+import asyncio
+import hashlib
+import numpy as np
+import pytest
+
+def fake_hash(*parts: Any) -> str:
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+class FakeChain:
+    """
+    Node mínimo para as estatísticas: getblockcount, getblockhash,
+    getblockheader e getblockstats, contando as chamadas por método
+    """
+    def __init__(self, length: int):
+        self.hashes: List[str] = []
+        self.calls: Counter = Counter()
+        self.extend(length)
+
+    def extend(self, length: int, tag: str = ""):
+        for _ in range(length):
+            self.hashes.append(fake_hash("block", len(self.hashes), tag))
+
+    def height_of(self, block_hash: str) -> int:
+        return self.hashes.index(block_hash)
+
+    def header(self, height: int) -> Tuple[str, Optional[str], int]:
+        return self.hashes[height], self.hashes[height - 1] if height else None, 1_700_000_000 + height * 600
+
+    def _call(self, method: str, params: List[Any]) -> Any:
+        self.calls[method] += 1
+        if method == "getblockcount":
+            return len(self.hashes) - 1
+        if method == "getblockhash":
+            if not 0 <= params[0] < len(self.hashes):
+                raise JSONRPCError({"code": -8, "message": "Block height out of range"})
+            return self.hashes[params[0]]
+        if method == "getblockheader":
+            block_hash, previous_hash, block_time = self.header(self.height_of(params[0]))
+            header = {"hash": block_hash, "time": block_time}
+            if previous_hash:
+                header["previousblockhash"] = previous_hash
+            return header
+        if method == "getblockstats":
+            height = self.height_of(params[0])
+            return {
+                "txs": height + 1, "total_size": 1000 + height, "total_weight": 4000 + height,
+                "totalfee": 10 * height, "avgfeerate": 1.5, "feerate_percentiles": [1, 2, 3, 4, 5]
+            }
+        raise AssertionError(method)
+
+    async def batch(self, calls, return_exceptions: bool = False) -> List[Any]:
+        results = []
+        for method, params in calls:
+            try:
+                results.append(self._call(method, list(params)))
+            except JSONRPCError as ex:
+                if not return_exceptions:
+                    raise
+                results.append(ex)
+        return results
+
+    async def headers(self, first: int, last: int) -> List[Tuple[str, Optional[str], int]]:
+        return [self.header(height) for height in range(first, min(last, len(self.hashes) - 1) + 1)]
+
+async def sync(stats: BlockStats, chain: FakeChain, headers=None):
+    while await stats.sync_step(chain, headers):
+        await stats.publish()
+    await stats.publish()
+
+@pytest.fixture
+def shared(tmp_path):
+    shared = SharedCache(SharedCacheConfig(enabled=True, path=str(tmp_path / "shared.sqlite")))
+    shared.open()
+    yield shared
+    shared.close()
+
+def columns_of(stats: BlockStats) -> Dict[str, np.ndarray]:
+    return stats.blocks.rows(0, stats.blocks.count)
+
+def assert_same(follower: BlockStats, leader: BlockStats):
+    assert follower.blocks.count == leader.blocks.count
+    for name, column in columns_of(leader).items():
+        assert np.array_equal(columns_of(follower)[name], column)
+
+def test_append_columns_matches_append():
+    rows = BlockColumns(0)
+    rows.append([{"time": t, "txs": t % 7} for t in range(1500)])
+    copied = BlockColumns(0)
+    copied.append_columns(rows.rows(0, 1000))
+    copied.append_columns(rows.rows(1000, 1500))
+    assert copied.count == 1500
+    for name, column in rows.rows(0, 1500).items():
+        assert np.array_equal(copied.rows(0, 1500)[name], column)
+
+def test_known_headers_skip_getblockheader():
+    chain = FakeChain(250)
+    stats = BlockStats(StatsConfig())
+    asyncio.run(sync(stats, chain, chain.headers))
+    assert stats.blocks.tip_height == 249 and stats.synced
+    assert chain.calls["getblockheader"] == 0
+    assert chain.calls["getblockstats"] == 250
+    assert stats.blocks.tip_hash() == chain.hashes[-1]
+
+def test_follower_loads_published_chunks(shared):
+    chain = FakeChain(CHUNK_ROWS * 2 + 100)
+    leader = BlockStats(StatsConfig(batch_size=500), shared)
+    follower = BlockStats(StatsConfig(), shared)
+    asyncio.run(sync(leader, chain))
+    assert asyncio.run(follower.pull())
+    assert_same(follower, leader)
+    assert follower.synced and follower.blocks.tip_hash() == chain.hashes[-1]
+    assert not asyncio.run(follower.pull())
+
+    # Reorg de dois blocos: o líder regrava só o último trecho e o seguidor o relê
+    calls = dict(chain.calls)
+    del chain.hashes[-2:]
+    chain.extend(3, tag="reorg")
+    asyncio.run(sync(leader, chain))
+    assert leader._chunk_versions[:2] == follower._chunk_versions[:2]
+    assert asyncio.run(follower.pull())
+    assert_same(follower, leader)
+    assert follower.blocks.tip_hash() == chain.hashes[-1]
+    assert chain.calls["getblockstats"] - calls["getblockstats"] == 3
+
+def test_truncation_below_a_chunk_boundary_drops_chunks(shared):
+    chain = FakeChain(CHUNK_ROWS + 10)
+    leader = BlockStats(StatsConfig(batch_size=2000), shared)
+    follower = BlockStats(StatsConfig(), shared)
+    asyncio.run(sync(leader, chain))
+    asyncio.run(follower.pull())
+    del chain.hashes[CHUNK_ROWS - 5:]
+    chain.extend(2, tag="reorg")
+    asyncio.run(sync(leader, chain))
+    assert asyncio.run(shared.get_state([_chunk_key(1)])) == {}
+    assert asyncio.run(follower.pull())
+    assert_same(follower, leader)
+    assert follower.blocks.tip_height == CHUNK_ROWS - 4
+
+def test_new_leader_continues_from_published_state(shared):
+    chain = FakeChain(300)
+    asyncio.run(sync(BlockStats(StatsConfig(), shared), chain))
+    chain.calls.clear()
+    successor = BlockStats(StatsConfig(), shared)
+    follower = BlockStats(StatsConfig(), shared)
+    asyncio.run(follower.pull())
+
+    async def take_over():
+        await successor.pull()
+        chain.extend(5)
+        await sync(successor, chain)
+    asyncio.run(take_over())
+    assert successor.blocks.tip_height == 304
+    assert chain.calls["getblockstats"] == 5
+    # Mesma época: o seguidor relê só o trecho do topo
+    assert asyncio.run(follower.pull())
+    assert_same(follower, successor)
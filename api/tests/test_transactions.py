@@ -0,0 +1,174 @@
+from decimal import Decimal
+from typing import Any, Dict
+from app.amounts import sat_to_btc
+from app.transactions import SUMMARY_FIELDS, address_totals, build_outputs, needs_prevouts, summarize_transaction
+import copy
+
+def spk(address: str = None, kind: str = "witness_v0_keyhash", legacy: bool = True) -> Dict[str, Any]:
+    """
+    scriptPubKey decodificado; `legacy` usa a lista "addresses" dos bitcoind
+    antigos em vez do campo "address"
+    """
+    script = {"type": kind, "hex": f"0014{(address or '').encode().hex()}"}
+    if address is not None:
+        script.update({"addresses": [address]} if legacy else {"address": address})
+    return script
+
+def fixture(legacy: bool = True):
+    """
+    Transação com três inputs (dois do mesmo endereço) e quatro outputs
+    (troco para um endereço de origem e um OP_RETURN sem endereço), com
+    valores que não somam exatamente em ponto flutuante
+    """
+    parents = {
+        "aa" * 32: {"txid": "aa" * 32, "vout": [
+            {"value": Decimal("0.1"), "n": 0, "scriptPubKey": spk("alice", legacy=legacy)},
+            {"value": Decimal("0.2"), "n": 1, "scriptPubKey": spk("alice", legacy=legacy)}
+        ]},
+        "bb" * 32: {"txid": "bb" * 32, "vout": [
+            {"value": Decimal("1.23456789"), "n": 0, "scriptPubKey": spk("bob", "pubkeyhash", legacy)}
+        ]}
+    }
+    tx = {
+        "txid": "cc" * 32, "size": 500, "vsize": 400, "weight": 1600, "confirmations": 3, "time": 1_700_000_000,
+        "vin": [
+            {"txid": "aa" * 32, "vout": 0, "sequence": 1, "scriptSig": {"asm": "", "hex": ""}},
+            {"txid": "aa" * 32, "vout": 1, "sequence": 2},
+            {"txid": "bb" * 32, "vout": 0, "sequence": 3}
+        ],
+        "vout": [
+            {"value": Decimal("0.3"), "n": 0, "scriptPubKey": spk("carol", legacy=legacy)},
+            {"value": Decimal("1.0"), "n": 1, "scriptPubKey": spk("dave", legacy=legacy)},
+            {"value": Decimal("0.23446789"), "n": 2, "scriptPubKey": spk("alice", legacy=legacy)},
+            {"value": Decimal("0"), "n": 3, "scriptPubKey": spk(kind="nulldata", legacy=legacy)}
+        ]
+    }
+    return tx, parents
+
+def baseline_summary(tx_info: Dict[str, Any], parents: Dict[str, Any], in_mempool: bool) -> Dict[str, Any]:
+    """
+    O resumo como o endpoint montava antes da reescrita (somas em BTC,
+    endereços pela lista "addresses"), para comparar os resultados
+    """
+    inputs, input_addresses, total_input = [], [], 0
+    for vin in tx_info["vin"]:
+        input_info = {"txid": vin.get("txid"), "vout": vin.get("vout"), "sequence": vin.get("sequence")}
+        if "txid" in vin:
+            prev_vout = parents[vin["txid"]]["vout"][vin["vout"]]
+            input_info.update({
+                "addresses": prev_vout["scriptPubKey"].get("addresses", []),
+                "value": prev_vout["value"],
+                "type": prev_vout["scriptPubKey"].get("type")
+            })
+            total_input += prev_vout["value"]
+            input_addresses.extend(prev_vout["scriptPubKey"].get("addresses", []))
+        else:
+            input_info.update({"coinbase": vin.get("coinbase"), "type": "coinbase"})
+        if "scriptSig" in vin:
+            input_info["scriptSig"] = {"asm": vin["scriptSig"].get("asm"), "hex": vin["scriptSig"].get("hex")}
+        inputs.append(input_info)
+
+    outputs, output_addresses, total_output = [], [], 0
+    for vout in tx_info["vout"]:
+        outputs.append({
+            "value": vout["value"], "n": vout["n"], "type": vout["scriptPubKey"].get("type"),
+            "addresses": vout["scriptPubKey"].get("addresses", []), "scriptPubKey": vout["scriptPubKey"].get("hex")
+        })
+        total_output += vout["value"]
+        output_addresses.extend(vout["scriptPubKey"].get("addresses", []))
+    fee = round(total_input - total_output, 8) if inputs and "coinbase" not in inputs[0] else 0
+
+    transfers = []
+    for input_addr in set(input_addresses):
+        input_total = sum(inp.get("value", 0) for inp in inputs if input_addr in inp.get("addresses", []))
+        for output_addr in set(output_addresses):
+            output_total = sum(out["value"] for out in outputs if output_addr in out["addresses"])
+            if input_addr != output_addr:
+                transfers.append({"from": input_addr, "to": output_addr, "value": min(input_total, output_total)})
+    return {
+        "txid": tx_info["txid"], "size": tx_info["size"], "vsize": tx_info["vsize"], "weight": tx_info["weight"],
+        "fee": fee, "total_input": total_input, "total_output": total_output,
+        "confirmations": tx_info.get("confirmations", 0), "time": tx_info.get("time"), "in_mempool": in_mempool,
+        "inputs": inputs, "outputs": outputs, "transfers": transfers,
+        "input_addresses": list(set(input_addresses)), "output_addresses": list(set(output_addresses))
+    }
+
+def unordered(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    O código antigo montava endereços e transferências a partir de sets:
+    a ordem deles não faz parte do resultado
+    """
+    summary = dict(summary)
+    summary["transfers"] = sorted((t["from"], t["to"], t["value"]) for t in summary["transfers"])
+    summary["input_addresses"] = sorted(summary["input_addresses"])
+    summary["output_addresses"] = sorted(summary["output_addresses"])
+    return summary
+
+def test_matches_the_baseline_summary():
+    tx, parents = fixture()
+    summary = summarize_transaction(tx, parents, in_mempool=False)
+    assert unordered(summary) == unordered(baseline_summary(tx, parents, False))
+    assert list(summary) == list(baseline_summary(tx, parents, False))
+
+def test_fee_arithmetic_is_exact_in_satoshis():
+    tx, parents = fixture()
+    summary = summarize_transaction(tx, parents, in_mempool=False)
+    assert summary["total_input"] == sat_to_btc(10_000_000 + 20_000_000 + 123_456_789)
+    assert summary["total_output"] == sat_to_btc(30_000_000 + 100_000_000 + 23_446_789)
+    assert summary["fee"] == Decimal("0.00010000")
+    assert str(summary["fee"]) == "0.00010000"
+    assert all(isinstance(record["value"], Decimal) for record in summary["inputs"] + summary["outputs"])
+
+def test_address_totals_and_transfers():
+    tx, parents = fixture()
+    summary = summarize_transaction(tx, parents, in_mempool=False)
+    # Ordem da primeira aparição; o OP_RETURN não tem endereço
+    assert summary["input_addresses"] == ["alice", "bob"]
+    assert summary["output_addresses"] == ["carol", "dave", "alice"]
+    assert address_totals(build_outputs(tx)) == {"carol": 30_000_000, "dave": 100_000_000, "alice": 23_446_789}
+    assert summary["transfers"] == [
+        {"from": "alice", "to": "carol", "value": Decimal("0.30000000")},
+        {"from": "alice", "to": "dave", "value": Decimal("0.30000000")},
+        {"from": "bob", "to": "carol", "value": Decimal("0.30000000")},
+        {"from": "bob", "to": "dave", "value": Decimal("1.00000000")},
+        {"from": "bob", "to": "alice", "value": Decimal("0.23446789")}
+    ]
+
+def test_address_field_matches_addresses_list():
+    legacy = summarize_transaction(*fixture(legacy=True), in_mempool=True)
+    current = summarize_transaction(*fixture(legacy=False), in_mempool=True)
+    assert current == legacy
+    assert current["inputs"][2]["addresses"] == ["bob"]
+    assert current["outputs"][3]["addresses"] == []
+
+def test_coinbase_and_unresolved_inputs():
+    coinbase = {
+        "txid": "dd" * 32, "size": 100, "vsize": 100, "weight": 400,
+        "vin": [{"coinbase": "03abcdef", "sequence": 0xFFFFFFFF}],
+        "vout": [{"value": Decimal("3.125"), "n": 0, "scriptPubKey": spk("miner")}]
+    }
+    summary = summarize_transaction(coinbase, {}, in_mempool=False)
+    assert (summary["fee"], summary["total_input"]) == (Decimal("0E-8"), Decimal("0E-8"))
+    assert summary["inputs"][0] == {"txid": None, "vout": None, "sequence": 0xFFFFFFFF, "coinbase": "03abcdef", "type": "coinbase"}
+    assert summary["transfers"] == [] and summary["input_addresses"] == []
+    assert summarize_transaction(coinbase, {}, False) == baseline_summary(coinbase, {}, False)
+
+    tx, parents = fixture()
+    parents = {**parents, "bb" * 32: KeyError("bb" * 32)}
+    summary = summarize_transaction(tx, parents, in_mempool=False)
+    assert summary["inputs"][2]["error"].startswith("Não foi possível obter detalhes do input")
+    assert summary["input_addresses"] == ["alice"]
+    assert summary["total_input"] == Decimal("0.30000000")
+
+def test_summary_fields_use_the_node_fee():
+    tx, parents = fixture()
+    with_fee = {**copy.deepcopy(tx), "fee": Decimal("0.0001")}
+    assert not needs_prevouts(with_fee, SUMMARY_FIELDS)
+    assert needs_prevouts(tx, SUMMARY_FIELDS)
+    assert needs_prevouts(with_fee, frozenset({"fee", "inputs"}))
+
+    # Sem as transações anteriores, o resultado coincide com o completo nos campos pedidos
+    summary = summarize_transaction(with_fee, {}, in_mempool=False, fields=SUMMARY_FIELDS)
+    full = summarize_transaction(tx, parents, in_mempool=False)
+    assert summary == {field: value for field, value in full.items() if field in SUMMARY_FIELDS}
+    assert list(summary) == ["txid", "size", "vsize", "weight", "fee", "confirmations", "time", "in_mempool"]
@@ -1,11 +1,14 @@
 // src/stores/network.ts
 import { defineStore } from 'pinia'
 import { ref } from 'vue'
-import type { Network } from 'src/models/Network'
+import { Network, type NetworkDTO } from 'src/models/Network'
 import { networkService } from 'src/services/network'
+import { api } from 'src/boot/axios'
 
 export const useNetworkStore = defineStore('network', () => {
   const networkInfo = ref<Network | null>(null)
+  let eventSource: EventSource | null = null
+  let pollTimer: ReturnType<typeof setInterval> | null = null
 
   async function updateNetworkInfo() {
     try {
@@ -16,15 +19,48 @@ export const useNetworkStore = defineStore('network', () => {
     }
   }
 
+  function startPolling() {
+    if (pollTimer !== null) return
+    // Atualiza a cada 30 segundos
+    pollTimer = setInterval(updateNetworkInfo, 30000)
+  }
+
+  function stopPolling() {
+    if (pollTimer === null) return
+    clearInterval(pollTimer)
+    pollTimer = null
+  }
+
   function startNetworkMonitor() {
     updateNetworkInfo()
-    // Atualiza a cada 30 segundos
-    setInterval(updateNetworkInfo, 30000)
+
+    // Sem suporte a Server-Sent Events, volta para o polling
+    if (typeof EventSource === 'undefined') {
+      startPolling()
+      return
+    }
+
+    // A API empurra o resumo da rede a cada novo bloco ou mudança na mempool
+    eventSource = new EventSource(`${api.defaults.baseURL}/events`)
+    eventSource.addEventListener('network', (event) => {
+      stopPolling()
+      networkInfo.value = Network.fromDTO(JSON.parse((event as MessageEvent).data) as NetworkDTO)
+    })
+    // Enquanto o stream estiver caído, mantém os dados atualizados por polling;
+    // o EventSource reconecta sozinho
+    eventSource.onerror = () => startPolling()
+  }
+
+  function stopNetworkMonitor() {
+    eventSource?.close()
+    eventSource = null
+    stopPolling()
   }
 
   return {
     networkInfo,
     updateNetworkInfo,
-    startNetworkMonitor
+    startNetworkMonitor,
+    stopNetworkMonitor
   }
-})
\ No newline at end of file
+})
@@ -3,8 +3,11 @@ import random
 import logging
 import os
 import traceback
-from typing import Dict
+from typing import Dict, Optional
 from bitcoin.rpc import RawProxy, JSONRPCError
+from load import LoadConfig, LoadGenerator
+from telemetry import Telemetry, TelemetryConfig
+from workload import Profile, ProfileRunner, write_manifest
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
@@ -21,6 +24,7 @@ class BitcoinSimulator:
         self.addresses: Dict[str, float] = {}
         self.mining_address = None
         self.fallback_fee = 0.00001
+        self.telemetry: Optional[Telemetry] = None
 
         # Esperar o node Bitcoin estar pronto
         self.wait_for_bitcoin_node()
@@ -53,7 +57,11 @@ class BitcoinSimulator:
             except JSONRPCError as ex:
                 if "Database already exists" in str(ex):
                     logger.info("Wallet 'simulator_wallet' já existe, carregando...")
-                    self.rpc.loadwallet("simulator_wallet")
+                    try:
+                        self.rpc.loadwallet("simulator_wallet")
+                    except JSONRPCError as load_ex:
+                        if "already loaded" not in str(load_ex):
+                            raise
                 else:
                     raise
             
@@ -108,6 +116,11 @@ class BitcoinSimulator:
             logger.error(f"Erro ao gerar blocos iniciais: {ex}")
             raise
 
+    def record_submit(self, kind: str, started: float, txid: str):
+        """Registra a latência de envio na telemetria, se ativa"""
+        if self.telemetry is not None:
+            self.telemetry.record_submit(kind, started, txid)
+
     def create_simple_transaction(self, addresses):
         """Cria uma transação simples"""
         try:
@@ -115,6 +128,7 @@ class BitcoinSimulator:
             receiver = random.choice([addr for addr in addresses if addr != sender])
             amount = round(random.uniform(0.0001, 0.01), 8)
             
+            started = time.monotonic()
             txid = self.rpc.sendtoaddress(
                 receiver, 
                 amount,
@@ -123,6 +137,7 @@ class BitcoinSimulator:
                 False,  # Subtract fee from amount
                 True    # Replaceable
             )
+            self.record_submit("simple", started, txid)
             logger.info(f"Transação simples criada: {amount:.8f} BTC para {receiver}, TXID: {txid}")
             return txid
         except Exception as e:
@@ -139,6 +154,7 @@ class BitcoinSimulator:
                 amount = round(random.uniform(0.0001, 0.01), 8)
                 outputs[recv] = amount
 
+            started = time.monotonic()
             raw_tx = self.rpc.createrawtransaction([], outputs)
             
             # Configurando opções básicas para fundrawtransaction
@@ -150,6 +166,7 @@ class BitcoinSimulator:
             funded_tx = self.rpc.fundrawtransaction(raw_tx, options)
             signed_tx = self.rpc.signrawtransactionwithwallet(funded_tx['hex'])
             txid = self.rpc.sendrawtransaction(signed_tx['hex'])
+            self.record_submit("multi-output", started, txid)
             logger.info(f"Transação com múltiplos outputs criada, TXID: {txid}")
             return txid
         except Exception as e:
@@ -164,11 +181,14 @@ class BitcoinSimulator:
                 
             addr1, addr2, addr3 = random.sample(addresses, 3)
             amount = round(random.uniform(0.001, 0.005), 8)
-            txid1 = self.rpc.sendtoaddress(addr1, amount)
-            time.sleep(0.3)
-            txid2 = self.rpc.sendtoaddress(addr2, round(amount / 2, 8))
-            time.sleep(0.3)
-            txid3 = self.rpc.sendtoaddress(addr3, round(amount / 4, 8))
+            txids = []
+            for i, address in enumerate((addr1, addr2, addr3)):
+                if i:
+                    time.sleep(0.3)
+                started = time.monotonic()
+                txids.append(self.rpc.sendtoaddress(address, round(amount / 2 ** i, 8)))
+                self.record_submit("chain", started, txids[-1])
+            txid1, txid2, txid3 = txids
             
             logger.info(f"Transações em cadeia criadas, TXIDs: {txid1}, {txid2}, {txid3}")
         except Exception as e:
@@ -184,7 +204,7 @@ class BitcoinSimulator:
             try:
                 # Gera um bloco a cada 2 transações para garantir fundos suficientes
                 if i % 2 == 0:
-                    self.rpc.generatetoaddress(1, self.mining_address)
+                    self.mine_block()
                     time.sleep(0.3)
                 
                 if i % 3 == 0:
@@ -203,6 +223,12 @@ class BitcoinSimulator:
                 except Exception as ex:
                     logger.error(f"Erro ao criar transações: {str(ex)}")
 
+    def mine_block(self):
+        """Minera um bloco e registra a ocupação na telemetria"""
+        block_hash = self.rpc.generatetoaddress(1, self.mining_address)[0]
+        if self.telemetry is not None:
+            self.telemetry.record_block(self.rpc.getblock(block_hash))
+
     def distribute_initial_funds(self, amount: float = 10):
         """Distribui fundos iniciais para cada endereço a partir da carteira mineradora."""
         try:
@@ -249,10 +275,17 @@ class BitcoinSimulator:
             logger.info("Distribuindo fundos iniciais...")
             self.distribute_initial_funds(10)
 
+            self.telemetry = Telemetry(TelemetryConfig.from_env(), "classic")
+            self.telemetry.start()
+
             for batch in range((num_transactions + 9) // 10):
                 logger.info(f"Iniciando lote {batch+1} de transações...")
                 self.create_complex_transactions(min(10, num_transactions - batch * 10))
-                self.rpc.generatetoaddress(5, self.mining_address)  # Gerando blocos entre lotes
+                for _ in range(5):  # Gerando blocos entre lotes
+                    self.mine_block()
+
+            self.telemetry.stop(drain=min(self.telemetry.config.probe_timeout, 10))
+            self.telemetry.write_report()
 
             logger.info(f"Gerando {final_blocks} blocos finais...")
             self.rpc.generatetoaddress(final_blocks, self.mining_address)
@@ -266,8 +299,42 @@ class BitcoinSimulator:
             logger.error(f"Erro durante a simulação: {e}\n{traceback.format_exc()}")
             raise
 
+    def run_load(self, config: LoadConfig, num_wallets: int = 10):
+        """Executa o modo de carga contínua (SIMULATOR_MODE=load)"""
+        self.create_wallet()
+        self.setup_wallets(num_wallets)
+        # Coinbases só ficam gastáveis após 100 confirmações
+        if self.rpc.getblockcount() < 101 or self.rpc.getbalance() < 1:
+            self.generate_initial_blocks(201)
+        generator = LoadGenerator(self.service_url, self.mining_address, list(self.addresses), config)
+        return generator.run()
+
+    def run_profile(self, profile: Profile):
+        """Gera uma cadeia reprodutível a partir de um perfil (SIMULATOR_MODE=profile)"""
+        current_blocks = self.verify_blockchain_state()['blocks']
+        if current_blocks > profile.initial_blocks:
+            logger.info(f"A blockchain já possui {current_blocks} blocos. Perfil '{profile.name}' não será aplicado.")
+            return None
+        self.create_wallet()
+        self.mining_address = self.rpc.getnewaddress("mining")
+        self.generate_initial_blocks(profile.initial_blocks - current_blocks)
+        self.telemetry = Telemetry(TelemetryConfig.from_env(), "profile")
+        manifest = ProfileRunner(self.service_url, self.mining_address, profile, self.telemetry).run()
+        self.telemetry.stop(drain=min(self.telemetry.config.probe_timeout, 10))
+        self.telemetry.write_report(profile=profile.name, seed=profile.seed)
+        logger.info(f"Perfil '{profile.name}' concluído: {len(manifest['blocks'])} blocos, {len(manifest['huge'])} transações extremas")
+        return manifest
+
 if __name__ == "__main__":
     num_wallets = 10
     num_transactions = 100
     simulator = BitcoinSimulator()
-    simulator.run_simulation(num_wallets=num_wallets, num_transactions=num_transactions)
+    mode = os.getenv("SIMULATOR_MODE", "classic")
+    if mode == "load":
+        simulator.run_load(LoadConfig.from_env(), num_wallets=num_wallets)
+    elif mode == "profile":
+        manifest = simulator.run_profile(Profile.load(os.getenv("SIM_PROFILE", "default")))
+        if manifest is not None:
+            write_manifest(manifest, os.getenv("SIM_MANIFEST"))
+    else:
+        simulator.run_simulation(num_wallets=num_wallets, num_transactions=num_transactions)
@@ -0,0 +1,386 @@
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from bitcoin.rpc import RawProxy, JSONRPCError
+from telemetry import Telemetry, TelemetryConfig
+from utxo_pool import UtxoPool
+
+logger = logging.getLogger(__name__)
+
+# Erros de envio que indicam pressão na mempool ou falta de fundos confirmados
+BACKPRESSURE_ERRORS = ("too-long-mempool-chain", "mempool full", "mempool min fee not met", "min relay fee not met")
+INSUFFICIENT_FUNDS = -6
+
+@dataclass
+class LoadConfig:
+    target_tps: float = 50.0
+    workers: int = 8
+    duration: float = 0.0            # segundos; 0 = sem limite
+    mine_interval: float = 30.0      # segundos entre blocos; 0 desativa
+    mine_mempool_size: int = 5000    # minera ao atingir esse tamanho de mempool; 0 desativa
+    max_mempool_size: int = 20000    # acima disso os workers pausam até a mempool cair à metade
+    monitor_interval: float = 1.0
+    report_interval: float = 10.0
+    min_amount: float = 0.0001
+    max_amount: float = 0.01
+    max_outputs: int = 3
+    # wallet: sendtoaddress/sendmany; local: UTXOs próprios assinados no cliente
+    tx_mode: str = "wallet"
+    submit_batch: int = 50           # transações por sendrawtransaction em lote (modo local)
+    batch_window: float = 0.25       # espera máxima para completar um lote, em segundos
+    fanout_utxos: int = 5000
+    fanout_amount: float = 0.001
+    feerate: int = 2                 # sat/vB
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            target_tps=float(os.getenv("SIM_TARGET_TPS", "50")),
+            workers=int(os.getenv("SIM_WORKERS", "8")),
+            duration=float(os.getenv("SIM_DURATION", "0")),
+            mine_interval=float(os.getenv("SIM_MINE_INTERVAL", "30")),
+            mine_mempool_size=int(os.getenv("SIM_MINE_MEMPOOL_SIZE", "5000")),
+            max_mempool_size=int(os.getenv("SIM_MAX_MEMPOOL_SIZE", "20000")),
+            monitor_interval=float(os.getenv("SIM_MONITOR_INTERVAL", "1")),
+            report_interval=float(os.getenv("SIM_REPORT_INTERVAL", "10")),
+            max_outputs=int(os.getenv("SIM_MAX_OUTPUTS", "3")),
+            tx_mode=os.getenv("SIM_TX_MODE", "wallet"),
+            submit_batch=int(os.getenv("SIM_SUBMIT_BATCH", "50")),
+            batch_window=float(os.getenv("SIM_BATCH_WINDOW", "0.25")),
+            fanout_utxos=int(os.getenv("SIM_FANOUT_UTXOS", "5000")),
+            fanout_amount=float(os.getenv("SIM_FANOUT_AMOUNT", "0.001")),
+            feerate=int(os.getenv("SIM_FEERATE", "2"))
+        )
+
+class RateLimiter:
+    """
+    Token bucket compartilhado entre os workers (thread-safe)
+    """
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop: threading.Event, timeout: Optional[float] = None) -> bool:
+        """
+        Bloqueia até haver um token; retorna False se a simulação parar ou o
+        timeout expirar antes
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not stop.is_set():
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                if time.monotonic() + wait > deadline:
+                    return False
+            stop.wait(wait)
+        return False
+
+@dataclass
+class LoadStats:
+    submitted: int = 0
+    blocks: int = 0
+    rejected: Dict[str, int] = field(default_factory=dict)
+    mempool_size: int = 0
+    paused: bool = False
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def count_submitted(self):
+        with self._lock:
+            self.submitted += 1
+
+    def count_rejected(self, reason: str):
+        with self._lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+    def count_block(self):
+        with self._lock:
+            self.blocks += 1
+
+def _error_message(ex: JSONRPCError) -> str:
+    return ex.error.get("message", str(ex))
+
+def _error_code(ex: JSONRPCError) -> Optional[int]:
+    return ex.error.get("code")
+
+class LoadGenerator:
+    """
+    Modo de carga: um pool de workers, cada um com a sua conexão RPC, envia
+    transações no ritmo alvo (token bucket); a mempool é monitorada para
+    aplicar backpressure, e um minerador fecha blocos por intervalo ou
+    quando a mempool atinge o tamanho configurado
+    """
+    def __init__(self, service_url: str, mining_address: str, addresses: List[str], config: LoadConfig,
+                 telemetry: Optional[Telemetry] = None):
+        self.service_url = service_url
+        self.mining_address = mining_address
+        self.addresses = addresses
+        self.config = config
+        self.stats = LoadStats()
+        self.limiter = RateLimiter(config.target_tps)
+        self.stop = threading.Event()
+        self.accepting = threading.Event()
+        self.accepting.set()
+        self.mine_requested = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.pool = UtxoPool(feerate=config.feerate) if config.tx_mode == "local" else None
+        self.telemetry = telemetry or Telemetry(TelemetryConfig.from_env(), f"load-{config.tx_mode}", config.target_tps)
+
+    def _proxy(self) -> RawProxy:
+        return RawProxy(service_url=self.service_url)
+
+    # Workers -----------------------------------------------------------------------
+
+    def _submit(self, rpc: RawProxy, rng: random.Random) -> tuple:
+        """
+        Envia uma transação da wallet: pagamento simples ou com vários
+        outputs. Retorna o tipo e o txid.
+        """
+        amount = lambda: round(rng.uniform(self.config.min_amount, self.config.max_amount), 8)
+        outputs = rng.randint(1, self.config.max_outputs)
+        if outputs == 1:
+            return "payment", rpc.sendtoaddress(rng.choice(self.addresses), amount())
+        receivers = rng.sample(self.addresses, min(outputs, len(self.addresses)))
+        return "sendmany", rpc.sendmany("", {address: amount() for address in receivers})
+
+    def _rejection_reason(self, code: Optional[int], message: str) -> str:
+        """
+        Classifica uma rejeição e pede um bloco quando ela indica pressão na mempool
+        """
+        if code == INSUFFICIENT_FUNDS:
+            self.mine_requested.set()
+            return "insufficient-funds"
+        reason = next((e for e in BACKPRESSURE_ERRORS if e in message), "rpc-error")
+        if reason != "rpc-error":
+            self.mine_requested.set()
+        return reason
+
+    def _worker(self, index: int):
+        if self.pool is not None:
+            return self._local_worker(index)
+        rpc = self._proxy()
+        rng = random.Random(index)
+        backoff = 0.0
+        while not self.stop.is_set():
+            # Backpressure global: mempool acima do limite
+            if not self.accepting.wait(timeout=0.5):
+                continue
+            if not self.limiter.acquire(self.stop):
+                break
+            try:
+                started = time.monotonic()
+                kind, txid = self._submit(rpc, rng)
+                self.stats.count_submitted()
+                self.telemetry.record_submit(kind, started, txid)
+                backoff = 0.0
+            except JSONRPCError as ex:
+                message = _error_message(ex)
+                reason = self._rejection_reason(_error_code(ex), message)
+                if reason == "rpc-error":
+                    logger.warning(f"Worker {index}: {message}")
+                self.stats.count_rejected(reason)
+                backoff = min(max(backoff * 2, 0.05), 2.0)
+                self.stop.wait(backoff)
+            except Exception as ex:
+                # Falha de conexão: recria o proxy deste worker
+                self.stats.count_rejected("connection")
+                logger.warning(f"Worker {index}: {ex}")
+                backoff = min(max(backoff * 2, 0.1), 5.0)
+                self.stop.wait(backoff)
+                rpc = self._proxy()
+
+    def _collect_batch(self, rng: random.Random) -> List[tuple]:
+        """
+        Monta até submit_batch transações no ritmo do token bucket, sem
+        segurar o lote por mais de batch_window
+        """
+        batch: List[tuple] = []
+        deadline = time.monotonic() + self.config.batch_window
+        while len(batch) < self.config.submit_batch:
+            timeout = None if not batch else max(deadline - time.monotonic(), 0)
+            if not self.limiter.acquire(self.stop, timeout):
+                break
+            built = self.pool.build(rng, max_outputs=self.config.max_outputs)
+            if built is None:
+                break
+            batch.append(built)
+        return batch
+
+    def _local_worker(self, index: int):
+        """
+        Worker do modo local: transações assinadas no cliente e enviadas em
+        um único sendrawtransaction em lote (uma requisição por lote)
+        """
+        rpc = self._proxy()
+        rng = random.Random(index)
+        backoff = 0.0
+        while not self.stop.is_set():
+            if not self.accepting.wait(timeout=0.5):
+                continue
+            batch = self._collect_batch(rng)
+            if not batch:
+                if self.stop.is_set():
+                    break
+                # Pool vazio ou só com cadeias longas demais: espera o próximo bloco
+                self.stats.count_rejected("pool-exhausted")
+                self.mine_requested.set()
+                backoff = min(max(backoff * 2, 0.1), 2.0)
+                self.stop.wait(backoff)
+                continue
+            started = time.monotonic()
+            try:
+                replies = rpc._batch([
+                    {"version": "1.1", "method": "sendrawtransaction", "params": [tx_hex], "id": i}
+                    for i, (tx_hex, _, _) in enumerate(batch)
+                ])
+            except Exception as ex:
+                for _, inputs, created in batch:
+                    self.pool.settle(inputs, created, {"message": str(ex)})
+                self.stats.count_rejected("connection")
+                logger.warning(f"Worker {index}: {ex}")
+                backoff = min(max(backoff * 2, 0.1), 5.0)
+                self.stop.wait(backoff)
+                rpc = self._proxy()
+                continue
+            by_id = {reply.get("id"): reply for reply in replies} if isinstance(replies, list) else {}
+            rejected = 0
+            for i, (_, inputs, created) in enumerate(batch):
+                reply = by_id.get(i)
+                error = reply.get("error") if reply is not None else {"message": "resposta ausente no lote"}
+                if self.pool.settle(inputs, created, error):
+                    self.stats.count_submitted()
+                    self.telemetry.record_submit("raw", started, created[0].txid)
+                    continue
+                rejected += 1
+                reason = self._rejection_reason(error.get("code"), error.get("message", ""))
+                if reason == "rpc-error":
+                    logger.warning(f"Worker {index}: {error.get('message')}")
+                self.stats.count_rejected(reason)
+            if rejected == len(batch):
+                backoff = min(max(backoff * 2, 0.05), 2.0)
+                self.stop.wait(backoff)
+            else:
+                backoff = 0.0
+
+    def prepare(self):
+        """
+        Modo local: divide os fundos da wallet em UTXOs pequenos das chaves
+        do simulador e confirma o fan-out antes de iniciar a carga
+        """
+        if self.pool is None:
+            return
+        rpc = self._proxy()
+        logger.info(f"Fan-out: criando {self.config.fanout_utxos} UTXOs de {self.config.fanout_amount} BTC...")
+        self.pool.fan_out(rpc, self.config.fanout_utxos, self.config.fanout_amount)
+        rpc.generatetoaddress(1, self.mining_address)
+        self.pool.confirm_all()
+        logger.info(f"Fan-out concluído: {len(self.pool)} UTXOs locais")
+
+    # Monitor e minerador -----------------------------------------------------------
+
+    def _monitor(self):
+        rpc = self._proxy()
+        config = self.config
+        while not self.stop.wait(config.monitor_interval):
+            try:
+                size = rpc.getmempoolinfo()["size"]
+            except Exception as ex:
+                logger.warning(f"Monitor: {ex}")
+                rpc = self._proxy()
+                continue
+            self.stats.mempool_size = size
+            if config.mine_mempool_size and size >= config.mine_mempool_size:
+                self.mine_requested.set()
+            if config.max_mempool_size and size >= config.max_mempool_size and self.accepting.is_set():
+                logger.info(f"Mempool com {size} transações: pausando envios")
+                self.accepting.clear()
+                self.stats.paused = True
+                self.mine_requested.set()
+            elif not self.accepting.is_set() and size <= config.max_mempool_size // 2:
+                logger.info(f"Mempool com {size} transações: retomando envios")
+                self.accepting.set()
+                self.stats.paused = False
+
+    def _miner(self):
+        rpc = self._proxy()
+        interval = self.config.mine_interval or None
+        while not self.stop.is_set():
+            self.mine_requested.wait(timeout=interval)
+            if self.stop.is_set():
+                break
+            self.mine_requested.clear()
+            try:
+                block_hash = rpc.generatetoaddress(1, self.mining_address)[0]
+                self.stats.count_block()
+                self.telemetry.record_block(rpc.getblock(block_hash))
+                if self.pool is not None and rpc.getmempoolinfo()["size"] == 0:
+                    self.pool.confirm_all()
+            except Exception as ex:
+                logger.warning(f"Minerador: {ex}")
+                rpc = self._proxy()
+                self.stop.wait(1)
+
+    def _report(self, started: float, last: int, last_time: float, final: bool = False) -> tuple:
+        now = time.monotonic()
+        submitted = self.stats.submitted
+        rate = (submitted - last) / max(now - last_time, 1e-9)
+        if not final:
+            self.telemetry.record_interval(submitted, rate, self.stats.mempool_size)
+        logger.info(
+            f"Carga: {submitted} transações ({rate:.1f} tx/s, média {submitted / max(now - started, 1e-9):.1f}), "
+            f"{self.stats.blocks} blocos, mempool {self.stats.mempool_size}, rejeições {self.stats.rejected}"
+        )
+        return submitted, now
+
+    def run(self) -> LoadStats:
+        """
+        Executa a carga até o fim de `duration` (ou até ser interrompido)
+        """
+        config = self.config
+        logger.info(
+            f"Modo de carga: alvo {config.target_tps} tx/s com {config.workers} workers, "
+            f"bloco a cada {config.mine_interval}s ou com {config.mine_mempool_size} transações na mempool"
+        )
+        self.prepare()
+        self.telemetry.start()
+        self._threads = [threading.Thread(target=self._worker, args=(i,), daemon=True) for i in range(config.workers)]
+        self._threads.append(threading.Thread(target=self._monitor, daemon=True))
+        self._threads.append(threading.Thread(target=self._miner, daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+        started = last_time = time.monotonic()
+        last = 0
+        try:
+            while not self.stop.is_set():
+                remaining = config.duration - (time.monotonic() - started) if config.duration else None
+                if remaining is not None and remaining <= 0:
+                    break
+                wait = config.report_interval if remaining is None else min(config.report_interval, remaining)
+                if self.stop.wait(wait):
+                    break
+                last, last_time = self._report(started, last, last_time)
+        except KeyboardInterrupt:
+            logger.info("Interrompido, encerrando workers...")
+        finally:
+            self.stop.set()
+            self.mine_requested.set()
+            self.accepting.set()
+            for thread in self._threads:
+                thread.join(timeout=10)
+        self._report(started, last, last_time, final=True)
+        self.telemetry.stop(drain=min(self.telemetry.config.probe_timeout, 10))
+        self.telemetry.write_report(rejected=dict(self.stats.rejected), mined_blocks=self.stats.blocks)
+        return self.stats
@@ -0,0 +1,312 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_BLOCK_WEIGHT = 4_000_000
+# Limites da API: txids por POST /transactions/batch e entradas por página de /mempool
+PROBE_BATCH = 100
+MEMPOOL_PAGE = 1000
+
+@dataclass
+class TelemetryConfig:
+    api_url: str = ""               # URL da API do explorer; vazio desativa as sondas de visibilidade
+    probe_rate: float = 0.1         # fração das transações aceitas acompanhadas até aparecerem na API
+    probe_interval: float = 0.25    # segundos entre rodadas de sondagem (resolução da medida)
+    probe_timeout: float = 60.0     # desiste de uma transação após esse tempo
+    max_pending: int = 500          # sondas simultâneas; acima disso novas amostras são descartadas
+    report_path: str = "simulator_report.json"
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            api_url=os.getenv("SIM_API_URL", "").rstrip("/"),
+            probe_rate=float(os.getenv("SIM_PROBE_RATE", "0.1")),
+            probe_interval=float(os.getenv("SIM_PROBE_INTERVAL", "0.25")),
+            probe_timeout=float(os.getenv("SIM_PROBE_TIMEOUT", "60")),
+            max_pending=int(os.getenv("SIM_PROBE_MAX_PENDING", "500")),
+            report_path=os.getenv("SIM_REPORT", "simulator_report.json")
+        )
+
+class Series:
+    """
+    Contagem, média, máximo e percentis de uma série de medidas; guarda
+    no máximo `capacity` amostras (reservoir sampling)
+    """
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: List[float] = []
+        self._rng = random.Random(0)
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        if len(self.samples) < self.capacity:
+            self.samples.append(value)
+        else:
+            slot = self._rng.randrange(self.count)
+            if slot < self.capacity:
+                self.samples[slot] = value
+
+    def summary(self, scale: float = 1.0, digits: int = 2) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        ordered = sorted(self.samples)
+        pick = lambda q: round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * scale, digits)
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count * scale, digits),
+            "p50": pick(0.5),
+            "p90": pick(0.9),
+            "p99": pick(0.99),
+            "max": round(self.max * scale, digits)
+        }
+
+@dataclass(slots=True)
+class _Probe:
+    txid: str
+    kind: str
+    submitted: float                # time.monotonic() do início do envio
+    submitted_at: float             # time.time() do envio, comparável ao horário de entrada na mempool
+    transaction_seen: Optional[float] = None
+    mempool_seen: Optional[float] = None
+    confirmed: bool = False         # minerada antes de aparecer em /mempool
+
+class Telemetry:
+    """
+    Métricas de uma execução do simulador: latência de envio por tipo de
+    transação, tempo até a transação aparecer na API (uma consulta
+    POST /transactions/batch com view=summary por rodada) e em /mempool,
+    TPS alcançado e ocupação dos blocos. Thread-safe.
+    """
+    def __init__(self, config: TelemetryConfig, mode: str, target_tps: Optional[float] = None):
+        self.config = config
+        self.mode = mode
+        self.target_tps = target_tps
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.monotonic()
+        self.submit: Dict[str, Series] = {}
+        self.transaction_visible: Dict[str, Series] = {}
+        self.mempool_visible: Dict[str, Series] = {}
+        self.block_txs = Series()
+        self.block_fill = Series()
+        self.block_size = Series()
+        self.accepted = 0
+        self.probed = 0
+        self.dropped_probes = 0
+        self.probe_timeouts = 0
+        self.probe_errors = 0
+        self.intervals: List[Dict[str, Any]] = []
+        self._pending: List[_Probe] = []
+        self._lock = threading.Lock()
+        self._rng = random.Random(0)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Registro ----------------------------------------------------------------------
+
+    def record_submit(self, kind: str, started: float, txid: Optional[str] = None):
+        """
+        Registra uma transação aceita pelo bitcoind; `started` é o
+        time.monotonic() de antes do envio
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.accepted += 1
+            self.submit.setdefault(kind, Series()).add(now - started)
+            if txid is None or not self.config.api_url or self._rng.random() >= self.config.probe_rate:
+                return
+            if len(self._pending) >= self.config.max_pending:
+                self.dropped_probes += 1
+                return
+            self.probed += 1
+            self._pending.append(_Probe(txid, kind, started, time.time() - (now - started)))
+
+    def record_block(self, block: Dict[str, Any]):
+        """
+        Registra um bloco minerado (resultado de getblock com verbosity 1)
+        """
+        with self._lock:
+            # A coinbase não conta como transação do simulador
+            self.block_txs.add(block["nTx"] - 1)
+            self.block_fill.add(block["weight"] / MAX_BLOCK_WEIGHT)
+            self.block_size.add(block["size"])
+
+    def record_interval(self, submitted: int, rate: float, mempool_size: int):
+        with self._lock:
+            self.intervals.append({
+                "elapsed": round(time.monotonic() - self.started, 1),
+                "submitted": submitted,
+                "tps": round(rate, 1),
+                "mempool_size": mempool_size
+            })
+
+    # Sondas de visibilidade --------------------------------------------------------
+
+    def _get(self, path: str, body: Optional[Any] = None) -> Optional[Any]:
+        request = urllib.request.Request(self.config.api_url + path)
+        if body is not None:
+            request.data = json.dumps(body).encode()
+            request.add_header("Content-Type", "application/json")
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as ex:
+            if ex.code != 404:
+                self.probe_errors += 1
+            return None
+        except (urllib.error.URLError, OSError, ValueError):
+            self.probe_errors += 1
+            return None
+
+    def _mempool_listed(self, txids: set, since: float) -> set:
+        """
+        Quais dos txids aparecem em /mempool: pagina pelo cursor, das
+        entradas mais novas para as mais antigas, até achar todos ou passar
+        do horário `since` (com folga para relógios e arredondamento)
+        """
+        listed, cursor = set(), None
+        while True:
+            path = f"/mempool?sort=time&limit={MEMPOOL_PAGE}" + (f"&cursor={cursor}" if cursor else "")
+            page = self._get(path)
+            if not page:
+                return listed
+            transactions = page.get("transactions", [])
+            listed.update(tx["txid"] for tx in transactions if tx["txid"] in txids)
+            cursor = page.get("next_cursor")
+            if listed == txids or not cursor or not transactions or transactions[-1]["time"] < since - 2:
+                return listed
+
+    def _probe_round(self):
+        with self._lock:
+            pending = list(self._pending)
+        if not pending:
+            return
+        waiting = [probe for probe in pending if probe.mempool_seen is None]
+        listed = self._mempool_listed(
+            {probe.txid for probe in waiting}, min(probe.submitted_at for probe in waiting)
+        ) if waiting else set()
+        now = time.monotonic()
+        for probe in waiting:
+            if probe.txid in listed:
+                probe.mempool_seen = now
+
+        # Uma requisição por lote de txids, só com taxa e confirmação (view=summary)
+        unseen = [probe for probe in pending if probe.transaction_seen is None or probe.mempool_seen is None]
+        for start in range(0, len(unseen), PROBE_BATCH):
+            chunk = unseen[start:start + PROBE_BATCH]
+            result = self._get("/transactions/batch", {"txids": [probe.txid for probe in chunk], "view": "summary"})
+            if result is None:
+                continue
+            seen = time.monotonic()
+            for probe, tx in zip(chunk, result.get("transactions", [])):
+                if "error" not in tx:
+                    probe.transaction_seen = probe.transaction_seen or seen
+                    probe.confirmed = "block" in tx
+
+        now = time.monotonic()
+        with self._lock:
+            remaining = []
+            for probe in self._pending:
+                expired = now - probe.submitted > self.config.probe_timeout
+                done = probe.mempool_seen is not None or probe.confirmed or expired
+                if probe.transaction_seen is not None and done:
+                    self.transaction_visible.setdefault(probe.kind, Series()).add(probe.transaction_seen - probe.submitted)
+                    if probe.mempool_seen is not None:
+                        self.mempool_visible.setdefault(probe.kind, Series()).add(probe.mempool_seen - probe.submitted)
+                elif expired:
+                    # Pode ter sido minerada e saído da mempool antes de ser vista
+                    self.probe_timeouts += 1
+                    if probe.mempool_seen is not None:
+                        self.mempool_visible.setdefault(probe.kind, Series()).add(probe.mempool_seen - probe.submitted)
+                else:
+                    remaining.append(probe)
+            self._pending = remaining
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.config.probe_interval):
+            try:
+                self._probe_round()
+            except Exception as ex:
+                logger.warning(f"Telemetria: {ex}")
+
+    def start(self):
+        """
+        Marca o início da medição (após a preparação) e inicia as sondas
+        """
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.monotonic()
+        if self.config.api_url and self._thread is None:
+            self._thread = threading.Thread(target=self._probe_loop, daemon=True)
+            self._thread.start()
+
+    def stop(self, drain: float = 0.0):
+        """
+        Encerra as sondas, esperando até `drain` segundos pelas pendentes
+        """
+        deadline = time.monotonic() + drain
+        while self._pending and time.monotonic() < deadline:
+            time.sleep(self.config.probe_interval)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    # Relatório ---------------------------------------------------------------------
+
+    def report(self, **extra: Any) -> Dict[str, Any]:
+        duration = time.monotonic() - self.started
+        with self._lock:
+            ms = lambda series: {kind: s.summary(scale=1000) for kind, s in sorted(series.items())}
+            return {
+                "mode": self.mode,
+                "started_at": self.started_at.isoformat(),
+                "duration_s": round(duration, 1),
+                "accepted": self.accepted,
+                "tps": {
+                    "target": self.target_tps,
+                    "achieved": round(self.accepted / max(duration, 1e-9), 2),
+                    "intervals": self.intervals
+                },
+                "submit_latency_ms": ms(self.submit),
+                "visibility_ms": {
+                    "api_url": self.config.api_url or None,
+                    "probe_interval_ms": round(self.config.probe_interval * 1000),
+                    "probed": self.probed,
+                    "dropped": self.dropped_probes,
+                    "timeouts": self.probe_timeouts,
+                    "errors": self.probe_errors,
+                    "transaction": ms(self.transaction_visible),
+                    "mempool": ms(self.mempool_visible)
+                },
+                "blocks": {
+                    "transactions": self.block_txs.summary(digits=1),
+                    "fill": self.block_fill.summary(digits=4),
+                    "size_bytes": self.block_size.summary(digits=0)
+                },
+                **extra
+            }
+
+    def write_report(self, **extra: Any) -> Dict[str, Any]:
+        report = self.report(**extra)
+        logger.info(
+            f"Telemetria: {report['accepted']} transações aceitas ({report['tps']['achieved']} tx/s), "
+            f"envio {report['submit_latency_ms']}, visibilidade {report['visibility_ms']['transaction']}"
+        )
+        if self.config.report_path:
+            with open(self.config.report_path, "w") as f:
+                json.dump(report, f, indent=2)
+            logger.info(f"Relatório gravado em {self.config.report_path}")
+        return report
@@ -0,0 +1,211 @@
+import hashlib
+import logging
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import bitcoin
+from bitcoin.core import COIN, CMutableTransaction, CMutableTxIn, CMutableTxOut, COutPoint, b2lx, b2x, lx
+from bitcoin.core.script import SIGHASH_ALL, CScript, SignatureHash
+from bitcoin.wallet import CBitcoinSecret, P2PKHBitcoinAddress
+
+logger = logging.getLogger(__name__)
+
+# Tamanhos aproximados (bytes) de uma transação P2PKH, usados para a taxa
+TX_OVERHEAD = 10
+INPUT_SIZE = 148
+OUTPUT_SIZE = 34
+DUST = 1000
+# Limite padrão de ancestrais não confirmados na mempool do bitcoind é 25
+MAX_UNCONFIRMED_DEPTH = 24
+# Erros que indicam que os inputs já não existem (gastos ou conflitantes)
+SPENT_ERRORS = ("missing-inputs", "txn-mempool-conflict", "bad-txns-inputs-missingorspent", "already in block chain")
+
+@dataclass(slots=True)
+class Utxo:
+    txid: str
+    vout: int
+    value: int      # satoshis
+    key: int        # índice da chave dona do output
+    depth: int = 0  # ancestrais não confirmados
+
+class UtxoPool:
+    """
+    Conjunto local de UTXOs pequenos controlados por chaves do próprio
+    simulador. As transações são montadas e assinadas no cliente
+    (P2PKH), sem coin selection da wallet do bitcoind.
+    """
+    def __init__(self, num_keys: int = 500, seed: int = 1, feerate: int = 2):
+        bitcoin.SelectParams("regtest")
+        self.keys = [
+            CBitcoinSecret.from_secret_bytes(hashlib.sha256(f"simulator:{seed}:{i}".encode()).digest())
+            for i in range(num_keys)
+        ]
+        self.scripts = [P2PKHBitcoinAddress.from_pubkey(key.pub).to_scriptPubKey() for key in self.keys]
+        self.key_of_script = {bytes(script): i for i, script in enumerate(self.scripts)}
+        self.feerate = feerate
+        self._available: deque = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._available)
+
+    def address(self, key: int) -> str:
+        return str(P2PKHBitcoinAddress.from_scriptPubKey(self.scripts[key]))
+
+    def add(self, utxo: Utxo):
+        with self._lock:
+            self._available.append(utxo)
+
+    def take(self, count: int) -> List[Utxo]:
+        """
+        Retira até `count` UTXOs que ainda podem ser encadeados na mempool
+        """
+        taken: List[Utxo] = []
+        with self._lock:
+            for _ in range(len(self._available)):
+                if len(taken) == count:
+                    break
+                utxo = self._available.popleft()
+                if utxo.depth < MAX_UNCONFIRMED_DEPTH:
+                    taken.append(utxo)
+                else:
+                    self._available.append(utxo)
+        return taken
+
+    def confirm_all(self):
+        """
+        Chamado quando um bloco esvazia a mempool: nada mais está pendente
+        """
+        with self._lock:
+            for utxo in self._available:
+                utxo.depth = 0
+
+    # Fan-out -----------------------------------------------------------------------
+
+    def fan_out(self, rpc, count: int, amount: float, per_tx: int = 1000) -> int:
+        """
+        Divide fundos da wallet em `count` UTXOs de `amount` BTC para as
+        chaves locais: a wallet paga um output único por lote, que é
+        dividido em até `per_tx` outputs por uma transação assinada aqui
+        """
+        value = int(round(amount * COIN))
+        created = 0
+        while created < count:
+            outputs = min(per_tx, count - created)
+            fee = self.feerate * (TX_OVERHEAD + INPUT_SIZE + OUTPUT_SIZE * outputs)
+            funding_value = value * outputs + fee
+            txid = rpc.sendtoaddress(self.address(0), round(funding_value / COIN, 8))
+            tx = rpc.getrawtransaction(txid, True)
+            vout = next(
+                out["n"] for out in tx["vout"]
+                if bytes.fromhex(out["scriptPubKey"]["hex"]) == bytes(self.scripts[0])
+                and int(round(out["value"] * COIN)) == funding_value
+            )
+            funding = Utxo(txid, vout, funding_value, 0, depth=1)
+            keys = [(created + i) % len(self.keys) for i in range(outputs)]
+            tx_hex, created_utxos = self._sign([funding], [value] * outputs, keys)
+            rpc.sendrawtransaction(tx_hex)
+            for utxo in created_utxos:
+                self.add(utxo)
+            created += outputs
+        return created
+
+    # Montagem e assinatura ---------------------------------------------------------
+
+    def _sign(self, inputs: List[Utxo], values: List[int], keys: List[int]) -> Tuple[str, List[Utxo]]:
+        tx = CMutableTransaction(
+            [CMutableTxIn(COutPoint(lx(utxo.txid), utxo.vout)) for utxo in inputs],
+            [CMutableTxOut(value, self.scripts[key]) for value, key in zip(values, keys)]
+        )
+        for i, utxo in enumerate(inputs):
+            script = self.scripts[utxo.key]
+            sighash = SignatureHash(script, tx, i, SIGHASH_ALL)
+            signature = self.keys[utxo.key].sign(sighash) + bytes([SIGHASH_ALL])
+            tx.vin[i].scriptSig = CScript([signature, self.keys[utxo.key].pub])
+        txid = b2lx(tx.GetTxid())
+        depth = max(utxo.depth for utxo in inputs) + 1
+        return b2x(tx.serialize()), [Utxo(txid, n, value, key, depth) for n, (value, key) in enumerate(zip(values, keys))]
+
+    def _fee(self, inputs: int, outputs: int) -> int:
+        return self.feerate * (TX_OVERHEAD + INPUT_SIZE * inputs + OUTPUT_SIZE * outputs)
+
+    def build(self, rng: random.Random, max_inputs: int = 2, max_outputs: int = 3) -> Optional[Tuple[str, List[Utxo], List[Utxo]]]:
+        """
+        Monta e assina uma transação gastando UTXOs do pool. Retorna o hex,
+        os inputs consumidos e os outputs (a serem devolvidos ao pool se a
+        transação for aceita), ou None se o pool estiver vazio.
+        """
+        inputs = self.take(rng.randint(1, max_inputs))
+        if not inputs:
+            return None
+        outputs = rng.randint(1, max_outputs)
+        # Valores pequenos demais para dividir: consolida em um único output
+        if sum(utxo.value for utxo in inputs) - self._fee(len(inputs), outputs) < outputs * DUST * 2:
+            outputs = 1
+        return self._build(rng, inputs, outputs)
+
+    def build_exact(self, rng: random.Random, inputs: int, outputs: int) -> Optional[Tuple[str, List[Utxo], List[Utxo]]]:
+        """
+        Monta uma transação com exatamente `outputs` outputs e pelo menos
+        `inputs` inputs (mais inputs são tomados se o valor não bastar)
+        """
+        taken = self.take(inputs)
+        if len(taken) < inputs:
+            self.restore(taken)
+            return None
+        while sum(utxo.value for utxo in taken) - self._fee(len(taken), outputs) < outputs * DUST:
+            extra = self.take(1)
+            if not extra:
+                self.restore(taken)
+                return None
+            taken.extend(extra)
+        return self._build(rng, taken, outputs)
+
+    def _build(self, rng: random.Random, inputs: List[Utxo], outputs: int) -> Optional[Tuple[str, List[Utxo], List[Utxo]]]:
+        spendable = sum(utxo.value for utxo in inputs) - self._fee(len(inputs), outputs)
+        if spendable < outputs * DUST:
+            return None  # Os inputs viram poeira e saem do pool
+        # Cada output recebe DUST e o excedente é repartido aleatoriamente
+        extra = spendable - outputs * DUST
+        cuts = sorted(rng.randint(0, extra) for _ in range(outputs - 1))
+        values = [DUST + b - a for a, b in zip([0] + cuts, cuts + [extra])]
+        keys = [rng.randrange(len(self.keys)) for _ in values]
+        tx_hex, created = self._sign(inputs, values, keys)
+        return tx_hex, inputs, created
+
+    def restore(self, utxos: List[Utxo]):
+        """
+        Devolve ao início do pool UTXOs retirados mas não usados
+        """
+        with self._lock:
+            self._available.extendleft(reversed(utxos))
+
+    def discard(self, txids: set) -> int:
+        """
+        Remove outputs de transações que não entraram na mempool
+        """
+        with self._lock:
+            before = len(self._available)
+            self._available = deque(utxo for utxo in self._available if utxo.txid not in txids)
+            return before - len(self._available)
+
+    def settle(self, inputs: List[Utxo], created: List[Utxo], error: Optional[Dict[str, Any]]) -> bool:
+        """
+        Aplica o resultado de um sendrawtransaction: outputs entram no pool
+        se aceita; se rejeitada, os inputs voltam, salvo se já foram gastos
+        """
+        if error is None:
+            for utxo in created:
+                self.add(utxo)
+            return True
+        message = error.get("message", "")
+        if any(reason in message for reason in SPENT_ERRORS):
+            return False
+        for utxo in inputs:
+            # Limite de ancestrais/descendentes: só volta a ser usado após o próximo bloco
+            if "too-long-mempool-chain" in message:
+                utxo.depth = MAX_UNCONFIRMED_DEPTH
+            self.add(utxo)
+        return False
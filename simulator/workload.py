@@ -0,0 +1,243 @@
+import json
+import logging
+import random
+import time
+import tomllib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from bitcoin.rpc import RawProxy
+from telemetry import Telemetry
+from utxo_pool import UtxoPool
+
+logger = logging.getLogger(__name__)
+
+PROFILES_DIR = Path(__file__).parent / "profiles"
+
+@dataclass
+class Distribution:
+    """
+    Distribuição de inteiros: uniforme entre min e max, ou discreta
+    (values com weights opcionais)
+    """
+    min: int = 1
+    max: int = 1
+    values: List[int] = field(default_factory=list)
+    weights: List[float] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, raw: Any, name: str) -> "Distribution":
+        if isinstance(raw, int):
+            return cls(min=raw, max=raw)
+        if not isinstance(raw, dict):
+            raise ValueError(f"{name}: esperado inteiro ou tabela, recebido {raw!r}")
+        if "values" in raw:
+            values = [int(v) for v in raw["values"]]
+            weights = [float(w) for w in raw.get("weights", [])]
+            if not values or (weights and len(weights) != len(values)):
+                raise ValueError(f"{name}: values vazio ou weights com tamanho diferente")
+            return cls(min=min(values), max=max(values), values=values, weights=weights)
+        dist = cls(min=int(raw.get("min", 1)), max=int(raw.get("max", raw.get("min", 1))))
+        if dist.min < 0 or dist.max < dist.min:
+            raise ValueError(f"{name}: intervalo inválido {dist.min}..{dist.max}")
+        return dist
+
+    def sample(self, rng: random.Random) -> int:
+        if self.values:
+            return rng.choices(self.values, weights=self.weights or None)[0]
+        return rng.randint(self.min, self.max)
+
+@dataclass
+class HugeTx:
+    """
+    Transação fora da curva (ex.: consolidação de 500 inputs ou pagamento
+    com 1000 outputs), sorteada com probabilidade `share` por transação
+    """
+    name: str
+    share: float
+    inputs: int
+    outputs: int
+
+@dataclass
+class Profile:
+    name: str
+    seed: int = 1
+    wallets: int = 10                  # chaves locais que recebem os outputs
+    blocks: int = 20                   # blocos com transações
+    initial_blocks: int = 201
+    final_blocks: int = 0              # blocos vazios ao final
+    utxos: int = 1000                  # UTXOs criados no fan-out inicial
+    utxo_amount: float = 0.01
+    feerate: int = 2                   # sat/vB
+    submit_batch: int = 100
+    txs_per_block: Distribution = field(default_factory=lambda: Distribution(5, 15))
+    inputs: Distribution = field(default_factory=lambda: Distribution(1, 2))
+    outputs: Distribution = field(default_factory=lambda: Distribution(1, 3))
+    huge: List[HugeTx] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, name_or_path: str) -> "Profile":
+        """
+        Carrega um perfil TOML pelo caminho ou pelo nome em profiles/
+        """
+        path = Path(name_or_path)
+        if not path.exists():
+            path = PROFILES_DIR / f"{name_or_path}.toml"
+        with open(path, "rb") as f:
+            raw = tomllib.load(f)
+        return cls.from_dict(raw, default_name=path.stem)
+
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any], default_name: str = "profile") -> "Profile":
+        raw = dict(raw)
+        distributions = {
+            key: Distribution.parse(raw.pop(key), key)
+            for key in ("txs_per_block", "inputs", "outputs") if key in raw
+        }
+        huge = [
+            HugeTx(
+                name=str(entry.get("name", f"huge{i}")),
+                share=float(entry["share"]),
+                inputs=int(entry.get("inputs", 1)),
+                outputs=int(entry.get("outputs", 1))
+            )
+            for i, entry in enumerate(raw.pop("huge", []))
+        ]
+        unknown = set(raw) - {f for f in cls.__dataclass_fields__} - {"name"}
+        if unknown:
+            raise ValueError(f"Campos desconhecidos no perfil: {', '.join(sorted(unknown))}")
+        profile = cls(name=str(raw.pop("name", default_name)), huge=huge, **distributions, **raw)
+        if sum(h.share for h in profile.huge) > 1:
+            raise ValueError("A soma de huge.share não pode passar de 1")
+        if profile.inputs.min < 1 or profile.outputs.min < 1 or any(h.inputs < 1 or h.outputs < 1 for h in huge):
+            raise ValueError("Transações precisam de ao menos um input e um output")
+        return profile
+
+    def shape(self, rng: random.Random) -> Tuple[str, int, int]:
+        """
+        Sorteia o tipo e o formato (inputs, outputs) da próxima transação
+        """
+        roll = rng.random()
+        for huge in self.huge:
+            if roll < huge.share:
+                return huge.name, huge.inputs, huge.outputs
+            roll -= huge.share
+        return "regular", self.inputs.sample(rng), self.outputs.sample(rng)
+
+class ProfileRunner:
+    """
+    Gera uma cadeia a partir de um perfil. Todo sorteio vem de um RNG com
+    a semente do perfil e as transações são montadas localmente em ordem
+    fixa, então o mesmo perfil reproduz o mesmo formato de cadeia
+    (blocos, transações por bloco, inputs e outputs); só os txids mudam.
+    """
+    def __init__(self, service_url: str, mining_address: str, profile: Profile, telemetry: Optional[Telemetry] = None):
+        self.service_url = service_url
+        self.mining_address = mining_address
+        self.profile = profile
+        self.rpc = RawProxy(service_url=service_url, timeout=300)
+        self.pool = UtxoPool(num_keys=profile.wallets, seed=profile.seed, feerate=profile.feerate)
+        self.rejected = 0
+        self.skipped = 0
+        self.telemetry = telemetry
+
+    def _submit(self, batch: List[tuple]) -> List[tuple]:
+        """
+        Envia as transações do bloco em lotes de sendrawtransaction; as
+        rejeitadas (e os descendentes já montados) saem do pool
+        """
+        accepted = []
+        for start in range(0, len(batch), self.profile.submit_batch):
+            chunk = batch[start:start + self.profile.submit_batch]
+            started = time.monotonic()
+            replies = self.rpc._batch([
+                {"version": "1.1", "method": "sendrawtransaction", "params": [tx_hex], "id": i}
+                for i, (_, tx_hex, _, _) in enumerate(chunk)
+            ])
+            by_id = {reply.get("id"): reply for reply in replies}
+            failed = set()
+            for i, entry in enumerate(chunk):
+                reply = by_id.get(i)
+                error = reply.get("error") if reply is not None else {"message": "resposta ausente no lote"}
+                if error is None:
+                    accepted.append(entry)
+                    if self.telemetry is not None:
+                        self.telemetry.record_submit(entry[0], started, entry[2][0].txid)
+                    continue
+                self.rejected += 1
+                failed.add(entry[2][0].txid)
+                logger.warning(f"Transação {entry[0]} rejeitada: {error.get('message')}")
+            if failed:
+                self.pool.discard(failed)
+        return accepted
+
+    def _block(self, rng: random.Random) -> List[tuple]:
+        batch = []
+        for _ in range(self.profile.txs_per_block.sample(rng)):
+            kind, inputs, outputs = self.profile.shape(rng)
+            built = self.pool.build_exact(rng, inputs, outputs)
+            if built is None:
+                # Pool sem UTXOs suficientes: determinístico, mas o perfil pede mais UTXOs
+                self.skipped += 1
+                continue
+            tx_hex, spent, created = built
+            # Os outputs ficam disponíveis já neste bloco (cadeias na mempool)
+            self.pool.settle(spent, created, None)
+            batch.append((kind, tx_hex, created, len(spent)))
+        return batch
+
+    def run(self) -> Dict[str, Any]:
+        profile = self.profile
+        rng = random.Random(profile.seed)
+        logger.info(f"Perfil '{profile.name}': fan-out de {profile.utxos} UTXOs de {profile.utxo_amount} BTC...")
+        self.pool.fan_out(self.rpc, profile.utxos, profile.utxo_amount)
+        self.rpc.generatetoaddress(1, self.mining_address)
+        self.pool.confirm_all()
+        if self.telemetry is not None:
+            self.telemetry.start()
+
+        blocks = []
+        huge = []
+        for index in range(profile.blocks):
+            accepted = self._submit(self._block(rng))
+            block_hash = self.rpc.generatetoaddress(1, self.mining_address)[0]
+            height = self.rpc.getblockcount()
+            self.pool.confirm_all()
+            if self.telemetry is not None:
+                self.telemetry.record_block(self.rpc.getblock(block_hash))
+            blocks.append({"height": height, "hash": block_hash, "transactions": len(accepted)})
+            for kind, _, created, inputs in accepted:
+                if kind != "regular":
+                    huge.append({
+                        "kind": kind, "txid": created[0].txid, "height": height,
+                        "inputs": inputs, "outputs": len(created)
+                    })
+            logger.info(f"Bloco {index + 1}/{profile.blocks} (altura {height}): {len(accepted)} transações")
+
+        if profile.final_blocks:
+            self.rpc.generatetoaddress(profile.final_blocks, self.mining_address)
+        if self.skipped or self.rejected:
+            logger.warning(
+                f"{self.skipped} transações puladas por falta de UTXOs e {self.rejected} rejeitadas; "
+                "aumente `utxos` no perfil"
+            )
+        return {
+            "profile": profile.name,
+            "seed": profile.seed,
+            "blocks": blocks,
+            "huge": huge,
+            "addresses": [self.pool.address(i) for i in range(len(self.pool.keys))],
+            "skipped": self.skipped,
+            "rejected": self.rejected
+        }
+
+def write_manifest(manifest: Dict[str, Any], path: Optional[str]):
+    """
+    Grava alturas, hashes e txids gerados para os benchmarks mirarem
+    os blocos e transações pesados
+    """
+    if not path:
+        return
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Manifesto do perfil gravado em {path}")